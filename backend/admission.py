@@ -0,0 +1,211 @@
+"""Admission control for roadmap generation.
+
+Every generation costs an upstream LLM call and a burst of searches, so it is
+gated twice: a per-user token bucket (a few generations, then a steady trickle)
+and a global cap on generations in flight. When the cap is reached, a bounded
+number of requests may wait briefly for a slot. Everything beyond that is
+rejected at once with an estimated Retry-After rather than piling up and
+tripping OpenRouter's rate limits for everyone.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Hashable
+
+GENERATE_RATE_PER_MINUTE = float(os.getenv("GENERATE_RATE_PER_MINUTE", 4))  # <= 0 disables
+GENERATE_BURST = int(os.getenv("GENERATE_BURST", 5))
+GENERATE_MAX_CONCURRENT = int(os.getenv("GENERATE_MAX_CONCURRENT", 8))
+GENERATE_MAX_WAITING = int(os.getenv("GENERATE_MAX_WAITING", 16))
+GENERATE_MAX_WAIT_SECONDS = float(os.getenv("GENERATE_MAX_WAIT_SECONDS", 10))
+ADMISSION_MAX_USERS = int(os.getenv("ADMISSION_MAX_USERS", 10000))
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason  # "rate" (per-user) or "busy" (global)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets holding up to `burst` tokens, refilled at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int = ADMISSION_MAX_USERS):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 and self.burst > 0
+
+    def _tokens(self, key: Hashable, now: float) -> float:
+        tokens, updated_at = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated_at) * self.rate)
+
+    def try_acquire(self, key: Hashable) -> float:
+        """Take a token for `key`. Returns 0 on success, else seconds until one is available."""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        tokens = self._tokens(key, now)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+            self.rejected += 1
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            # Forgetting a bucket only hands that user a fresh burst
+            self._buckets.popitem(last=False)
+        return wait
+
+    def refund(self, key: Hashable):
+        if self.enabled and key in self._buckets:
+            tokens, updated_at = self._buckets[key]
+            self._buckets[key] = (min(self.burst, tokens + 1), updated_at)
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_minute": round(self.rate * 60, 3),
+            "burst": self.burst,
+            "tracked_users": len(self._buckets),
+            "rejected": self.rejected,
+        }
+
+
+class Slot:
+    """A held concurrency slot; release() is idempotent."""
+
+    def __init__(self, limiter: "ConcurrencyLimiter"):
+        self._limiter = limiter
+        self._acquired_at = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter._release(time.monotonic() - self._acquired_at)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class ConcurrencyLimiter:
+    """At most `max_concurrent` holders; up to `max_waiting` more wait (FIFO) up to `max_wait` seconds."""
+
+    def __init__(self, max_concurrent: int, max_waiting: int, max_wait: float):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._waiters = deque()
+        self._avg_hold = 0.0
+        self.counters = {"admitted": 0, "queued": 0, "rejected_full": 0, "rejected_timeout": 0}
+
+    def retry_after(self) -> float:
+        # Roughly how long until the queue ahead of a new request drains
+        hold = self._avg_hold or 1.0
+        return hold * (len(self._waiters) + 1) / max(self.max_concurrent, 1)
+
+    async def acquire(self) -> Slot:
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+            return Slot(self)
+        if len(self._waiters) >= self.max_waiting or self.max_wait <= 0:
+            self.counters["rejected_full"] += 1
+            raise Rejected("busy", self.retry_after())
+
+        # Futures are created on the running loop, so the limiter works across loops
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.counters["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot at the last moment
+                self.counters["admitted"] += 1
+                return Slot(self)
+            waiter.cancel()
+            self.counters["rejected_timeout"] += 1
+            raise Rejected("busy", self.retry_after())
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                Slot(self).release()  # pass the slot we were handed to the next waiter
+            waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.counters["admitted"] += 1
+        return Slot(self)
+
+    def _release(self, held: float):
+        self._avg_hold = held if not self._avg_hold else 0.8 * self._avg_hold + 0.2 * held
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # the slot moves straight to the waiter
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "max_waiting": self.max_waiting,
+            "max_wait_seconds": self.max_wait,
+            "avg_hold_seconds": round(self._avg_hold, 3),
+            **self.counters,
+        }
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        rate_per_minute: float = GENERATE_RATE_PER_MINUTE,
+        burst: int = GENERATE_BURST,
+        max_concurrent: int = GENERATE_MAX_CONCURRENT,
+        max_waiting: int = GENERATE_MAX_WAITING,
+        max_wait: float = GENERATE_MAX_WAIT_SECONDS,
+    ):
+        self.users = TokenBucketLimiter(rate_per_minute, burst)
+        self.slots = ConcurrencyLimiter(max_concurrent, max_waiting, max_wait)
+
+    def check_user(self, user: Hashable):
+        """Spend one of `user`'s tokens or raise Rejected("rate")."""
+        wait = self.users.try_acquire(user)
+        if wait:
+            raise Rejected("rate", wait)
+
+    async def admit(self, user: Hashable) -> Slot:
+        """Per-user check, then a global slot. The caller must release the slot."""
+        self.check_user(user)
+        try:
+            return await self.slots.acquire()
+        except Rejected:
+            # Turned away for global load: don't charge the user for it
+            self.users.refund(user)
+            raise
+
+    def stats(self) -> dict:
+        return {"per_user": self.users.stats(), "global": self.slots.stats()}
+
+
+admission = AdmissionController()
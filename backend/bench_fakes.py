@@ -0,0 +1,215 @@
+"""Local stand-ins for OpenRouter and the resource search, for offline benchmarks.
+
+FakeLLMServer is a real HTTP server speaking the OpenAI chat-completions API
+(plain and `stream=True`), so the app's pooled AsyncOpenAI client is exercised
+end to end. Servers run on their own thread and event loop (BackgroundServer)
+so their work doesn't show up in the measured latencies. FakeSearchBackend
+plugs into enrichment in place of DuckDuckGo.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def fake_roadmap(role: str, weeks: int) -> dict:
+    # Every other resource has no URL, so enrichment has work to do
+    return {
+        "role": role,
+        "steps": [
+            {
+                "week": week,
+                "title": f"{role} topic {week}",
+                "description": f"Study and practice topic {week} for {role}.",
+                "resources": [
+                    {"title": f"{role} guide part {week}", "url": f"https://docs.example.com/{week}"},
+                    {"title": f"{role} exercises {week}", "url": ""},
+                ],
+            }
+            for week in range(1, weeks + 1)
+        ],
+    }
+
+
+def fake_outline(role: str, phases: int) -> dict:
+    return {"role": role, "phases": [{"title": f"{role} phase {i}", "focus": f"Milestone {i}"}
+                                     for i in range(1, phases + 1)]}
+
+
+def requested_phases(messages) -> int:
+    prompt = " ".join(m.get("content", "") for m in messages)
+    match = re.search(r"OUTLINE .*?EXACTLY (\d+) phases", prompt)
+    return int(match.group(1)) if match else 0
+
+
+def requested_weeks(messages) -> int:
+    prompt = " ".join(m.get("content", "") for m in messages)
+    match = re.search(r"EXACTLY (\d+) items", prompt) or re.search(r"Timeline: (\d+) weeks", prompt)
+    return int(match.group(1)) if match else 4
+
+
+def requested_role(messages) -> str:
+    prompt = " ".join(m.get("content", "") for m in messages)
+    match = re.search(r"Role: (.+)", prompt)
+    return match.group(1).strip() if match else "Engineer"
+
+
+class BackgroundServer:
+    """Serves an ASGI app with uvicorn on 127.0.0.1 (random port) from a daemon thread."""
+
+    def __init__(self, app, lifespan: str = "on"):
+        self.app = app
+        self.lifespan = lifespan
+        self.port = None
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 10):
+        sock = socket.socket()
+        # Accepted connections inherit this; without it small responses stall on delayed ACKs
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.bind(("127.0.0.1", 0))
+        self.port = sock.getsockname()[1]
+        config = uvicorn.Config(self.app, log_level="warning", access_log=False, lifespan=self.lifespan)
+        self._server = uvicorn.Server(config)
+        self._server.install_signal_handlers = lambda: None  # not the main thread
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [sock]}, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self, timeout: float = 10):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=timeout)
+            self._server = None
+
+
+class FakeLLMServer:
+    """OpenAI-compatible /v1/chat/completions with configurable latency.
+
+    `latency` is the time to first byte (plus up to `jitter` extra). Streamed
+    responses then emit the JSON in `chunk_chars`-sized deltas, `token_delay`
+    apart; plain responses wait the equivalent total before answering.
+    """
+
+    def __init__(self, latency: float = 0.5, token_delay: float = 0.005, chunk_chars: int = 16,
+                 jitter: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.chunk_chars = chunk_chars
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.streamed = 0
+        self.port = None
+        self._server = None
+        self.app = self._build_app()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def _delay(self) -> float:
+        return self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            body = await request.json()
+            messages = body.get("messages", [])
+            phases = requested_phases(messages)
+            if phases:
+                content = json.dumps(fake_outline(requested_role(messages), phases))
+            else:
+                content = json.dumps(fake_roadmap(requested_role(messages), requested_weeks(messages)))
+            chunks = [content[i:i + self.chunk_chars] for i in range(0, len(content), self.chunk_chars)]
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            model = body.get("model", "fake")
+            self.requests += 1
+
+            if not body.get("stream"):
+                await asyncio.sleep(self._delay() + self.token_delay * len(chunks))
+                return JSONResponse({
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(chunks), "total_tokens": len(chunks)},
+                })
+
+            self.streamed += 1
+
+            async def events():
+                await asyncio.sleep(self._delay())
+                for piece in chunks:
+                    chunk = {"id": completion_id, "object": "chat.completion.chunk",
+                             "created": int(time.time()), "model": model,
+                             "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    if self.token_delay:
+                        await asyncio.sleep(self.token_delay)
+                last = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                yield f"data: {json.dumps(last)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        return app
+
+    def start(self):
+        self._server = BackgroundServer(self.app, lifespan="off").start()
+        self.port = self._server.port
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeSearchBackend:
+    """Search backend with fixed latency; a deterministic share of queries find nothing."""
+
+    def __init__(self, latency: float = 0.05, miss_rate: float = 0.2):
+        self.latency = latency
+        self.miss_rate = miss_rate
+        self.queries = 0
+
+    async def search(self, query: str) -> Optional[str]:
+        self.queries += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        digest = hashlib.sha1(query.encode()).hexdigest()
+        if int(digest[:8], 16) / 0xFFFFFFFF < self.miss_rate:
+            return None
+        return f"https://search.example.com/{digest[:12]}"
@@ -0,0 +1,324 @@
+"""Offline load / latency benchmark for the API.
+
+Boots the app in-process under uvicorn on a background thread (mock database,
+lifespan hooks included) against the local stand-ins from bench_fakes, then drives mixed traffic from concurrent
+virtual users: each registers, logs in, generates a roadmap and then loops
+over a weighted mix of generate / stream / roadmap / progress / public-profile
+/ login requests until the duration is up. p50/p95/p99 and throughput per
+endpoint are printed and saved as JSON; pass --compare with an earlier result
+file to see the p95 change per endpoint.
+
+    python benchmark.py --concurrency 16 --duration 30 --llm-latency 0.8
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# The benchmark must never touch a real database, OpenRouter or the log files
+os.environ["USE_MOCK_DB"] = "true"
+os.environ["LOG_FILE"] = ""
+os.environ["LOG_STDOUT"] = "false"
+
+import httpx  # noqa: E402
+
+from bench_fakes import BackgroundServer, FakeLLMServer, FakeSearchBackend  # noqa: E402
+
+DEFAULT_MIX = {"roadmap": 4, "progress": 3, "profile": 2, "login": 1, "generate": 1, "generate_stream": 1}
+ROLES = ["Backend Developer", "Data Engineer", "ML Engineer", "Frontend Developer", "DevOps Engineer",
+         "Security Analyst", "Mobile Developer", "QA Engineer", "Cloud Architect", "Data Analyst"]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * q
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(samples: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> dict:
+    endpoints = {}
+    for name in sorted(set(samples) | set(errors)):
+        values = sorted(samples.get(name, []))
+        endpoints[name] = {
+            "count": len(values),
+            "errors": errors.get(name, 0),
+            "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+        }
+    total = sum(e["count"] for e in endpoints.values())
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "total_requests": total,
+        "total_errors": sum(e["errors"] for e in endpoints.values()),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    async def timed(self, name: str, request, ok=(200,)):
+        started = time.perf_counter()
+        try:
+            response = await request
+        except Exception:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return None
+        elapsed = time.perf_counter() - started
+        if response.status_code not in ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return response
+        self.samples.setdefault(name, []).append(elapsed)
+        return response
+
+    def add(self, name: str, elapsed: float):
+        self.samples.setdefault(name, []).append(elapsed)
+
+    def fail(self, name: str):
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+
+class VirtualUser:
+    def __init__(self, email: str, client: httpx.AsyncClient, recorder: Recorder, args, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.args = args
+        self.rng = rng
+        self.email = email
+        self.password = "bench-password"
+        self.headers = {}
+        self.user_id = None
+        self.weeks = 0
+
+    def profile(self) -> dict:
+        role = ROLES[self.rng.randrange(min(self.args.profiles, len(ROLES)))]
+        if self.args.profiles > len(ROLES):
+            role = f"{role} {self.rng.randrange(self.args.profiles)}"
+        return {"target_role": role, "salary_range": "$100k", "timeline": f"{self.args.weeks} weeks",
+                "current_skills": ["Python", "SQL"], "hours_per_week": 10}
+
+    async def setup(self):
+        res = await self.recorder.timed("register", self.client.post(
+            "/register", json={"name": "Bench", "email": self.email, "password": self.password}))
+        if res is None or res.status_code != 200:
+            return False
+        self.headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+        me = await self.client.get("/auth/me", headers=self.headers)
+        self.user_id = me.json()["id"]
+        await self.generate()
+        return True
+
+    async def login(self):
+        await self.recorder.timed("login", self.client.post(
+            "/login", json={"email": self.email, "password": self.password}))
+
+    async def generate(self):
+        res = await self.recorder.timed("generate", self.client.post(
+            "/generate-roadmap", json=self.profile(), headers=self.headers))
+        if res is not None and res.status_code == 200:
+            self.weeks = len(res.json()["steps"])
+
+    async def generate_stream(self):
+        started = time.perf_counter()
+        first_step = None
+        try:
+            async with self.client.stream("POST", "/generate-roadmap/stream", json=self.profile(),
+                                          headers=self.headers) as res:
+                if res.status_code != 200:
+                    self.recorder.fail("generate_stream")
+                    return
+                async for line in res.aiter_lines():
+                    if first_step is None and line == "event: step":
+                        first_step = time.perf_counter() - started
+        except Exception:
+            self.recorder.fail("generate_stream")
+            return
+        self.recorder.add("generate_stream", time.perf_counter() - started)
+        if first_step is not None:
+            self.recorder.add("generate_stream_first_step", first_step)
+
+    async def roadmap(self):
+        await self.recorder.timed("roadmap", self.client.get("/roadmap", headers=self.headers))
+
+    async def progress(self):
+        if not self.weeks:
+            return await self.roadmap()
+        update = {"week": self.rng.randint(1, self.weeks), "completed": self.rng.random() < 0.7}
+        await self.recorder.timed("progress", self.client.put("/roadmap/progress", json=update,
+                                                              headers=self.headers))
+
+    async def profile_view(self):
+        await self.recorder.timed("profile", self.client.get(f"/public/profile/{self.user_id}"))
+
+    async def run(self, mix: Dict[str, float], deadline: float):
+        operations = {"roadmap": self.roadmap, "progress": self.progress, "profile": self.profile_view,
+                      "login": self.login, "generate": self.generate, "generate_stream": self.generate_stream}
+        names = [n for n in mix if mix[n] > 0]
+        weights = [mix[n] for n in names]
+        while time.perf_counter() < deadline:
+            await operations[self.rng.choices(names, weights)[0]]()
+            if self.args.think_time:
+                await asyncio.sleep(self.rng.uniform(0, self.args.think_time))
+
+
+async def run_benchmark(args) -> dict:
+    import enrichment
+    import llm
+    import main
+    from admission import AdmissionController
+    from search_cache import CachedSearchBackend, SearchCache
+
+    rng = random.Random(args.seed)
+    fake_search = FakeSearchBackend(latency=args.search_latency, miss_rate=args.search_miss_rate)
+    fake_llm = FakeLLMServer(latency=args.llm_latency, token_delay=args.token_delay,
+                             jitter=args.llm_jitter, seed=args.seed).start()
+    saved_env = {k: os.environ.get(k) for k in ("OPENROUTER_API_KEY", "OPENROUTER_BASE_URL")}
+    saved = (llm._DOTENV_PATH, enrichment.default_backend, main.admission)
+    try:
+        # .env must not point the app back at the real OpenRouter
+        llm._DOTENV_PATH = ""
+        os.environ["OPENROUTER_API_KEY"] = "bench-key"
+        os.environ["OPENROUTER_BASE_URL"] = fake_llm.base_url
+        enrichment.default_backend = CachedSearchBackend(fake_search, SearchCache(path=None))
+        # Virtual users generate far more often than real ones; the per-user budget is opt-in here
+        main.admission = AdmissionController(rate_per_minute=args.generate_rate)
+
+        app_server = BackgroundServer(main.app).start()
+        try:
+            limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+            async with httpx.AsyncClient(base_url=app_server.url, limits=limits, timeout=args.timeout) as client:
+                recorder = Recorder()
+                run_id = os.urandom(4).hex()
+                users = [VirtualUser(f"bench-{run_id}-{i}@pathos.dev", client, recorder, args,
+                                     random.Random(rng.random()))
+                         for i in range(args.concurrency)]
+                started = time.perf_counter()
+                ready = await asyncio.gather(*(u.setup() for u in users))
+                deadline = time.perf_counter() + args.duration
+                await asyncio.gather(*(u.run(args.mix, deadline) for u, ok in zip(users, ready) if ok))
+                elapsed = time.perf_counter() - started
+                server_metrics = (await client.get("/health")).json().get("metrics")
+        finally:
+            app_server.stop()
+    finally:
+        fake_llm.stop()
+        llm._DOTENV_PATH, enrichment.default_backend, main.admission = saved
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "concurrency": args.concurrency, "duration_s": args.duration, "mix": args.mix,
+            "weeks": args.weeks, "profiles": args.profiles, "think_time_s": args.think_time,
+            "llm_latency_s": args.llm_latency, "llm_jitter_s": args.llm_jitter, "token_delay_s": args.token_delay,
+            "generate_rate_per_min": args.generate_rate, "search_latency_s": args.search_latency, "search_miss_rate": args.search_miss_rate, "seed": args.seed,
+        },
+        **summarize(recorder.samples, recorder.errors, elapsed),
+        "fake_llm": {"requests": fake_llm.requests, "streamed": fake_llm.streamed},
+        "fake_search": {"queries": fake_search.queries},
+        "server_metrics": server_metrics,
+    }
+
+
+def format_report(result: dict, baseline: Optional[dict] = None) -> str:
+    header = f"{'endpoint':<28}{'count':>7}{'err':>5}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    if baseline:
+        header += f"{'p95 Δ':>10}"
+    lines = [header, "-" * len(header)]
+    for name, e in result["endpoints"].items():
+        line = (f"{name:<28}{e['count']:>7}{e['errors']:>5}{e['throughput_rps']:>9.2f}"
+                f"{e['p50_ms']:>10.1f}{e['p95_ms']:>10.1f}{e['p99_ms']:>10.1f}")
+        if baseline:
+            old = baseline.get("endpoints", {}).get(name)
+            if old and old["p95_ms"]:
+                line += f"{(e['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100:>+9.1f}%"
+            else:
+                line += f"{'n/a':>10}"
+        lines.append(line)
+    lines.append(f"total {result['total_requests']} requests, {result['total_errors']} errors, "
+                 f"{result['throughput_rps']:.2f} req/s over {result['elapsed_s']:.1f}s")
+    return "\n".join(lines)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=8, help="virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of mixed traffic after setup")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="weights, e.g. roadmap=4,progress=3,generate=1")
+    parser.add_argument("--weeks", type=int, default=8, help="roadmap length requested")
+    parser.add_argument("--profiles", type=int, default=len(ROLES),
+                        help="distinct profiles (fewer means more roadmap cache hits)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="max random pause between requests")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fake LLM time to first token")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="extra random LLM latency, up to")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="delay between streamed chunks")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="fake search latency")
+    parser.add_argument("--search-miss-rate", type=float, default=0.2)
+    parser.add_argument("--generate-rate", type=float, default=0,
+                        help="per-user generations per minute before 429 (0 disables)")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request client timeout")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the JSON result")
+    parser.add_argument("--compare", help="earlier result file to diff p95 against")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    result = asyncio.run(run_benchmark(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print(format_report(result, baseline))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"saved {args.output}")
+    return 1 if result["total_errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Circuit breaker for the database-to-mock fallback path.
+
+Handlers already fall back to the mock stores when a database call raises,
+but with MongoDB unreachable every call first waits out the server-selection
+timeout (5s). The breaker counts consecutive connection failures; once it
+trips, calls fail immediately with CircuitOpen (so the fallback runs in
+microseconds) while a background task probes the database. A successful probe
+closes the circuit again. Request handlers never probe themselves.
+
+States: "closed" (calls go through), "open" (calls rejected, waiting for the
+next probe) and "half_open" (a probe is in flight).
+"""
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Optional, Tuple, Type
+
+import metrics
+from structured_logging import get_logger
+
+DB_BREAKER_FAILURES = int(os.getenv("DB_BREAKER_FAILURES", 3))
+DB_BREAKER_PROBE_INTERVAL = float(os.getenv("DB_BREAKER_PROBE_INTERVAL", 5))
+DB_BREAKER_PROBE_TIMEOUT = float(os.getenv("DB_BREAKER_PROBE_TIMEOUT", 5))
+
+logger = get_logger("pathos.breaker")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name: str):
+        super().__init__(f"{name} circuit is open")
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        probe: Callable[[], Awaitable],
+        failure_types: Tuple[Type[BaseException], ...] = (Exception,),
+        failure_threshold: int = DB_BREAKER_FAILURES,
+        probe_interval: float = DB_BREAKER_PROBE_INTERVAL,
+        probe_timeout: float = DB_BREAKER_PROBE_TIMEOUT,
+    ):
+        self.name = name
+        self.probe = probe
+        self.failure_types = failure_types
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        self.counters = {"trips": 0, "rejected": 0, "probes": 0, "probe_failures": 0}
+
+    @property
+    def closed(self) -> bool:
+        return self.state == CLOSED
+
+    async def call(self, fn: Callable[..., Awaitable], *args, **kwargs):
+        if self.state != CLOSED:
+            self.counters["rejected"] += 1
+            raise CircuitOpen(self.name)
+        try:
+            result = await fn(*args, **kwargs)
+        except self.failure_types:
+            self.record_failure()
+            raise
+        except Exception:
+            # The database answered (e.g. a duplicate key), so it is reachable
+            self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def record_success(self):
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._trip()
+
+    def _trip(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.counters["trips"] += 1
+        metrics.breaker_transitions.inc(breaker=self.name, state=OPEN)
+        logger.warning(f"{self.name} circuit opened after {self.consecutive_failures} failures; "
+                       f"serving fallbacks and probing every {self.probe_interval}s.")
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.get_running_loop().create_task(self._probe_loop())
+
+    def _close(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        metrics.breaker_transitions.inc(breaker=self.name, state=CLOSED)
+        logger.info(f"{self.name} circuit closed; probe succeeded.")
+
+    async def _probe_loop(self):
+        while self.state != CLOSED:
+            await asyncio.sleep(self.probe_interval)
+            self.state = HALF_OPEN
+            self.counters["probes"] += 1
+            try:
+                await asyncio.wait_for(self.probe(), self.probe_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters["probe_failures"] += 1
+                self.state = OPEN
+                logger.info(f"{self.name} probe failed ({e}).")
+                continue
+            self._close()
+
+    async def shutdown(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            await asyncio.gather(self._probe_task, return_exceptions=True)
+            self._probe_task = None
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "open_for_seconds": round(time.monotonic() - self.opened_at, 1) if self.opened_at else 0.0,
+            **self.counters,
+        }
@@ -1,100 +1,687 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
-import certifi
+import copy
+import sqlite3
+from bson import ObjectId
 from dotenv import load_dotenv
 
+from circuit_breaker import CircuitBreaker, CircuitOpen
+from structured_logging import get_logger
+
 load_dotenv()
 
 MONGODB_URL = os.getenv("MONGODB_URL")
 USE_MOCK_DB_ENV = os.getenv("USE_MOCK_DB", "false").lower() == "true"
+# Simulation Mode storage: a shared SQLite file instead of per-process memory
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH")
 
-print(f"DEBUG: MONGODB_URL found: {bool(MONGODB_URL)}")
-print(f"DEBUG: USE_MOCK_DB_ENV: {USE_MOCK_DB_ENV}")
+logger = get_logger("pathos.database")
 
 # Use mock if explicitly requested OR if no MongoDB URL is provided
 USE_MOCK_DB = USE_MOCK_DB_ENV or not MONGODB_URL
+BACKEND = "MongoDB" if not USE_MOCK_DB else "SQLite" if SQLITE_DB_PATH else "Mock"
+
+# --- In-memory Motor stand-in ---
+# Supports the subset of the Motor/MongoDB API the app uses: equality and
+# basic operator queries on dotted paths (with array traversal), hash indexes
+# (optionally unique), $set/$unset/$inc/$setOnInsert with positional `$`,
+# `$[]` and `$[ident]` + array_filters, upserts and simple projections.
+
+_MISSING = object()
+
+# pymongo takes ~100ms to import and only Motor needs it, so the mock has its
+# own result types and imports pymongo's exception types when it raises one.
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+        self.acknowledged = True
+
+class UpdateResult:
+    def __init__(self, matched_count, modified_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+        self.acknowledged = True
+
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+        self.acknowledged = True
+
+def is_duplicate_key(exc: BaseException) -> bool:
+    """True for a unique index violation from MongoDB or the mock backends (code 11000)."""
+    return getattr(exc, "code", None) == 11000
+
+def duplicate_key_error(message: str) -> Exception:
+    from pymongo.errors import DuplicateKeyError
+    return DuplicateKeyError(message, 11000)
+
+def _write_error(message: str) -> Exception:
+    from pymongo.errors import WriteError
+    return WriteError(message)
+
+
+def _resolve(value, parts):
+    """All values reachable at a dotted path, traversing arrays like MongoDB."""
+    if not parts:
+        if isinstance(value, list):
+            return [value] + value
+        return [value]
+    if isinstance(value, dict):
+        if parts[0] not in value:
+            return []
+        return _resolve(value[parts[0]], parts[1:])
+    if isinstance(value, list):
+        if parts[0].isdigit():
+            index = int(parts[0])
+            return _resolve(value[index], parts[1:]) if index < len(value) else []
+        found = []
+        for item in value:
+            found.extend(_resolve(item, parts))
+        return found
+    return []
+
+
+def _compare(op, actual, expected):
+    try:
+        if op == "$gt":
+            return actual > expected
+        if op == "$gte":
+            return actual >= expected
+        if op == "$lt":
+            return actual < expected
+        if op == "$lte":
+            return actual <= expected
+    except TypeError:
+        return False
+    raise _write_error(f"unknown operator: {op}")
+
+
+def _match_condition(values, cond):
+    if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+        for op, arg in cond.items():
+            if op == "$eq":
+                ok = _match_condition(values, arg)
+            elif op == "$ne":
+                ok = not _match_condition(values, arg)
+            elif op == "$in":
+                ok = any(v in arg for v in values) or (not values and None in arg)
+            elif op == "$nin":
+                ok = not (any(v in arg for v in values) or (not values and None in arg))
+            elif op == "$exists":
+                ok = bool(values) == bool(arg)
+            elif op == "$elemMatch":
+                ok = any(isinstance(v, dict) and _matches(v, arg) for v in values)
+            else:
+                ok = any(_compare(op, v, arg) for v in values)
+            if not ok:
+                return False
+        return True
+    if not values:
+        return cond is None
+    return any(v == cond for v in values)
+
+
+def _matches(doc, query):
+    for key, cond in query.items():
+        if key == "$and":
+            if not all(_matches(doc, q) for q in cond):
+                return False
+        elif key == "$or":
+            if not any(_matches(doc, q) for q in cond):
+                return False
+        elif not _match_condition(_resolve(doc, key.split(".")), cond):
+            return False
+    return True
+
+
+def _element_matches(element, prefix, conditions):
+    """Match an array element against conditions written relative to `prefix`."""
+    for key, cond in conditions.items():
+        if key == prefix:
+            values = _resolve(element, [])
+        else:
+            values = _resolve(element, key[len(prefix) + 1:].split("."))
+        if not _match_condition(values, cond):
+            return False
+    return True
+
+
+def _include(value, tree):
+    """Keep only the paths in `tree` (nested dict of path parts, True = whole value)."""
+    if tree is True:
+        return value
+    if isinstance(value, dict):
+        projected = {k: _include(value[k], sub) for k, sub in tree.items() if k in value}
+        return {k: v for k, v in projected.items() if v is not _MISSING}
+    if isinstance(value, list):
+        return [_include(item, tree) for item in value if isinstance(item, (dict, list))]
+    return _MISSING
+
+
+def _project(doc, projection):
+    if not projection:
+        return doc
+    slices = {k: v["$slice"] for k, v in projection.items() if isinstance(v, dict) and "$slice" in v}
+    flags = {k: v for k, v in projection.items() if k not in slices}
+    include = [k for k, v in flags.items() if v and k != "_id"]
+    if include:
+        tree = {}
+        for key in include + list(slices):
+            node = tree
+            parts = key.split(".")
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+                if node is True:
+                    break
+            else:
+                node[parts[-1]] = True
+        result = _include(doc, tree)
+        if flags.get("_id", 1) and "_id" in doc:
+            result = {"_id": doc["_id"], **result}
+    else:
+        result = dict(doc)
+        for key, flag in flags.items():
+            if not flag:
+                result.pop(key, None)
+    for key, spec in slices.items():
+        items = result.get(key)
+        if isinstance(items, list):
+            if isinstance(spec, list):
+                skip, limit = spec
+                start = skip if skip >= 0 else max(len(items) + skip, 0)
+                result[key] = items[start:start + limit]
+            elif spec >= 0:
+                result[key] = items[:spec]
+            else:
+                result[key] = items[spec:]
+    return result
+
+
+class MockCursor:
+    def __init__(self, items):
+        self.items = items
+
+    def limit(self, n):
+        if n:
+            self.items = self.items[:n]
+        return self
+
+    async def to_list(self, length=None):
+        return self.items if length is None else self.items[:length]
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for item in self.items:
+            yield item
+
 
 class MockCollection:
     def __init__(self):
-        self.data = []
-
-    async def find_one(self, query):
-        # Basic query matching
-        for item in self.data:
-            match = True
-            for k, v in query.items():
-                if item.get(k) != v:
-                    match = False
+        self._docs = {}       # internal seq -> document, in insertion order
+        self._seq = 0
+        self._indexes = {}    # field -> {"unique": bool, "map": {value: set(seq)}}
+        self.ensure_index("_id", unique=True)
+
+    @property
+    def data(self):
+        return list(self._docs.values())
+
+    # --- Indexes ---
+
+    def ensure_index(self, field, unique=False):
+        if field not in self._indexes:
+            index = {"unique": unique, "map": {}}
+            for seq, doc in self._docs.items():
+                self._check_unique(field, index, doc, seq)
+                self._index_doc(field, index, doc, seq)
+            self._indexes[field] = index
+        return f"{field}_1"
+
+    async def create_index(self, keys, unique=False, **kwargs):
+        field = keys if isinstance(keys, str) else keys[0][0]
+        return self.ensure_index(field, unique=unique)
+
+    @staticmethod
+    def _index_values(doc, field):
+        values = []
+        for value in _resolve(doc, field.split(".")):
+            try:
+                hash(value)
+            except TypeError:
+                continue
+            values.append(value)
+        return values
+
+    def _index_doc(self, field, index, doc, seq):
+        for value in self._index_values(doc, field):
+            index["map"].setdefault(value, set()).add(seq)
+
+    def _unindex_doc(self, doc, seq):
+        for field, index in self._indexes.items():
+            for value in self._index_values(doc, field):
+                bucket = index["map"].get(value)
+                if bucket is not None:
+                    bucket.discard(seq)
+                    if not bucket:
+                        del index["map"][value]
+
+    def _check_unique(self, field, index, doc, seq):
+        if not index["unique"]:
+            return
+        for value in self._index_values(doc, field):
+            if index["map"].get(value, set()) - {seq}:
+                raise duplicate_key_error(f"E11000 duplicate key error dup key: {{ {field}: {value!r} }}")
+
+    # --- Storage (overridden by the SQLite backend) ---
+
+    def _get(self, seq):
+        return self._docs[seq]
+
+    def _next_seq(self):
+        self._seq += 1
+        return self._seq
+
+    def _remove(self, seq):
+        self._unindex_doc(self._docs.pop(seq), seq)
+
+    def _store(self, seq, doc):
+        for field, index in self._indexes.items():
+            self._check_unique(field, index, doc, seq)
+        old = self._docs.get(seq)
+        if old is not None:
+            self._unindex_doc(old, seq)
+        self._docs[seq] = doc
+        for field, index in self._indexes.items():
+            self._index_doc(field, index, doc, seq)
+
+    # --- Queries ---
+
+    def _candidates(self, query):
+        best = None
+        for key, cond in query.items():
+            index = self._indexes.get(key)
+            if index is None:
+                continue
+            if isinstance(cond, dict) and set(cond) == {"$eq"}:
+                cond = cond["$eq"]
+            if isinstance(cond, dict) and set(cond) == {"$in"}:
+                wanted = cond["$in"]
+            elif isinstance(cond, (dict, list)):
+                continue
+            else:
+                wanted = [cond]
+            try:
+                seqs = set().union(*(index["map"].get(v, set()) for v in wanted))
+            except TypeError:
+                continue
+            if best is None or len(seqs) < len(best):
+                best = seqs
+        if best is None:
+            return list(self._docs)
+        return sorted(best)
+
+    def _find_seqs(self, query, first=False):
+        found = []
+        for seq in self._candidates(query):
+            if _matches(self._get(seq), query):
+                found.append(seq)
+                if first:
                     break
-            if match:
-                return item
-        return None
+        return found
+
+    # Each operation is a synchronous core plus an async wrapper, so the SQLite
+    # backend can run the core in a worker thread as one unit.
+
+    def _find_one(self, query, projection):
+        seqs = self._find_seqs(query or {}, first=True)
+        if not seqs:
+            return None
+        return _project(copy.deepcopy(self._get(seqs[0])), projection)
+
+    def _find(self, query, projection):
+        return [_project(copy.deepcopy(self._get(seq)), projection) for seq in self._find_seqs(query or {})]
+
+    def _count(self, query):
+        return len(self._find_seqs(query))
+
+    async def find_one(self, query=None, projection=None):
+        return self._find_one(query, projection)
+
+    def find(self, query=None, projection=None):
+        return MockCursor(self._find(query, projection))
+
+    async def count_documents(self, query):
+        return self._count(query)
+
+    # --- Writes ---
+
+    def _insert(self, document):
+        doc = copy.deepcopy(document)
+        doc.setdefault("_id", ObjectId())
+        self._store(self._next_seq(), doc)
+        return doc["_id"]
+
+    def _insert_one(self, document):
+        inserted_id = self._insert(document)
+        document.setdefault("_id", inserted_id)
+        return InsertOneResult(inserted_id)
+
+    def _replace_one(self, query, document, upsert=False):
+        seqs = self._find_seqs(query, first=True)
+        if not seqs:
+            if not upsert:
+                return UpdateResult(0, 0)
+            doc = copy.deepcopy(document)
+            for key, cond in query.items():
+                if not key.startswith("$") and "." not in key and not isinstance(cond, dict):
+                    doc.setdefault(key, cond)
+            inserted_id = self._insert(doc)
+            return UpdateResult(0, 0, inserted_id)
+
+        seq = seqs[0]
+        old = self._get(seq)
+        doc = copy.deepcopy(document)
+        doc["_id"] = old["_id"]
+        self._store(seq, doc)
+        return UpdateResult(1, int(doc != old))
+
+    def _update_one(self, query, update, upsert=False, array_filters=None):
+        seqs = self._find_seqs(query, first=True)
+        if not seqs:
+            if not upsert:
+                return UpdateResult(0, 0)
+            doc = {}
+            for key, cond in query.items():
+                if not key.startswith("$") and not isinstance(cond, dict):
+                    self._apply_path(doc, key.split("."), "$set", cond, query, array_filters, "")
+            for op in ("$setOnInsert", "$set", "$unset", "$inc"):
+                for path, value in update.get(op, {}).items():
+                    self._apply_path(doc, path.split("."), op, value, query, array_filters, "")
+            inserted_id = self._insert(doc)
+            return UpdateResult(0, 0, inserted_id)
+
+        seq = seqs[0]
+        old = self._get(seq)
+        doc = copy.deepcopy(old)
+        for op, fields in update.items():
+            if op == "$setOnInsert":
+                continue
+            if op not in ("$set", "$unset", "$inc"):
+                raise _write_error(f"Unsupported update operator: {op}")
+            for path, value in fields.items():
+                self._apply_path(doc, path.split("."), op, value, query, array_filters, "")
+        modified = doc != old
+        if modified:
+            self._store(seq, doc)
+        return UpdateResult(1, int(modified))
+
+    def _delete_one(self, query):
+        seqs = self._find_seqs(query, first=True)
+        if not seqs:
+            return DeleteResult(0)
+        self._remove(seqs[0])
+        return DeleteResult(1)
 
     async def insert_one(self, document):
-        self.data.append(document)
-        return document
-
-    async def replace_one(self, query, document):
-        for i, item in enumerate(self.data):
-            match = True
-            for k, v in query.items():
-                if item.get(k) != v:
-                    match = False
-                    break
-            if match:
-                self.data[i] = document
-                return
-        self.data.append(document) # Upsert-ish
-
-    async def update_one(self, query, update):
-        # Support for $set only for now
-        set_data = update.get("$set", {})
-        for item in self.data:
-            match = True
-            for k, v in query.items():
-                if k == "steps.week":
-                    # Special case for array query (very basic support)
-                    # Assuming checking if any step matches
-                    continue 
-                if item.get(k) != v:
-                    match = False
-                    break
-            
-            if match:
-                # Handle nested updates crudely for the specific roadmap use case
-                if "steps.week" in query:
-                    target_week = query["steps.week"]
-                    for step in item.get("steps", []):
-                        if step.get("week") == target_week:
-                            # Apply the set data relative to steps.$
-                            for sk, sv in set_data.items():
-                                if sk == "steps.$.completed":
-                                    step["completed"] = sv
-                            return type('obj', (object,), {'modified_count': 1})
+        return self._insert_one(document)
+
+    async def replace_one(self, query, document, upsert=False):
+        return self._replace_one(query, document, upsert)
+
+    async def update_one(self, query, update, upsert=False, array_filters=None):
+        return self._update_one(query, update, upsert, array_filters)
+
+    async def delete_one(self, query):
+        return self._delete_one(query)
+
+    def _apply_path(self, node, parts, op, value, query, array_filters, prefix):
+        part, rest = parts[0], parts[1:]
+        path = f"{prefix}.{part}" if prefix else part
+
+        if isinstance(node, list):
+            if part == "$":
+                # First element matched by the query conditions on this array
+                conditions = {k: v for k, v in query.items() if k == prefix or k.startswith(prefix + ".")}
+                if not conditions:
+                    raise _write_error("The positional operator did not find the match needed from the query.")
+                targets = [i for i, el in enumerate(node) if _element_matches(el, prefix, conditions)][:1]
+            elif part == "$[]":
+                targets = range(len(node))
+            elif part.startswith("$[") and part.endswith("]"):
+                ident = part[2:-1]
+                conditions = {}
+                for f in array_filters or []:
+                    conditions.update({k: v for k, v in f.items() if k == ident or k.startswith(ident + ".")})
+                if not conditions:
+                    raise _write_error(f"No array filter found for identifier '{ident}'")
+                targets = [i for i, el in enumerate(node) if _element_matches(el, ident, conditions)]
+            elif part.isdigit():
+                targets = [int(part)]
+            else:
+                raise _write_error(f"Cannot create field '{part}' in array at '{prefix}'")
+            for i in targets:
+                if i >= len(node):
+                    continue
+                if rest:
+                    self._apply_path(node[i], rest, op, value, query, array_filters, prefix)
                 else:
-                    item.update(set_data)
-                    return type('obj', (object,), {'modified_count': 1})
-        
-        return type('obj', (object,), {'modified_count': 0})
+                    node[i] = self._new_value(node[i], op, value)
+            return
+
+        if not isinstance(node, dict):
+            raise _write_error(f"Cannot apply {op} to a non-document at '{prefix}'")
+        if rest:
+            if part not in node:
+                if op == "$unset":
+                    return
+                node[part] = {}
+            self._apply_path(node[part], rest, op, value, query, array_filters, path)
+        elif op == "$unset":
+            node.pop(part, None)
+        else:
+            node[part] = self._new_value(node.get(part, _MISSING), op, value)
+
+    @staticmethod
+    def _new_value(current, op, value):
+        if op == "$inc":
+            return value if current is _MISSING else current + value
+        return copy.deepcopy(value)
 
 class MockDatabase:
     def __init__(self):
-        self.users = MockCollection()
-        self.roadmaps = MockCollection()
+        self._collections = {}
+        # Same indexes the MongoDB deployment relies on
+        self.users.ensure_index("email", unique=True)
+        self.roadmaps.ensure_index("user_email", unique=True)
 
-if USE_MOCK_DB:
-    print("DEBUG: Using In-Memory Mock Database")
-    db = MockDatabase()
-    client = None
-else:
-    print("DEBUG: Connecting to MongoDB...")
+    def __getattr__(self, name):
+        # Collections are created on first access, like Motor
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = MockCollection()
+        return self._collections[name]
+
+    async def command(self, name, *args, **kwargs):
+        return {"ok": 1.0}
+
+class LazyDatabase:
+    """Stands in for the Motor (or SQLite) database until first use.
+
+    Importing this module never builds a client (or imports Motor); connect()
+    runs from the lifespan hook, or on the first collection access.
+    """
+
+    def __init__(self, factory, closer=None):
+        self._factory = factory
+        self._closer = closer
+        self._db = None
+
+    def _resolve(self):
+        if self._db is None:
+            self._db = self._factory()
+        return self._db
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, name):
+        return self._resolve()[name]
+
+    def close(self):
+        if self._db is not None:
+            if self._closer is not None:
+                self._closer(self._db)
+            self._db = None
+
+# --- Circuit breaker ---
+# Only unreachable-database errors count towards tripping; a duplicate key or
+# a bad update still means the database answered.
+TRANSIENT_ERRORS = (OSError, asyncio.TimeoutError, sqlite3.OperationalError)
+
+def mongo_transient_errors():
+    """TRANSIENT_ERRORS plus pymongo's connection errors (only Motor raises those)."""
+    from pymongo.errors import ConnectionFailure
+    return TRANSIENT_ERRORS + (ConnectionFailure,)
+
+class GuardedCursor:
+    def __init__(self, cursor, breaker):
+        self._cursor = cursor
+        self._breaker = breaker
+
+    def limit(self, n):
+        self._cursor = self._cursor.limit(n)
+        return self
+
+    async def to_list(self, length=None):
+        return await self._breaker.call(self._cursor.to_list, length=length)
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        iterator = self._cursor.__aiter__()
+        while True:
+            try:
+                item = await self._breaker.call(iterator.__anext__)
+            except StopAsyncIteration:
+                return
+            yield item
+
+class GuardedCollection:
+    _ASYNC_METHODS = {"find_one", "insert_one", "replace_one", "update_one", "delete_one",
+                      "count_documents", "create_index"}
+
+    def __init__(self, collection, breaker):
+        self._collection = collection
+        self._breaker = breaker
+
+    def find(self, *args, **kwargs):
+        if not self._breaker.closed:
+            self._breaker.counters["rejected"] += 1
+            raise CircuitOpen(self._breaker.name)
+        return GuardedCursor(self._collection.find(*args, **kwargs), self._breaker)
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in self._ASYNC_METHODS:
+            return lambda *args, **kwargs: self._breaker.call(attr, *args, **kwargs)
+        return attr
+
+class GuardedDatabase:
+    """Routes every database call through the breaker; an open circuit raises CircuitOpen at once."""
+
+    def __init__(self, database, breaker):
+        self._database = database
+        self._breaker = breaker
+        self._collections = {}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = GuardedCollection(self._database[name], self._breaker)
+        return self._collections[name]
+
+    async def command(self, *args, **kwargs):
+        return await self._breaker.call(self._database.command, *args, **kwargs)
+
+client = None
+
+def _motor_database():
+    global client
+    from motor.motor_asyncio import AsyncIOMotorClient
+    import certifi
+    breaker.failure_types = mongo_transient_errors()
+    logger.info("Connecting to MongoDB...")
     # Fix for SSL: TLSV1_ALERT_INTERNAL_ERROR
     client = AsyncIOMotorClient(
-        MONGODB_URL, 
+        MONGODB_URL,
         serverSelectionTimeoutMS=5000,
         tlsCAFile=certifi.where()
     )
-    db = client.career_os
+    return client.career_os
+
+def _close_motor(_):
+    global client
+    if client is not None:
+        client.close()
+        client = None
+
+def _sqlite_database():
+    from sqlite_database import SQLiteDatabase
+    logger.info(f"Using SQLite storage at {SQLITE_DB_PATH}")
+    return SQLiteDatabase(SQLITE_DB_PATH)
+
+if BACKEND == "MongoDB":
+    raw_db = LazyDatabase(_motor_database, _close_motor)
+elif BACKEND == "SQLite":
+    raw_db = LazyDatabase(_sqlite_database, lambda database: database.close())
+else:
+    raw_db = MockDatabase()
+
+# Probes hit the raw database; the in-memory mock never fails, so it isn't guarded
+breaker = CircuitBreaker("database", probe=lambda: raw_db.command("ping"), failure_types=TRANSIENT_ERRORS)
+db = raw_db if BACKEND == "Mock" else GuardedDatabase(raw_db, breaker)
+
+def connect():
+    """Open the database client now rather than on the first query."""
+    if isinstance(raw_db, LazyDatabase):
+        raw_db._resolve()
+    else:
+        logger.info("Using In-Memory Mock Database")
+
+async def close():
+    await breaker.shutdown()
+    if isinstance(raw_db, LazyDatabase):
+        raw_db.close()
+
+async def ensure_indexes():
+    """Create the indexes the app relies on. Safe to run on every startup."""
+    indexes = [
+        (db.users, "email", True),
+        (db.roadmaps, "user_email", True),
+        (db.roadmap_jobs, "job_id", True),
+        (db.roadmap_jobs, "status", False),
+    ]
+    for collection, field, unique in indexes:
+        try:
+            await collection.create_index(field, unique=unique)
+        except Exception as e:
+            # e.g. DB unreachable, or existing duplicates blocking a unique index
+            logger.warning(f"Could not create index on {field}: {e}")
 
 async def get_db():
-    return db
\ No newline at end of file
+    return db
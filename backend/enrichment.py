@@ -0,0 +1,112 @@
+"""Resource enrichment stage for generated roadmaps.
+
+Resources the model returned without a URL get one from a web search. Lookups
+run concurrently (bounded by a semaphore), each with its own timeout, identical
+titles inside one roadmap share a single lookup, and an overall deadline caps
+the whole stage: anything unresolved by then is returned unenriched.
+"""
+import asyncio
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+from search_cache import CachedSearchBackend, SearchCache
+
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", 8))
+ENRICH_QUERY_TIMEOUT = float(os.getenv("ENRICH_QUERY_TIMEOUT", 5))
+ENRICH_DEADLINE = float(os.getenv("ENRICH_DEADLINE", 12))
+
+
+class DDGSSearchBackend:
+    """Default search backend. DDGS is synchronous, so lookups run in threads."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _search_sync(self, query: str) -> Optional[str]:
+        ddgs = getattr(self._local, "ddgs", None)
+        if ddgs is None:
+            from duckduckgo_search import DDGS  # only needed once a search actually runs
+            ddgs = self._local.ddgs = DDGS()
+        results = list(ddgs.text(query, max_results=1))
+        if results:
+            return results[0]["href"]
+        return None
+
+    async def search(self, query: str) -> Optional[str]:
+        return await asyncio.to_thread(self._search_sync, query)
+
+
+search_cache = SearchCache()
+default_backend = CachedSearchBackend(DDGSSearchBackend(), search_cache)
+
+
+def normalize_title(title: str) -> str:
+    return re.sub(r"\s+", " ", title).strip().lower()
+
+
+def build_query(title: str, role: str) -> str:
+    return f"{title} {role} tutorial"
+
+
+async def enrich_roadmap(
+    roadmap,
+    role: str,
+    backend=None,
+    concurrency: Optional[int] = None,
+    query_timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
+) -> Dict[str, int]:
+    """Fill in missing resource URLs on `roadmap` in place and return stats."""
+    backend = backend or default_backend
+    concurrency = concurrency or ENRICH_CONCURRENCY
+    query_timeout = query_timeout if query_timeout is not None else ENRICH_QUERY_TIMEOUT
+    deadline = deadline if deadline is not None else ENRICH_DEADLINE
+
+    # Group resources by title so duplicates cost a single lookup
+    pending: Dict[str, List] = {}
+    titles: Dict[str, str] = {}
+    for step in roadmap.steps:
+        for res in step.resources:
+            if res.url and res.url.strip():
+                continue
+            key = normalize_title(res.title)
+            if not key:
+                continue
+            pending.setdefault(key, []).append(res)
+            titles.setdefault(key, res.title)
+
+    stats = {"queries": len(pending), "linked": 0, "missed": 0, "failed": 0, "timed_out": 0}
+    if not pending:
+        return stats
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def lookup(key: str):
+        async with semaphore:
+            try:
+                url = await asyncio.wait_for(
+                    backend.search(build_query(titles[key], role)), query_timeout
+                )
+            except asyncio.TimeoutError:
+                stats["timed_out"] += 1
+                return
+            except Exception:
+                stats["failed"] += 1
+                return
+        if url:
+            for res in pending[key]:
+                res.url = url
+            stats["linked"] += 1
+        else:
+            stats["missed"] += 1
+
+    tasks = [asyncio.create_task(lookup(key)) for key in pending]
+    _, unfinished = await asyncio.wait(tasks, timeout=deadline)
+    for task in unfinished:
+        task.cancel()
+    if unfinished:
+        await asyncio.gather(*unfinished, return_exceptions=True)
+        stats["timed_out"] += len(unfinished)
+    return stats
@@ -0,0 +1,267 @@
+"""Background roadmap generation jobs.
+
+POST /generate-roadmap?background=true enqueues a job and returns at once; a
+fixed pool of asyncio worker tasks runs the generate + enrich + save pipeline
+and clients poll GET /roadmap/jobs/{id}. Job documents live in the
+`roadmap_jobs` collection, so queued or interrupted jobs are picked up again
+when the app restarts. Failed attempts are retried with exponential backoff.
+
+Several processes may share the collection (`--workers N`, several instances).
+A worker only runs a job after claiming it with a conditional update
+(queued -> running, with its owner id and a lease), so each job runs once. The
+lease is renewed while the job runs; a `running` job is only re-queued once its
+lease has expired, i.e. its owner is gone. Every process sweeps for such jobs
+periodically, and a clean shutdown hands its running jobs straight back.
+"""
+import asyncio
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+import database
+from structured_logging import get_logger
+
+logger = get_logger("pathos.jobs")
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", 100))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", 2))
+# Finished jobs are dropped from memory after this long (they stay in the DB)
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", 3600))
+# A running job whose owner stops renewing this is considered abandoned
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 120))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+# runner(job, report) -> result dict; report(stage, percent) records progress
+Runner = Callable[[dict, Callable[[str, int], Awaitable[None]]], Awaitable[dict]]
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_MAX,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, retry_base: float = JOB_RETRY_BASE_SECONDS,
+                 lease: float = JOB_LEASE_SECONDS):
+        self.workers = workers
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.runner: Optional[Runner] = None
+        # Local copy of every job this process knows about; the collection is
+        # the durable record and the fallback when the DB is unreachable.
+        self.jobs: Dict[str, dict] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._timers = set()
+
+    @property
+    def collection(self):
+        return database.db.roadmap_jobs
+
+    async def start(self, runner: Runner):
+        self.runner = runner
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        await self._recover()
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self):
+        for task in self._tasks + list(self._timers):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._timers, return_exceptions=True)
+        self._tasks = []
+        self._timers.clear()
+        self._queue = None
+        # Hand interrupted jobs back now instead of making others wait out the lease
+        for job in self.jobs.values():
+            if job["status"] == RUNNING and job.get("owner") == self.owner:
+                await self._update(job, status=QUEUED, stage="queued", owner=None, lease_until=0)
+
+    @property
+    def running(self) -> bool:
+        return self._queue is not None
+
+    def is_final_attempt(self, job: dict) -> bool:
+        return job["attempts"] + 1 >= self.max_attempts
+
+    async def submit(self, user_email: str, payload: dict) -> dict:
+        if not self.running:
+            raise RuntimeError("Job queue is not running")
+        if self._queue.qsize() >= self.max_queued:
+            raise QueueFull()
+        self._prune()
+        now = time.time()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "user_email": user_email,
+            "payload": payload,
+            "status": QUEUED,
+            "stage": "queued",
+            "progress": 0,
+            "attempts": 0,
+            "error": None,
+            "result": None,
+            "created_at": now,
+            "updated_at": now,
+            "next_attempt_at": now,
+        }
+        self.jobs[job["job_id"]] = job
+        try:
+            await self.collection.insert_one(dict(job))
+        except Exception as e:
+            logger.warning(f"Job insert failed ({e}). Keeping job in memory only.")
+        self._queue.put_nowait(job["job_id"])
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+        try:
+            return await self.collection.find_one({"job_id": job_id})
+        except Exception:
+            return None
+
+    async def _update(self, job: dict, **fields):
+        query = {"job_id": job["job_id"]}
+        if job.get("owner") == self.owner:
+            # Our lease may have lapsed and another worker taken the job over
+            query["owner"] = self.owner
+        fields["updated_at"] = time.time()
+        job.update(fields)
+        try:
+            await self.collection.update_one(query, {"$set": fields})
+        except Exception as e:
+            logger.warning(f"Job update failed ({e}).")
+
+    async def _claim(self, job: dict) -> bool:
+        """Atomically move a queued job to running under this worker's name."""
+        now = time.time()
+        fields = {"status": RUNNING, "stage": "starting", "progress": 0, "owner": self.owner,
+                  "lease_until": now + self.lease, "updated_at": now}
+        try:
+            result = await self.collection.update_one({"job_id": job["job_id"], "status": QUEUED},
+                                                      {"$set": fields})
+        except Exception as e:
+            # No database to coordinate through, so nobody else can see this job either
+            logger.warning(f"Job claim failed ({e}). Running it from memory.")
+        else:
+            if result.modified_count != 1:
+                return False
+        job.update(fields)
+        return True
+
+    async def _recover(self):
+        # Jobs still queued, or running under a lease nobody renewed (owner died)
+        found = []
+        try:
+            found += await self.collection.find({"status": QUEUED}).to_list(length=None)
+            found += await self.collection.find({"status": RUNNING, "lease_until": {"$lt": time.time()}}
+                                                ).to_list(length=None)
+        except Exception as e:
+            logger.warning(f"Job recovery failed ({e}).")
+        for job in found:
+            if job["job_id"] in self.jobs:
+                continue  # already scheduled or running here
+            job.pop("_id", None)
+            if job["status"] == RUNNING:
+                try:
+                    result = await self.collection.update_one(
+                        {"job_id": job["job_id"], "status": RUNNING, "owner": job.get("owner")},
+                        {"$set": {"status": QUEUED, "stage": "queued", "owner": None, "updated_at": time.time()}})
+                except Exception:
+                    continue
+                if result.modified_count != 1:
+                    continue
+                job.update(status=QUEUED, stage="queued", owner=None)
+            self.jobs[job["job_id"]] = job
+            self._schedule(job["job_id"], max(0.0, job.get("next_attempt_at", 0) - time.time()))
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.lease / 2)
+            await self._recover()
+
+    async def _heartbeat(self, job: dict):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            await self._update(job, lease_until=time.time() + self.lease)
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id, job in list(self.jobs.items()):
+            if job["status"] in (SUCCEEDED, FAILED) and job["updated_at"] < cutoff:
+                del self.jobs[job_id]
+
+    def _schedule(self, job_id: str, delay: float):
+        if delay <= 0:
+            self._queue.put_nowait(job_id)
+            return
+
+        async def later():
+            await asyncio.sleep(delay)
+            if self._queue is not None:
+                self._queue.put_nowait(job_id)
+
+        timer = asyncio.create_task(later())
+        self._timers.add(timer)
+        timer.add_done_callback(self._timers.discard)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            if job is None or job["status"] != QUEUED:
+                continue
+            if not await self._claim(job):
+                # Another worker got it; polls read its progress from the collection
+                self.jobs.pop(job_id, None)
+                continue
+            await self._run(job)
+
+    async def _run(self, job: dict):
+        async def report(stage: str, percent: int):
+            await self._update(job, stage=stage, progress=percent)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            result = await self.runner(job, report)
+        except asyncio.CancelledError:
+            # Shutdown mid-job: stop() hands it back to the queue
+            raise
+        except Exception as e:
+            attempts = job["attempts"] + 1
+            if attempts >= self.max_attempts:
+                await self._update(job, status=FAILED, stage="failed", attempts=attempts, error=str(e))
+                return
+            delay = self.retry_base * (2 ** (attempts - 1))
+            await self._update(job, status=QUEUED, stage="retrying", attempts=attempts,
+                               error=str(e), next_attempt_at=time.time() + delay)
+            self._schedule(job["job_id"], delay)
+            return
+        finally:
+            heartbeat.cancel()
+
+        await self._update(job, status=SUCCEEDED, stage="done", progress=100,
+                           attempts=job["attempts"] + 1, error=None, result=result)
+
+    def stats(self) -> dict:
+        counts = {}
+        for job in self.jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "jobs": counts,
+        }
+
+
+job_queue = JobQueue()
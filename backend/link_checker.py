@@ -0,0 +1,319 @@
+"""Background liveness checks for resource links in saved roadmaps.
+
+Resource URLs come from the model (sometimes hallucinated) or from search, and
+are saved unchecked. A background loop periodically scans the stored roadmaps
+and checks every distinct http(s) URL with one pooled HTTP client: HEAD first,
+GET when HEAD is refused or fails. Requests are bounded globally and per host,
+and verdicts are cached per URL with a TTL that depends on the verdict, so a
+link shared by many roadmaps is checked once.
+
+A link is only "dead" on hard evidence: 404/410, or a host that can't be
+connected to at all (typically a made-up domain). Timeouts, 5xx, 401/403/429
+and the like are "unknown" and left alone. Dead links are rewritten with a
+fresh search result when one is found alive, otherwise their URL is cleared
+(the frontend then links a web search) and the resource is marked with
+link_status="dead". LINK_CHECK_ACTION=flag only marks them. Nothing here runs
+on the request path.
+
+The URLs come from model output that users can steer, so the checker only
+talks to public addresses: each host is resolved first, and if any address is
+loopback, private, link-local, reserved or multicast the link is skipped. The
+connection goes to the address that was checked (Host header and TLS SNI keep
+the name), and redirects are followed by hand with the same check on every hop.
+"""
+import asyncio
+import ipaddress
+import os
+import socket
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import enrichment
+import metrics
+from structured_logging import get_logger
+from ttl_cache import TTLCache
+
+LINK_CHECK_INTERVAL = float(os.getenv("LINK_CHECK_INTERVAL", 6 * 3600))  # <= 0 disables the loop
+LINK_CHECK_INITIAL_DELAY = float(os.getenv("LINK_CHECK_INITIAL_DELAY", 60))
+LINK_CHECK_TIMEOUT = float(os.getenv("LINK_CHECK_TIMEOUT", 8))
+LINK_CHECK_CONCURRENCY = int(os.getenv("LINK_CHECK_CONCURRENCY", 16))
+LINK_CHECK_PER_HOST = int(os.getenv("LINK_CHECK_PER_HOST", 2))
+LINK_CHECK_ACTION = os.getenv("LINK_CHECK_ACTION", "rewrite")  # rewrite | flag
+LINK_CHECK_CACHE_MAX_ENTRIES = int(os.getenv("LINK_CHECK_CACHE_MAX_ENTRIES", 50000))
+LINK_CHECK_ALIVE_TTL = float(os.getenv("LINK_CHECK_ALIVE_TTL", 7 * 24 * 3600))
+LINK_CHECK_DEAD_TTL = float(os.getenv("LINK_CHECK_DEAD_TTL", 24 * 3600))
+LINK_CHECK_UNKNOWN_TTL = float(os.getenv("LINK_CHECK_UNKNOWN_TTL", 3600))
+LINK_CHECK_MAX_REDIRECTS = int(os.getenv("LINK_CHECK_MAX_REDIRECTS", 5))
+
+ALIVE, DEAD, UNKNOWN = "alive", "dead", "unknown"
+DEAD_STATUSES = (404, 410)
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+logger = get_logger("pathos.links")
+
+Search = Callable[[str, str], Awaitable[Optional[str]]]
+
+
+def is_checkable(url: Optional[str]) -> bool:
+    return bool(url) and urlsplit(url.strip()).scheme in ("http", "https")
+
+
+def is_public_address(ip) -> bool:
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+class BlockedAddress(Exception):
+    pass
+
+
+async def search_replacement(title: str, role: str) -> Optional[str]:
+    """Default replacement lookup: the same cached search enrichment uses."""
+    query = enrichment.build_query(title, role)
+    return await asyncio.wait_for(enrichment.default_backend.search(query), enrichment.ENRICH_QUERY_TIMEOUT)
+
+
+class LinkChecker:
+    def __init__(
+        self,
+        timeout: float = LINK_CHECK_TIMEOUT,
+        concurrency: int = LINK_CHECK_CONCURRENCY,
+        per_host: int = LINK_CHECK_PER_HOST,
+        action: str = LINK_CHECK_ACTION,
+        search: Optional[Search] = None,
+        max_entries: int = LINK_CHECK_CACHE_MAX_ENTRIES,
+        address_allowed: Callable = is_public_address,
+    ):
+        self.timeout = timeout
+        self.address_allowed = address_allowed
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.action = action
+        self.search = search
+        self.verdicts = TTLCache(max_entries, max(LINK_CHECK_ALIVE_TTL, LINK_CHECK_DEAD_TTL, LINK_CHECK_UNKNOWN_TTL))
+        self.ttls = {ALIVE: LINK_CHECK_ALIVE_TTL, DEAD: LINK_CHECK_DEAD_TTL, UNKNOWN: LINK_CHECK_UNKNOWN_TTL}
+        self._client = None
+        self._limit: Optional[asyncio.Semaphore] = None
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {"scans": 0, "checked": 0, "alive": 0, "dead": 0, "unknown": 0, "blocked": 0,
+                         "rewritten": 0, "flagged": 0, "roadmaps_updated": 0}
+        self.last_scan: Optional[dict] = None
+
+    # --- HTTP ---
+
+    def _http(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=False,  # every hop is checked in _request
+                trust_env=False,  # a proxy would connect on our behalf, unchecked
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+                headers={"User-Agent": "PathOS-LinkChecker/1.0"},
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _pin(self, host: str, port: int) -> str:
+        """The address to connect to for `host`; raises BlockedAddress unless all of them are public."""
+        try:
+            addresses = [ipaddress.ip_address(host)]
+        except ValueError:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            addresses = [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+        if not addresses or not all(self.address_allowed(ip) for ip in addresses):
+            raise BlockedAddress(host)
+        return str(addresses[0])
+
+    async def _request(self, method: str, url: str) -> int:
+        import httpx
+        target = httpx.URL(url)
+        for _ in range(LINK_CHECK_MAX_REDIRECTS + 1):
+            if target.scheme not in ("http", "https") or not target.host:
+                raise httpx.UnsupportedProtocol(str(target))
+            address = await self._pin(target.host, target.port or (443 if target.scheme == "https" else 80))
+            headers = {"Host": target.netloc.decode("ascii")}
+            extensions = {"sni_hostname": target.host} if target.scheme == "https" else {}
+            async with self._http().stream(method, target.copy_with(host=address), headers=headers,
+                                           extensions=extensions) as response:
+                status, location = response.status_code, response.headers.get("location")
+            if status not in REDIRECT_STATUSES or not location:
+                return status  # the body is never read
+            target = target.join(location)
+        raise httpx.TooManyRedirects(url)
+
+    async def _probe(self, url: str) -> str:
+        import httpx
+        hard_failures = (httpx.ConnectError, httpx.InvalidURL, httpx.UnsupportedProtocol, socket.gaierror)
+        try:
+            status = await self._request("HEAD", url)
+            if status < 400:
+                return ALIVE
+        except BlockedAddress:
+            self.counters["blocked"] += 1
+            return UNKNOWN
+        except hard_failures:
+            return DEAD
+        except httpx.HTTPError:
+            pass
+        # Plenty of servers reject or mishandle HEAD; ask again with GET
+        try:
+            status = await self._request("GET", url)
+        except BlockedAddress:
+            self.counters["blocked"] += 1
+            return UNKNOWN
+        except hard_failures:
+            return DEAD
+        except httpx.HTTPError:
+            return UNKNOWN
+        if status < 400:
+            return ALIVE
+        return DEAD if status in DEAD_STATUSES else UNKNOWN
+
+    async def check(self, url: str) -> str:
+        """Verdict for one URL, from the cache when fresh."""
+        verdict = self.verdicts.get(url)
+        if verdict is not None:
+            return verdict
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.concurrency)
+        host = urlsplit(url).hostname or ""
+        host_limit = self._hosts.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with host_limit, self._limit:
+            verdict = self.verdicts.get(url)  # another task may have just checked it
+            if verdict is None:
+                try:
+                    verdict = await self._probe(url)
+                except Exception as e:
+                    logger.warning(f"Link check failed for {url}: {e}")
+                    verdict = UNKNOWN
+                self.verdicts.set(url, verdict, ttl=self.ttls[verdict])
+                self.counters["checked"] += 1
+                self.counters[verdict] += 1
+                metrics.link_checks.inc(verdict=verdict)
+        return verdict
+
+    async def check_many(self, urls: Iterable[str]) -> Dict[str, str]:
+        urls = list(dict.fromkeys(u for u in urls if is_checkable(u)))
+        try:
+            verdicts = await asyncio.gather(*(self.check(u) for u in urls))
+        finally:
+            self._hosts.clear()
+        return dict(zip(urls, verdicts))
+
+    # --- Scanning stored roadmaps ---
+
+    async def _replacement(self, title: str, role: str, dead_url: str) -> Optional[str]:
+        if self.search is None:
+            return None
+        try:
+            url = await self.search(title, role)
+        except Exception:
+            return None
+        if not is_checkable(url) or url == dead_url:
+            return None
+        return url if await self.check(url) == ALIVE else None
+
+    async def scan(self, collection, on_change: Optional[Callable[[str], None]] = None) -> dict:
+        """Check every resource URL in `collection` and fix or flag the dead ones."""
+        started = time.perf_counter()
+        roadmaps = []
+        async for doc in collection.find({}, {"_id": 0, "user_email": 1, "role": 1, "steps.resources": 1}):
+            roadmaps.append(doc)
+        urls = [res.get("url") for doc in roadmaps for step in doc.get("steps", [])
+                for res in step.get("resources", [])]
+        verdicts = await self.check_many(urls)
+        links = len(verdicts)
+        if DEAD in verdicts.values() and ALIVE not in verdicts.values():
+            # Nothing reachable at all looks like our own network being down,
+            # not every link on the internet dying; don't act on (or keep) that.
+            for url, verdict in verdicts.items():
+                if verdict == DEAD:
+                    self.verdicts.pop(url)
+            logger.warning("Link scan found no reachable links; assuming the network is down, changing nothing.")
+            verdicts = {}
+
+        stats = {"roadmaps": len(roadmaps), "links": links, "dead": 0,
+                 "rewritten": 0, "flagged": 0, "roadmaps_updated": 0}
+        for doc in roadmaps:
+            guard, changes = {}, {}
+            for i, step in enumerate(doc.get("steps", [])):
+                for j, res in enumerate(step.get("resources", [])):
+                    url = res.get("url")
+                    if verdicts.get(url) != DEAD:
+                        continue
+                    stats["dead"] += 1
+                    if res.get("link_status") == DEAD and self.action == "flag":
+                        continue
+                    path = f"steps.{i}.resources.{j}"
+                    replacement = None
+                    if self.action == "rewrite":
+                        replacement = await self._replacement(res.get("title", ""), doc.get("role", ""), url)
+                    if replacement:
+                        changes[f"{path}.url"] = replacement
+                        changes[f"{path}.link_status"] = "replaced"
+                        stats["rewritten"] += 1
+                    else:
+                        if self.action == "rewrite":
+                            changes[f"{path}.url"] = ""
+                        changes[f"{path}.link_status"] = DEAD
+                        stats["flagged"] += 1
+                    guard[f"{path}.url"] = url
+            if not changes:
+                continue
+            # Only applies if those resources still hold the URLs we checked,
+            # so a roadmap regenerated meanwhile is left alone.
+            result = await collection.update_one({"user_email": doc["user_email"], **guard},
+                                                 {"$set": changes, "$inc": {"version": 1}})
+            if result.matched_count:
+                stats["roadmaps_updated"] += 1
+                if on_change is not None:
+                    on_change(doc["user_email"])
+
+        for key in ("rewritten", "flagged", "roadmaps_updated"):
+            self.counters[key] += stats[key]
+        self.counters["scans"] += 1
+        stats["duration_s"] = round(time.perf_counter() - started, 3)
+        self.last_scan = stats
+        logger.info(f"Link scan: {stats}")
+        return stats
+
+    # --- Background loop ---
+
+    async def _run(self, get_collection, on_change, interval: float, initial_delay: float):
+        await asyncio.sleep(initial_delay)
+        while True:
+            try:
+                await self.scan(get_collection(), on_change)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Link scan failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def start(self, get_collection: Callable, on_change: Optional[Callable[[str], None]] = None,
+                    interval: float = LINK_CHECK_INTERVAL, initial_delay: float = LINK_CHECK_INITIAL_DELAY):
+        if interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(get_collection, on_change, interval, initial_delay))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.close()
+
+    def stats(self) -> dict:
+        return {"running": self._task is not None, **self.counters,
+                "cached_verdicts": len(self.verdicts), "last_scan": self.last_scan}
+
+
+link_checker = LinkChecker(search=search_replacement)
@@ -0,0 +1,232 @@
+"""Shared OpenRouter client for roadmap generation.
+
+One AsyncOpenAI client (and its pooled keep-alive HTTP connections) lives for
+the whole app lifetime. The lifespan hook warms it in the background (importing
+the SDK is slow, so readiness doesn't wait for it), and it is only rebuilt when
+the OpenRouter settings in the environment / .env actually change, so request
+handlers never pay for client construction or block the event loop.
+"""
+import asyncio
+import importlib
+import os
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, List, Optional, Tuple
+
+from dotenv import find_dotenv, load_dotenv
+
+import metrics
+from structured_logging import get_logger
+
+if TYPE_CHECKING:
+    # The SDK takes most of a second to import, so it is loaded off the startup path
+    from openai import AsyncOpenAI
+
+DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+DEFAULT_MODEL = "xiaomi/mimo-v2-flash:free"
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", 10))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", 45))
+# Hedge a lone model with a duplicate request to itself (doubles usage; off by default)
+LLM_HEDGE_SAME_MODEL = os.getenv("LLM_HEDGE_SAME_MODEL", "false").lower() == "true"
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "true").lower() == "true"
+
+logger = get_logger("pathos.llm")
+
+# Models that rejected response_format: json_schema; asked with the prompt alone from then on
+_no_structured_output = set()
+
+# Resolved once; the file is only re-read when its mtime changes.
+_DOTENV_PATH = find_dotenv()
+_dotenv_mtime: Optional[float] = None
+
+_client: Optional["AsyncOpenAI"] = None
+_client_config: Optional[Tuple] = None
+# Clients replaced after a config change may still have requests in flight,
+# so they are closed at shutdown instead of immediately.
+_retired_clients: List["AsyncOpenAI"] = []
+_warmup: Optional[asyncio.Task] = None
+
+
+def _refresh_env():
+    global _dotenv_mtime
+    if not _DOTENV_PATH:
+        return
+    try:
+        mtime = os.stat(_DOTENV_PATH).st_mtime
+    except OSError:
+        return
+    if mtime != _dotenv_mtime:
+        _dotenv_mtime = mtime
+        load_dotenv(_DOTENV_PATH, override=True)
+
+
+def _current_config() -> Tuple:
+    return (
+        os.getenv("OPENROUTER_API_KEY"),
+        os.getenv("OPENROUTER_BASE_URL", DEFAULT_BASE_URL),
+        float(os.getenv("LLM_TIMEOUT_SECONDS", 45)),
+        int(os.getenv("LLM_MAX_RETRIES", 2)),
+    )
+
+
+def get_client() -> Optional["AsyncOpenAI"]:
+    """Return the shared client, or None when no API key is configured."""
+    global _client, _client_config
+    _refresh_env()
+    config = _current_config()
+    if config == _client_config:
+        return _client
+
+    if _client is not None:
+        _retired_clients.append(_client)
+
+    api_key, base_url, timeout, max_retries = config
+    _client = None
+    if api_key:
+        from openai import AsyncOpenAI
+        _client = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            timeout=timeout,
+            max_retries=max_retries,
+        )
+    _client_config = config
+    return _client
+
+
+def get_model() -> str:
+    return get_models()[0]
+
+
+def get_models() -> List[str]:
+    """Models to try, in order of preference (OPENROUTER_MODELS, comma separated)."""
+    models = [m.strip() for m in os.getenv("OPENROUTER_MODELS", "").split(",") if m.strip()]
+    if not models:
+        models = [os.getenv("OPENROUTER_MODEL", DEFAULT_MODEL)]
+    return list(dict.fromkeys(models))
+
+
+async def complete(client: "AsyncOpenAI", model: str, messages: List[dict], max_tokens: Optional[int] = None,
+                   schema: Optional[dict] = None, schema_name: str = "response", **kwargs):
+    """chat.completions.create with a token budget and, where supported, JSON-schema output."""
+    from openai import BadRequestError
+    params = {"model": model, "messages": messages, **kwargs}
+    if max_tokens:
+        params["max_tokens"] = max_tokens
+    if schema and LLM_STRUCTURED_OUTPUT and model not in _no_structured_output:
+        response_format = {"type": "json_schema", "json_schema": {"name": schema_name, "strict": True, "schema": schema}}
+        try:
+            return await client.chat.completions.create(response_format=response_format, **params)
+        except BadRequestError as e:
+            logger.warning(f"{model} rejected structured output ({e}); using prompt-only JSON.")
+            _no_structured_output.add(model)
+    return await client.chat.completions.create(**params)
+
+
+class AllModelsFailed(Exception):
+    def __init__(self, errors: List[Tuple[str, BaseException]]):
+        super().__init__("; ".join(f"{model}: {e!r}" for model, e in errors) or "no models")
+        self.errors = errors
+
+
+async def hedged(
+    attempt: Callable[[str], Awaitable[Any]],
+    models: Optional[List[str]] = None,
+    hedge_after: Optional[float] = None,
+    deadline: Optional[float] = None,
+    same_model: Optional[bool] = None,
+) -> Tuple[str, Any]:
+    """Race `attempt(model)` across models; the first one that returns wins.
+
+    The first model starts immediately. Each time `hedge_after` seconds pass
+    without a result, the next model is started alongside the ones still
+    running; when every running attempt has failed, the next one starts right
+    away. `attempt` should raise for anything unusable (errors, unparseable
+    output) so the race moves on. The winner's (model, result) is returned and
+    the rest are cancelled. Raises asyncio.TimeoutError once `deadline` passes
+    and AllModelsFailed when every model failed.
+
+    With a single model configured there is nothing to hedge with, unless
+    `same_model` (LLM_HEDGE_SAME_MODEL) allows one duplicate request to it.
+    """
+    models = list(models or get_models())
+    same_model = LLM_HEDGE_SAME_MODEL if same_model is None else same_model
+    if len(models) == 1 and same_model:
+        models = models * 2
+    hedge_after = LLM_HEDGE_AFTER_SECONDS if hedge_after is None else hedge_after
+    deadline = LLM_DEADLINE_SECONDS if deadline is None else deadline
+
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + deadline
+    pending = {}  # task -> model
+    errors = []
+    next_index = 0
+    next_hedge_at = None
+
+    def launch(outcome: str):
+        nonlocal next_index, next_hedge_at
+        model = models[next_index]
+        next_index += 1
+        pending[asyncio.ensure_future(attempt(model))] = model
+        next_hedge_at = loop.time() + hedge_after
+        metrics.llm_attempts.inc(model=model, outcome=outcome)
+
+    launch("started")
+    try:
+        while pending:
+            now = loop.time()
+            if now >= give_up_at:
+                raise asyncio.TimeoutError()
+            wake_at = give_up_at
+            if next_index < len(models):
+                wake_at = min(wake_at, next_hedge_at)
+            done, _ = await asyncio.wait(pending, timeout=max(wake_at - now, 0),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                model = pending.pop(task)
+                if task.exception() is None:
+                    metrics.llm_attempts.inc(model=model, outcome="won")
+                    return model, task.result()
+                errors.append((model, task.exception()))
+                metrics.llm_attempts.inc(model=model, outcome="failed")
+            if next_index < len(models) and (not pending or loop.time() >= next_hedge_at):
+                launch("started" if not pending else "hedged")
+        raise AllModelsFailed(errors)
+    finally:
+        for task, model in pending.items():
+            task.cancel()
+            metrics.llm_attempts.inc(model=model, outcome="cancelled")
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+def api_key_configured() -> bool:
+    _refresh_env()
+    return bool(os.getenv("OPENROUTER_API_KEY"))
+
+
+async def _warm_up():
+    # Import the SDK on a thread, then build the client on the loop
+    await asyncio.to_thread(importlib.import_module, "openai")
+    get_client()
+
+
+async def startup():
+    """Warm the client in the background so startup doesn't wait on the SDK import."""
+    global _warmup
+    if api_key_configured():
+        _warmup = asyncio.create_task(_warm_up())
+
+
+async def shutdown():
+    global _client, _client_config, _warmup
+    if _warmup is not None:
+        _warmup.cancel()
+        _warmup = None
+    clients = _retired_clients + ([_client] if _client is not None else [])
+    for c in clients:
+        try:
+            await c.close()
+        except Exception:
+            pass
+    _retired_clients.clear()
+    _client = None
+    _client_config = None
@@ -2,28 +2,62 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
+from contextlib import asynccontextmanager
 import os
-import json
+import asyncio
+import math
 import re
+import time
 from datetime import datetime, timedelta
 from bson import ObjectId
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import EmailStr, Field
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from openai import OpenAI
 from dotenv import load_dotenv
-from duckduckgo_search import DDGS
 
-from database import db
+import database
+import enrichment
+import llm
+import metrics
+from admission import Rejected, admission
+from database import db, ensure_indexes, is_duplicate_key
+from jobs import QueueFull, job_queue
+from link_checker import link_checker
 from models_db import UserCreate, UserLogin, Token, TokenData, UserModel
+from passwords import PasswordPoolBusy, hasher
+from roadmap_cache import profile_cache_key, roadmap_cache
+from roadmap_responses import etag_matches, parse_week_range, roadmap_responses
+from roadmap_stream import StepStreamParser, loads_lenient, salvage_roadmap, sse_event
+from structured_logging import RequestIdMiddleware, configure_logging, dropped_records, get_logger, shutdown_logging
+from ttl_cache import TTLCache
 
 # Load environment variables
 load_dotenv(override=True)
 
-app = FastAPI()
+configure_logging()
+logger = get_logger("pathos")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    database.connect()
+    await ensure_indexes()
+    await llm.startup()
+    await job_queue.start(run_roadmap_job)
+    await link_checker.start(lambda: db.roadmaps, on_change=roadmap_responses.invalidate)
+    yield
+    await link_checker.stop()
+    await job_queue.stop()
+    await llm.shutdown()
+    hasher.shutdown()
+    await database.close()
+    shutdown_logging()
+    enrichment.search_cache.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -31,25 +65,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+app.add_middleware(RequestIdMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 # --- Configuration ---
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback_secret_key_for_dev_only")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 60))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))
+# Timelines this long are generated as an outline plus concurrent per-phase calls
+PHASED_MIN_WEEKS = int(os.getenv("PHASED_MIN_WEEKS", 13))
+PHASE_WEEKS = int(os.getenv("PHASE_WEEKS", 6))
+PHASE_RETRIES = int(os.getenv("PHASE_RETRIES", 1))
+PHASE_CONCURRENCY = int(os.getenv("PHASE_CONCURRENCY", 4))
+# The timeline is free text; one admitted generation must not fan out unboundedly
+MAX_ROADMAP_WEEKS = int(os.getenv("MAX_ROADMAP_WEEKS", 52))
+MAX_PHASES = int(os.getenv("MAX_PHASES", 10))
+# max_tokens budget per generated week (the prompt asks for short descriptions)
+LLM_RESOURCES_PER_WEEK = int(os.getenv("LLM_RESOURCES_PER_WEEK", 2))
+LLM_TOKENS_PER_WEEK = int(os.getenv("LLM_TOKENS_PER_WEEK", 110))
+LLM_TOKENS_PER_RESOURCE = int(os.getenv("LLM_TOKENS_PER_RESOURCE", 40))
+LLM_TOKEN_OVERHEAD = int(os.getenv("LLM_TOKEN_OVERHEAD", 100))
+LLM_MAX_TOKENS_CAP = int(os.getenv("LLM_MAX_TOKENS_CAP", 8000))
 
-# Initialize OpenAI Client for OpenRouter
-client = None
-if OPENROUTER_API_KEY:
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=OPENROUTER_API_KEY,
-    )
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Hot-path caches for get_current_user: token -> email, email -> user document.
+# Token entries never outlive the token's own expiry.
+token_cache = TTLCache(AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL)
+user_cache = TTLCache(AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL)
+
 # --- Schemas ---
 class UserProfile(BaseModel):
     target_role: str
@@ -61,6 +109,7 @@ class UserProfile(BaseModel):
 class Resource(BaseModel):
     title: str
     url: Optional[str] = ""
+    link_status: Optional[str] = None  # set by link_checker: "dead" or "replaced"
 
 class RoadmapStep(BaseModel):
     week: int
@@ -74,12 +123,56 @@ class Roadmap(BaseModel):
     role: str
     steps: List[RoadmapStep]
 
+# Shapes of the other LLM answers (used for structured output only)
+class OutlinePhase(BaseModel):
+    title: str
+    focus: str
+
+class RoadmapOutline(BaseModel):
+    role: str
+    phases: List[OutlinePhase]
+
+class RoadmapSteps(BaseModel):
+    steps: List[RoadmapStep]
+
+class ProgressUpdate(BaseModel):
+    week: int
+    completed: bool
+
+class BatchProgressUpdate(BaseModel):
+    updates: List[ProgressUpdate]
+
 # --- Auth Helpers ---
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt runs in the bounded hashing pool, never on the event loop
+async def verify_password(plain_password, hashed_password):
+    """Returns (verified, new_hash); new_hash is set when the stored hash is deprecated."""
+    try:
+        return await hasher.verify_and_update(plain_password, hashed_password)
+    except PasswordPoolBusy:
+        raise password_pool_busy()
+
+async def get_password_hash(password):
+    try:
+        return await hasher.hash(password)
+    except PasswordPoolBusy:
+        raise password_pool_busy()
+
+def password_pool_busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, try again shortly",
+        headers={"Retry-After": "1"},
+    )
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def too_many_requests(rejected: Rejected):
+    detail = ("Roadmap generation limit reached, try again later" if rejected.reason == "rate"
+              else "Roadmap generation is at capacity, try again shortly")
+    metrics.admission_rejections.inc(reason=rejected.reason)
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": rejected.retry_after_header},
+    )
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -88,36 +181,51 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    from jose import jwt  # ~0.1s to import; only needed once someone logs in
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def invalidate_user(email: str):
+    # Call whenever a user record changes so cached copies aren't served
+    user_cache.pop(email)
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+    email = token_cache.get(token)
+    if email is None:
+        from jose import JWTError, jwt
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            email: str = payload.get("sub")
+            if email is None:
+                raise credentials_exception
+            token_data = TokenData(email=email)
+        except JWTError:
             raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
-        raise credentials_exception
-    
-    user = None
+        email = token_data.email
+        exp = payload.get("exp")
+        token_cache.set(token, email, ttl=(exp - time.time()) if exp else None)
+
+    user = user_cache.get(email)
+    if user is not None:
+        return user
+
     try:
-        user = await db.users.find_one({"email": token_data.email})
+        user = await db.users.find_one({"email": email})
     except Exception:
-        pass
+        metrics.db_fallbacks.inc(operation="current_user")
         
     if user is None:
         # Check mock
-        user = next((u for u in MOCK_USERS if u["email"] == token_data.email), None)
+        user = next((u for u in MOCK_USERS if u["email"] == email), None)
         
     if user is None:
         raise credentials_exception
+    user_cache.set(email, user)
     return user
 
 # --- Routes ---
@@ -128,55 +236,58 @@ def read_root():
 
 @app.get("/health")
 async def health_check():
-    from database import USE_MOCK_DB, MONGODB_URL
-    db_type = "Mock" if USE_MOCK_DB else "MongoDB"
+    from database import BACKEND, MONGODB_URL
+    db_type = BACKEND
     masked_url = MONGODB_URL[:15] + "..." if MONGODB_URL else "None"
     
-    db_status = "Connected"
-    if not USE_MOCK_DB:
-        try:
-            # Check if we can reach the DB
-            await db.command("ping")
-        except Exception as e:
-            db_status = f"Error: {str(e)}"
+    # Cached breaker state; the breaker's own background probe does the pinging
+    breaker = database.breaker.stats()
+    db_status = "Connected" if breaker["state"] == "closed" else f"Unavailable (circuit {breaker['state']})"
 
     return {
         "status": "online",
         "database": db_type,
         "database_url": masked_url,
         "database_status": db_status,
-        "openrouter_key_set": bool(OPENROUTER_API_KEY)
+        "database_breaker": breaker,
+        "openrouter_key_set": llm.api_key_configured(),
+        "search_cache": enrichment.search_cache.stats(),
+        "roadmap_cache": roadmap_cache.stats(),
+        "roadmap_responses": roadmap_responses.stats(),
+        "jobs": job_queue.stats(),
+        "password_hashing": hasher.stats(),
+        "auth_cache": {"tokens": token_cache.stats(), "users": user_cache.stats()},
+        "admission": admission.stats(),
+        "link_checker": link_checker.stats(),
+        "log_records_dropped": dropped_records(),
+        "metrics": metrics.health_summary()
     }
 
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 # ... imports
 
 # --- Mock Storage (Fallback) ---
-# Pre-seed a user for easy testing
-default_pwd_hash = pwd_context.hash("password")
-MOCK_USERS = [
-    {
-        "name": "Demo Operator",
-        "email": "demo@pathos.dev",
-        "hashed_password": default_pwd_hash
-    }
-]
-MOCK_ROADMAPS = {}
-
-def log_debug(msg):
-    # Always print to stdout for Render logs
-    print(f"[{datetime.utcnow()}] {msg}")
-    try:
-        with open("debug_auth.log", "a") as f:
-            f.write(f"[{datetime.utcnow()}] {msg}\n")
-    except:
-        pass
+# Pre-seed a user for easy testing; the password is hashed on first login, not at import
+DEMO_PASSWORD = "password"
+DEMO_USER = {
+    "name": "Demo Operator",
+    "email": "demo@pathos.dev",
+    "hashed_password": None
+}
+MOCK_USERS = [DEMO_USER]
 
-# ... (rest of configuration)
+async def seed_demo_password(user: dict):
+    if user is DEMO_USER and not user["hashed_password"]:
+        user["hashed_password"] = await get_password_hash(DEMO_PASSWORD)
+MOCK_ROADMAPS = {}
 
 @app.post("/register", response_model=Token)
 async def register(user: UserCreate):
-    log_debug(f"REGISTER ATTEMPT: {user.email}")
-    hashed_password = get_password_hash(user.password)
+    logger.info(f"REGISTER ATTEMPT: {user.email}")
+    hashed_password = await get_password_hash(user.password)
     new_user = {
         "name": user.name,
         "email": user.email,
@@ -184,22 +295,22 @@ async def register(user: UserCreate):
     }
     
     try:
-        # Try MongoDB/MockDB
-        existing_user = await db.users.find_one({"email": user.email})
-        if existing_user:
-            log_debug("Email already registered (DB)")
-            raise HTTPException(status_code=400, detail="Email already registered")
-        
+        # Try MongoDB/MockDB. The unique index on users.email makes the insert
+        # itself the duplicate check: one round trip, no find/insert race.
         await db.users.insert_one(new_user)
-        log_debug("User created successfully in DB")
-    except HTTPException as he:
-        raise he
+        invalidate_user(user.email)
+        logger.info("User created successfully in DB")
     except Exception as e:
-        log_debug(f"WARNING: DB insert failed ({e}). Checking Mock List.")
+        if is_duplicate_key(e):
+            logger.info("Email already registered (DB)")
+            raise HTTPException(status_code=400, detail="Email already registered")
+        logger.warning(f"DB insert failed ({e}). Checking Mock List.")
+        metrics.db_fallbacks.inc(operation="register")
         # Mock Fallback (Redundant if db IS MockDatabase, but keeping for safety)
         if any(u['email'] == user.email for u in MOCK_USERS):
              raise HTTPException(status_code=400, detail="Email already registered (Mock)")
         MOCK_USERS.append(new_user)
+        invalidate_user(user.email)
     access_token = create_access_token(
         data={"sub": user.email},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -208,226 +319,816 @@ async def register(user: UserCreate):
 
 @app.post("/login", response_model=Token)
 async def login(user: UserLogin):
-    log_debug(f"LOGIN ATTEMPT: {user.email}")
+    logger.info(f"LOGIN ATTEMPT: {user.email}")
     db_user = None
     try:
         db_user = await db.users.find_one({"email": user.email})
     except Exception as e:
-         log_debug(f"DB Find failed: {e}")
+         logger.warning(f"DB Find failed: {e}")
+         metrics.db_fallbacks.inc(operation="login")
 
     # Fallback to MOCK_USERS list if DB returned nothing (or failed)
     if not db_user:
-        log_debug("User not found in DB, checking MOCK_USERS list...")
+        logger.info("User not found in DB, checking MOCK_USERS list...")
         db_user = next((u for u in MOCK_USERS if u["email"] == user.email), None)
 
     if not db_user:
-        log_debug("User not found anywhere.")
+        logger.info("User not found anywhere.")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not verify_password(user.password, db_user["hashed_password"]):
-        log_debug("Password verification failed")
+    await seed_demo_password(db_user)
+    verified, new_hash = await verify_password(user.password, db_user["hashed_password"])
+    if not verified:
+        logger.info("Password verification failed")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    if new_hash:
+        logger.info("Upgrading deprecated password hash.")
+        db_user["hashed_password"] = new_hash
+        invalidate_user(user.email)
+        try:
+            await db.users.update_one({"email": user.email}, {"$set": {"hashed_password": new_hash}})
+        except Exception as e:
+            logger.warning(f"Rehash save failed ({e}).")
     
-    log_debug("Login successful. Generating token.")
+    logger.info("Login successful. Generating token.")
     access_token = create_access_token(
         data={"sub": user.email},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-@app.post("/generate-roadmap", response_model=Roadmap)
-async def generate_roadmap(profile: UserProfile, current_user: dict = Depends(get_current_user)):
-    # Force reload env
-    load_dotenv(override=True)
-    current_key = os.getenv("OPENROUTER_API_KEY")
-    
-    log_debug(f"Generating roadmap for {profile.target_role}")
-    
-    # 1. Check if API Key is valid
-    if not current_key:
-        log_debug("CRITICAL: No valid OPENROUTER_API_KEY found. Falling back to Mock Data.")
-        roadmap = generate_mock_roadmap(profile)
-    else:
+# --- Roadmap Generation Helpers ---
+
+def compute_duration_weeks(profile: UserProfile) -> int:
+    # Calculate approximate weeks
+    duration_weeks = 12 # Default
+    timeline_str = profile.timeline.lower().replace(" ", "")
+    if "month" in timeline_str:
         try:
-            # Re-init client to be sure
-            or_client = OpenAI(
-                base_url="https://openrouter.ai/api/v1",
-                api_key=current_key,
-                timeout=45.0 # Set explicit timeout
-            )
+            months = int(re.search(r'(\d+)', timeline_str).group(1))
+            duration_weeks = months * 4
+        except: pass
+    elif "week" in timeline_str:
+        try:
+            duration_weeks = int(re.search(r'(\d+)', timeline_str).group(1))
+        except: pass
+    return min(max(duration_weeks, 1), MAX_ROADMAP_WEEKS)
 
-            # Calculate approximate weeks
-            duration_weeks = 12 # Default
-            timeline_str = profile.timeline.lower().replace(" ", "")
-            if "month" in timeline_str:
-                try:
-                    months = int(re.search(r'(\d+)', timeline_str).group(1))
-                    duration_weeks = months * 4
-                except: pass
-            elif "week" in timeline_str:
-                try:
-                    duration_weeks = int(re.search(r'(\d+)', timeline_str).group(1))
-                except: pass
-            
-            log_debug(f"Calculated duration_weeks: {duration_weeks}")
-
-            system_prompt = "You are an expert technical career coach. You output STRICT JSON only."
-            user_prompt = f"""
-            Create a detailed, week-by-week career roadmap for:
-            - Role: {profile.target_role}
-            - Goal: {profile.salary_range} salary
-            - Timeline: {duration_weeks} weeks
-            - Skills: {', '.join(profile.current_skills)}
-            - Bandwidth: {profile.hours_per_week} hrs/week
-
-            REQUIREMENTS:
-            1. Return a JSON object with "role" and "steps".
-            2. CRITICAL: "steps" must contain EXACTLY {duration_weeks} items. One item per week.
-            3. Do not group weeks (e.g. "Weeks 1-4"). List each week individually (1 to {duration_weeks}).
-            4. Each step needs: "week" (int), "title", "description", "resources".
-            5. "resources" must be a list of objects: {{"title": "Resource Name", "url": "Valid URL or empty string"}}
-            6. STRICT: No markdown code blocks (no ```json). Return raw JSON only.
-            
-            JSON SCHEMA:
-            {{
-              "role": "Refined Role Title",
-              "steps": [
-                {{
-                  "week": 1,
-                  "title": "Topic Title",
-                  "description": "Brief instructions...",
-                  "resources": []
-                }}
-              ]
-            }}
-            """
-            
-            log_debug(f"Sending prompt to OpenRouter (xiaomi/mimo-v2-flash:free)...")
-            
-            completion = or_client.chat.completions.create(
-                model="xiaomi/mimo-v2-flash:free", 
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
-            
-            text_response = completion.choices[0].message.content
-            log_debug("OpenRouter response received.")
+# Shared by every generation prompt; the compact schema replaces the old
+# inline pretty-printed example (and lets providers cache the prefix).
+SYSTEM_PROMPT = (
+    "You are an expert technical career coach. Reply with raw JSON only, no markdown. "
+    'Step shape: {"week":int,"title":str,"description":str,"resources":[{"title":str,"url":str}]}. '
+    f"Descriptions: 1-2 sentences. Resources: {LLM_RESOURCES_PER_WEEK} per week; url is a real URL or \"\"."
+)
 
-            # Robust JSON Extraction
-            try:
-                start_index = text_response.find('{')
-                end_index = text_response.rfind('}')
-                if start_index != -1 and end_index != -1:
-                    clean_json = text_response[start_index:end_index+1]
-                    data = json.loads(clean_json)
-                    roadmap = Roadmap(**data)
-                    log_debug(f"Successfully parsed {len(roadmap.steps)} weeks of AI data.")
-                    
-                    # --- ENRICHMENT STEP ---
-                    log_debug("Enriching resources with real links...")
-                    # Note: search_link needs to be defined or imported. 
-                    # Assuming it's not defined in the scope based on previous read, 
-                    # disabling enrichment temporarily to prevent NameError, or using mock links.
-                    # Or I can add a simple mock enricher here if search_link is missing.
-                    # Checking imports... from duckduckgo_search import DDGS is there.
-                    # I'll implement a simple inline search here to be safe.
-                    
-                    try:
-                        ddgs = DDGS()
-                        for step in roadmap.steps:
-                            for res in step.resources:
-                                if not res.url or len(res.url.strip()) == 0:
-                                    search_query = f"{res.title} {profile.target_role} tutorial"
-                                    # Simple synchronous search
-                                    results = list(ddgs.text(search_query, max_results=1))
-                                    if results:
-                                        res.url = results[0]['href']
-                                        log_debug(f"  + Linked '{res.title}' -> {res.url}")
-                    except Exception as e:
-                         log_debug(f"Enrichment warning: {e}")
-                    # -----------------------
-
-                else:
-                    raise ValueError("No JSON block found")
-            except Exception as e:
-                log_debug(f"JSON Parse Error: {e}. Raw: {text_response[:100]}...")
-                raise e
+def profile_lines(profile: UserProfile) -> str:
+    return (f"Role: {profile.target_role}\n"
+            f"Goal: {profile.salary_range} salary\n"
+            f"Skills: {', '.join(profile.current_skills)}\n"
+            f"Bandwidth: {profile.hours_per_week} hrs/week")
 
-        except Exception as e:
-            log_debug(f"ERROR in OpenRouter Flow: {e}")
-            import traceback
-            traceback.print_exc()
-            roadmap = generate_mock_roadmap(profile)
+def steps_max_tokens(weeks: int) -> int:
+    """Completion budget for `weeks` steps: enough to finish, not enough to ramble."""
+    per_week = LLM_TOKENS_PER_WEEK + LLM_RESOURCES_PER_WEEK * LLM_TOKENS_PER_RESOURCE
+    return min(LLM_TOKEN_OVERHEAD + weeks * per_week, LLM_MAX_TOKENS_CAP)
+
+def outline_max_tokens(phases: int) -> int:
+    return min(LLM_TOKEN_OVERHEAD + phases * 40, LLM_MAX_TOKENS_CAP)
+
+def messages(user_prompt: str) -> List[dict]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+def build_roadmap_messages(profile: UserProfile, duration_weeks: int) -> List[dict]:
+    return messages(
+        f"Week-by-week career roadmap.\n{profile_lines(profile)}\n"
+        f"Timeline: {duration_weeks} weeks\n"
+        f'Return {{"role": refined role title, "steps": [...]}} with EXACTLY {duration_weeks} items, '
+        f"weeks 1 to {duration_weeks}, one per week (never group weeks)."
+    )
+
+def build_outline_messages(profile: UserProfile, duration_weeks: int, phases: int) -> List[dict]:
+    return messages(
+        f"OUTLINE a {duration_weeks}-week career roadmap as EXACTLY {phases} phases of about {PHASE_WEEKS} weeks.\n"
+        f"{profile_lines(profile)}\n"
+        'Return {"role": refined role title, "phases": [{"title": theme, "focus": one sentence}]}.'
+    )
+
+def build_phase_messages(profile: UserProfile, duration_weeks: int, outline: List[dict],
+                         index: int, first_week: int, last_week: int) -> List[dict]:
+    count = last_week - first_week + 1
+    plan = "\n".join(f"{i + 1}. {p.get('title', '')}: {p.get('focus', '')}" for i, p in enumerate(outline))
+    return messages(
+        f"Part of a {duration_weeks}-week career roadmap.\n{profile_lines(profile)}\n"
+        f"Phases:\n{plan}\n"
+        f"Write phase {index + 1} (\"{outline[index].get('title', '')}\"), weeks {first_week} to {last_week}.\n"
+        f'Return {{"role": refined role title, "steps": [...]}} with EXACTLY {count} items, one per week.'
+    )
+
+def build_missing_weeks_messages(profile: UserProfile, duration_weeks: int, steps: List[RoadmapStep],
+                                 missing: List[int]) -> List[dict]:
+    planned = "\n".join(f"Week {s.week}: {s.title}" for s in steps)
+    weeks = ", ".join(str(w) for w in missing)
+    return messages(
+        f"A {duration_weeks}-week career roadmap.\n{profile_lines(profile)}\n"
+        f"Already planned:\n{planned}\n"
+        f"Write ONLY the missing weeks: {weeks}.\n"
+        f'Return {{"steps": [...]}} with EXACTLY {len(missing)} items.'
+    )
+
+def _strict_schema(schema: dict, drop: dict) -> dict:
+    """Inline $refs, drop server-side fields and require everything else."""
+    defs = schema.get("$defs") or schema.get("definitions") or {}
+
+    def convert(node, name=None):
+        if "$ref" in node:
+            ref = node["$ref"].split("/")[-1]
+            return convert(defs[ref], ref)
+        if node.get("type") == "object":
+            props = {k: convert(v) for k, v in node.get("properties", {}).items()
+                     if k not in drop.get(name or node.get("title"), ())}
+            return {"type": "object", "properties": props, "required": list(props), "additionalProperties": False}
+        if node.get("type") == "array":
+            return {"type": "array", "items": convert(node.get("items", {}))}
+        if "anyOf" in node:
+            # Optional[str] and friends: the non-null branch is what the model should send
+            branches = [b for b in node["anyOf"] if b.get("type") != "null"]
+            return convert(branches[0]) if branches else {"type": "string"}
+        return {"type": node.get("type", "string")}
+
+    return convert(schema, schema.get("title"))
+
+_SERVER_FIELDS = {"Roadmap": ("user_email",), "RoadmapStep": ("completed",), "Resource": ("link_status",)}
 
+def response_schema(kind: str) -> dict:
+    """JSON schema for `response_format`, built from the pydantic models."""
+    if kind not in _RESPONSE_SCHEMAS:
+        model = {"roadmap": Roadmap, "outline": RoadmapOutline, "steps": RoadmapSteps}[kind]
+        _RESPONSE_SCHEMAS[kind] = _strict_schema(model.schema(), _SERVER_FIELDS)
+    return _RESPONSE_SCHEMAS[kind]
+
+_RESPONSE_SCHEMAS = {}
+
+def extract_json(text_response: str) -> dict:
+    start_index = text_response.find('{')
+    end_index = text_response.rfind('}')
+    if start_index == -1 or end_index == -1:
+        raise ValueError("No JSON block found")
+    return loads_lenient(text_response[start_index:end_index+1])
+
+def parse_roadmap_text(text_response: str) -> tuple:
+    """(role, steps) from a completion, keeping every valid step that survived.
+
+    Truncated or malformed output still yields the steps that completed;
+    individual invalid steps are dropped instead of failing the whole answer.
+    """
+    role, raw_steps, parsed_whole = salvage_roadmap(text_response)
+    steps = []
+    for raw in raw_steps:
+        try:
+            steps.append(RoadmapStep(**raw))
+        except Exception:
+            continue
+    if steps and (not parsed_whole or len(steps) < len(raw_steps)):
+        metrics.llm_repairs.inc(kind="salvaged")
+    return role, steps
+
+def missing_weeks(steps: List[RoadmapStep], first_week: int, last_week: int) -> List[int]:
+    have = {s.week for s in steps}
+    return [w for w in range(first_week, last_week + 1) if w not in have]
+
+async def fill_missing_weeks(or_client, profile: UserProfile, duration_weeks: int,
+                             steps: List[RoadmapStep], missing: List[int]) -> List[RoadmapStep]:
+    """Re-ask the model for just the `missing` weeks and merge them into `steps`.
+
+    Returns the merged, week-ordered steps; on failure the steps we already
+    had are returned unchanged (a partial roadmap beats simulated data).
+    """
+    prompt = build_missing_weeks_messages(profile, duration_weeks, steps, missing)
+    logger.info(f"Re-asking for {len(missing)} missing weeks: {missing}")
+
+    async def attempt(model: str) -> List[RoadmapStep]:
+        completion = await llm.complete(or_client, model, prompt, max_tokens=steps_max_tokens(len(missing)),
+                                        schema=response_schema("steps"), schema_name="roadmap_steps")
+        _, extra = parse_roadmap_text(completion.choices[0].message.content or "")
+        if not extra:
+            metrics.parse_failures.inc(source="reask")
+            raise ValueError("Re-ask returned no steps")
+        return extra
+
+    metrics.llm_repairs.inc(kind="reask")
+    try:
+        with metrics.time_stage("reask"):
+            _, extra = await llm.hedged(attempt)
+    except Exception as e:
+        metrics.llm_repairs.inc(kind="reask_failed")
+        logger.warning(f"Re-ask for missing weeks failed ({e!r}); keeping {len(steps)} weeks.")
+        return steps
+
+    # Trust the model's week numbers when they match, otherwise fill gaps in order
+    wanted = set(missing)
+    numbered = {s.week: s for s in extra if s.week in wanted}
+    unplaced = [s for s in extra if s.week not in wanted]
+    for week in missing:
+        if week not in numbered and unplaced:
+            step = unplaced.pop(0)
+            step.week = week
+            numbered[week] = step
+    return sorted(steps + list(numbered.values()), key=lambda s: s.week)
+
+async def enrich_roadmap(roadmap: Roadmap, profile: UserProfile):
+    logger.info("Enriching resources with real links...")
+    try:
+        with metrics.time_stage("enrich"):
+            stats = await enrichment.enrich_roadmap(roadmap, profile.target_role)
+        logger.info(f"Enrichment finished: {stats}")
+        for result in ("linked", "missed", "failed", "timed_out"):
+            if stats.get(result):
+                metrics.enrichment_results.inc(stats[result], result=result)
+    except Exception as e:
+         logger.warning(f"Enrichment warning: {e}")
+
+def progress_counters(steps: List[dict]) -> dict:
+    return {
+        "total": len(steps),
+        "completed": sum(1 for s in steps if s.get("completed", False))
+    }
+
+def roadmap_document(roadmap: Roadmap) -> dict:
+    # Counters are denormalized so public profiles never recount steps;
+    # /roadmap/progress keeps them in step with $inc.
+    doc = roadmap.dict()
+    doc["stats"] = progress_counters(doc["steps"])
+    return doc
+
+async def save_roadmap(email: str, roadmap: Roadmap):
     # Save to MongoDB or Mock
-    roadmap.user_email = current_user["email"]
+    roadmap.user_email = email
     
     try:
-        existing_roadmap = await db.roadmaps.find_one({"user_email": current_user["email"]})
-        if existing_roadmap:
-            await db.roadmaps.replace_one({"user_email": current_user["email"]}, roadmap.dict())
-        else:
-            await db.roadmaps.insert_one(roadmap.dict())
+        # Single atomic upsert keyed on the unique user_email index; the version
+        # bump tells other workers' response caches that the document changed
+        with metrics.time_stage("save"):
+            await db.roadmaps.update_one({"user_email": email},
+                                         {"$set": roadmap_document(roadmap), "$inc": {"version": 1}}, upsert=True)
     except Exception as e:
-        log_debug(f"WARNING: DB Save failed ({e}). Using Mock Storage.")
-        MOCK_ROADMAPS[current_user["email"]] = roadmap.dict()
-        
+        logger.warning(f"DB Save failed ({e}). Using Mock Storage.")
+        metrics.db_fallbacks.inc(operation="save_roadmap")
+        MOCK_ROADMAPS[email] = roadmap_document(roadmap)
+    roadmap_responses.invalidate(email)
+
+def roadmap_cache_key(profile: UserProfile, duration_weeks: int) -> str:
+    return profile_cache_key(profile.target_role, profile.current_skills, profile.hours_per_week, duration_weeks)
+
+async def generate_ai_roadmap(profile: UserProfile, duration_weeks: int) -> Optional[Roadmap]:
+    """Run the LLM + parse + enrichment pipeline. Returns None on any failure."""
+    # Shared app-lifetime client; rebuilt only if the OpenRouter config changed
+    or_client = llm.get_client()
+
+    # 1. Check if API Key is valid
+    if or_client is None:
+        logger.warning("No valid OPENROUTER_API_KEY found. Falling back to Mock Data.")
+        return None
+
+    if duration_weeks >= PHASED_MIN_WEEKS:
+        roadmap = await generate_phased_roadmap(or_client, profile, duration_weeks)
+        if roadmap is None:
+            return None
+        await enrich_roadmap(roadmap, profile)
+        return roadmap
+
+    prompt = build_roadmap_messages(profile, duration_weeks)
+
+    async def attempt(model: str) -> Roadmap:
+        # Raises on anything unusable so the hedge moves on to the next model
+        logger.info(f"Sending prompt to OpenRouter ({model})...")
+        completion = await llm.complete(or_client, model, prompt, max_tokens=steps_max_tokens(duration_weeks),
+                                        schema=response_schema("roadmap"), schema_name="roadmap")
+        text_response = completion.choices[0].message.content or ""
+        logger.info(f"OpenRouter response received ({model}).")
+
+        # Tolerant extraction: keeps every complete week even from truncated output
+        with metrics.time_stage("parse"):
+            role, steps = parse_roadmap_text(text_response)
+        if not steps:
+            metrics.parse_failures.inc(source="completion")
+            logger.warning(f"JSON Parse Error ({model}): no usable steps. Raw: {text_response[:100]}...")
+            raise ValueError("No usable steps in response")
+        return Roadmap(role=role or profile.target_role, steps=steps)
+
+    try:
+        # Slow primary -> a hedge request to the next model; first valid roadmap wins
+        with metrics.time_stage("llm"):
+            model, roadmap = await llm.hedged(attempt)
+        logger.info(f"Successfully parsed {len(roadmap.steps)} weeks of AI data from {model}.")
+    except Exception as e:
+        logger.error(f"ERROR in OpenRouter Flow: {e!r}")
+        return None
+
+    missing = missing_weeks(roadmap.steps, 1, duration_weeks)
+    if missing:
+        roadmap.steps = await fill_missing_weeks(or_client, profile, duration_weeks, roadmap.steps, missing)
+
+    # --- ENRICHMENT STEP ---
+    await enrich_roadmap(roadmap, profile)
     return roadmap
 
-@app.get("/roadmap", response_model=Roadmap)
-async def get_roadmap(current_user: dict = Depends(get_current_user)):
+def phase_ranges(duration_weeks: int) -> List[tuple]:
+    """Split 1..duration_weeks into near-equal (first, last) ranges of about PHASE_WEEKS (at most MAX_PHASES)."""
+    phases = min(max(1, math.ceil(duration_weeks / PHASE_WEEKS)), MAX_PHASES)
+    bounds = [round(i * duration_weeks / phases) for i in range(phases + 1)]
+    return [(bounds[i] + 1, bounds[i + 1]) for i in range(phases)]
+
+async def generate_outline(or_client, profile: UserProfile, duration_weeks: int, phases: int) -> dict:
+    """Phase themes for the whole timeline; generic themes if the outline call fails."""
+    prompt = build_outline_messages(profile, duration_weeks, phases)
+
+    async def attempt(model: str) -> dict:
+        completion = await llm.complete(or_client, model, prompt, max_tokens=outline_max_tokens(phases),
+                                        schema=response_schema("outline"), schema_name="roadmap_outline")
+        data = extract_json(completion.choices[0].message.content or "")
+        outline = [p for p in data.get("phases", []) if isinstance(p, dict) and p.get("title")]
+        if not outline:
+            raise ValueError("Outline has no phases")
+        return {"role": data.get("role") or profile.target_role, "phases": outline}
+
+    try:
+        with metrics.time_stage("outline"):
+            _, outline = await llm.hedged(attempt)
+    except Exception as e:
+        metrics.parse_failures.inc(source="outline")
+        logger.warning(f"Outline failed ({e!r}); using generic phases.")
+        outline = {"role": profile.target_role, "phases": []}
+    generic = {"title": "Next phase", "focus": f"Progress toward {profile.target_role}"}
+    # Pad or trim so there is exactly one theme per phase
+    outline["phases"] = (outline["phases"] + [generic] * phases)[:phases]
+    return outline
+
+async def generate_phase(or_client, profile: UserProfile, duration_weeks: int, prompt: List[dict],
+                         first_week: int, last_week: int) -> List[RoadmapStep]:
+    """Steps for one phase, renumbered to first_week..last_week. Retried on its own."""
+    count = last_week - first_week + 1
+
+    async def attempt(model: str) -> List[RoadmapStep]:
+        completion = await llm.complete(or_client, model, prompt, max_tokens=steps_max_tokens(count),
+                                        schema=response_schema("roadmap"), schema_name="roadmap")
+        _, steps = parse_roadmap_text(completion.choices[0].message.content or "")
+        if not steps:
+            metrics.parse_failures.inc(source="phase")
+            raise ValueError("Phase returned no steps")
+        return steps
+
+    for retry in range(PHASE_RETRIES + 1):
+        try:
+            with metrics.time_stage("phase"):
+                _, steps = await llm.hedged(attempt)
+            break
+        except Exception as e:
+            if retry == PHASE_RETRIES:
+                raise
+            logger.warning(f"Phase weeks {first_week}-{last_week} failed ({e!r}); retrying.")
+
+    # Models number phases inconsistently (1..n or first..last); order is what counts
+    steps = sorted(steps, key=lambda s: s.week)[:count]
+    for offset, step in enumerate(steps):
+        step.week = first_week + offset
+    if len(steps) < count:
+        steps = await fill_missing_weeks(or_client, profile, duration_weeks, steps,
+                                         list(range(first_week + len(steps), last_week + 1)))
+    return steps
+
+async def generate_phased_roadmap(or_client, profile: UserProfile, duration_weeks: int) -> Optional[Roadmap]:
+    """Outline call, then every phase concurrently; merged into one Roadmap."""
+    ranges = phase_ranges(duration_weeks)
+    logger.info(f"Generating {duration_weeks} weeks as {len(ranges)} concurrent phases.")
+    outline = await generate_outline(or_client, profile, duration_weeks, len(ranges))
+    limit = asyncio.Semaphore(PHASE_CONCURRENCY)
+
+    async def run(index: int, first_week: int, last_week: int) -> List[RoadmapStep]:
+        async with limit:
+            prompt = build_phase_messages(profile, duration_weeks, outline["phases"], index, first_week, last_week)
+            return await generate_phase(or_client, profile, duration_weeks, prompt, first_week, last_week)
+
+    tasks = [asyncio.ensure_future(run(i, first, last)) for i, (first, last) in enumerate(ranges)]
+    try:
+        phases = await asyncio.gather(*tasks)
+    except Exception as e:
+        logger.error(f"ERROR in phased generation: {e!r}")
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    steps = [step for phase in phases for step in phase]
+    # Short phases leave gaps; renumber so weeks always run 1..n
+    for week, step in enumerate(steps, start=1):
+        step.week = week
+    logger.info(f"Merged {len(steps)} weeks from {len(ranges)} phases.")
+    return Roadmap(role=outline["role"], steps=steps)
+
+async def produce_roadmap(profile: UserProfile, allow_fallback: bool = True) -> Optional[Roadmap]:
+    duration_weeks = compute_duration_weeks(profile)
+    logger.info(f"Calculated duration_weeks: {duration_weeks}")
+
+    async def produce():
+        ai_roadmap = await generate_ai_roadmap(profile, duration_weeks)
+        return ai_roadmap.dict() if ai_roadmap else None
+
+    # Identical profiles share one cached roadmap / one in-flight generation.
+    # Fallback (mock) roadmaps are never cached.
+    with metrics.time_stage("generate"):
+        data = await roadmap_cache.get_or_create(roadmap_cache_key(profile, duration_weeks), produce)
+    if data:
+        return Roadmap(**data)
+    if not allow_fallback:
+        return None
+    metrics.mock_fallbacks.inc(reason="no_api_key" if llm.get_client() is None else "generation_failed")
+    return generate_mock_roadmap(profile)
+
+def job_summary(job: dict) -> dict:
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "attempts": job["attempts"],
+        "error": job.get("error"),
+        "result": job.get("result"),
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+
+async def run_roadmap_job(job: dict, report) -> dict:
+    profile = UserProfile(**job["payload"])
+    logger.info(f"Job {job['job_id']}: generating roadmap for {profile.target_role}")
+    await report("generating", 10)
+
+    # Transient LLM failures are retried by the queue; only the last attempt
+    # (or a missing API key) falls back to mock data like the sync path does.
+    allow_fallback = llm.get_client() is None or job_queue.is_final_attempt(job)
+    roadmap = await produce_roadmap(profile, allow_fallback=allow_fallback)
+    if roadmap is None:
+        raise RuntimeError("AI roadmap generation failed")
+
+    await report("saving", 90)
+    await save_roadmap(job["user_email"], roadmap)
+    return roadmap.dict()
+
+@app.post("/generate-roadmap", response_model=Roadmap)
+async def generate_roadmap(profile: UserProfile, background: bool = False, current_user: dict = Depends(get_current_user)):
+    logger.info(f"Generating roadmap for {profile.target_role}")
+
+    if background:
+        # Queued jobs are already capped by the worker pool; only the per-user budget applies
+        try:
+            admission.check_user(current_user["email"])
+        except Rejected as e:
+            raise too_many_requests(e)
+        try:
+            job = await job_queue.submit(current_user["email"], profile.dict())
+        except QueueFull:
+            raise HTTPException(status_code=503, detail="Roadmap queue is full, try again shortly")
+        logger.info(f"Queued roadmap job {job['job_id']}")
+        return JSONResponse(status_code=202, content=job_summary(job))
+
+    try:
+        slot = await admission.admit(current_user["email"])
+    except Rejected as e:
+        raise too_many_requests(e)
+    async with slot:
+        roadmap = await produce_roadmap(profile)
+    await save_roadmap(current_user["email"], roadmap)
+    return roadmap
+
+@app.get("/roadmap/jobs/{job_id}")
+async def get_roadmap_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await job_queue.get(job_id)
+    if not job or job["user_email"] != current_user["email"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_summary(job)
+
+@app.post("/generate-roadmap/stream")
+async def generate_roadmap_stream(profile: UserProfile, current_user: dict = Depends(get_current_user)):
+    """Server-sent events variant of /generate-roadmap.
+
+    Emits a `start` event, one `step` event per week as soon as it has been
+    parsed and validated from the token stream, and a final `done` event with
+    the full (enriched, persisted) roadmap.
+    """
+    # Admitted before the response starts so a rejection is still a plain 429
+    try:
+        slot = await admission.admit(current_user["email"])
+    except Rejected as e:
+        raise too_many_requests(e)
+
+    async def event_stream():
+        or_client = llm.get_client()
+        duration_weeks = compute_duration_weeks(profile)
+        logger.info(f"Streaming roadmap for {profile.target_role} ({duration_weeks} weeks)")
+        yield sse_event("start", {"role": profile.target_role, "duration_weeks": duration_weeks})
+
+        cache_key = roadmap_cache_key(profile, duration_weeks)
+        cached = roadmap_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Serving streamed roadmap from profile cache.")
+            roadmap = Roadmap(**cached)
+            for step in roadmap.steps:
+                yield sse_event("step", step.dict())
+            await save_roadmap(current_user["email"], roadmap)
+            yield sse_event("done", roadmap.dict())
+            return
+
+        steps = []
+        role = None
+        parser = None
+        if or_client is None:
+            logger.warning("No valid OPENROUTER_API_KEY found. Falling back to Mock Data.")
+        else:
+            parser = StepStreamParser()
+            started = time.perf_counter()
+            try:
+                stream = await llm.complete(
+                    or_client, llm.get_model(), build_roadmap_messages(profile, duration_weeks),
+                    max_tokens=steps_max_tokens(duration_weeks),
+                    schema=response_schema("roadmap"), schema_name="roadmap",
+                    stream=True
+                )
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    for raw_step in parser.feed(chunk.choices[0].delta.content or ""):
+                        try:
+                            step = RoadmapStep(**raw_step)
+                        except Exception as e:
+                            metrics.parse_failures.inc(source="stream_step")
+                            logger.warning(f"Skipping invalid streamed step: {e}")
+                            continue
+                        steps.append(step)
+                        yield sse_event("step", step.dict())
+                role = parser.role()
+            except Exception as e:
+                logger.error(f"ERROR in OpenRouter stream: {e}")
+            # Wall time of the whole token stream; steps reach the client as they land
+            metrics.stage_seconds.observe(time.perf_counter() - started, stage="llm_stream")
+
+        if steps:
+            logger.info(f"Streamed {len(steps)} weeks of AI data.")
+            missing = missing_weeks(steps, 1, duration_weeks)
+            if missing:
+                # Truncated or short stream: re-ask for just the missing weeks
+                merged = await fill_missing_weeks(or_client, profile, duration_weeks, steps, missing)
+                sent = {id(step) for step in steps}
+                for step in merged:
+                    if id(step) not in sent:
+                        yield sse_event("step", step.dict())
+                steps = merged
+            roadmap = Roadmap(role=role or profile.target_role, steps=steps)
+            await enrich_roadmap(roadmap, profile)
+            if parser.finished or not missing_weeks(steps, 1, duration_weeks):
+                roadmap_cache.put(cache_key, roadmap.dict())
+        else:
+            # Nothing usable came back; weeks already sent can't be retracted,
+            # but if none were sent the simulated roadmap is streamed instead.
+            metrics.mock_fallbacks.inc(reason="no_api_key" if or_client is None else "generation_failed")
+            roadmap = generate_mock_roadmap(profile)
+            for step in roadmap.steps:
+                yield sse_event("step", step.dict())
+
+        await save_roadmap(current_user["email"], roadmap)
+        yield sse_event("done", roadmap.dict())
+
+    async def admitted_stream():
+        try:
+            async for event in event_stream():
+                yield event
+        finally:
+            slot.release()
+
+    # The background task covers a client that disconnects before the body starts
+    return StreamingResponse(
+        admitted_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(slot.release),
+    )
+
+async def load_roadmap(email: str, weeks: Optional[tuple] = None) -> Optional[dict]:
+    # Steps are stored in week order (weeks 1..N), so a range maps onto $slice
+    projection = None
+    if weeks:
+        first, last = weeks
+        projection = {"_id": 0, "steps": {"$slice": [first - 1, last - first + 1]}}
     roadmap = None
     try:
-        roadmap = await db.roadmaps.find_one({"user_email": current_user["email"]})
+        roadmap = await db.roadmaps.find_one({"user_email": email}, projection)
     except Exception:
-        pass
-        
-    if not roadmap:
-        roadmap = MOCK_ROADMAPS.get(current_user["email"])
-        
+        metrics.db_fallbacks.inc(operation="get_roadmap")
+
     if not roadmap:
-        raise HTTPException(status_code=404, detail="Roadmap not found")
+        roadmap = MOCK_ROADMAPS.get(email)
+        if roadmap and weeks:
+            roadmap = {**roadmap, "steps": roadmap["steps"][first - 1:last]}
+    if roadmap and weeks:
+        roadmap["steps"] = [s for s in roadmap.get("steps", []) if first <= s.get("week", 0) <= last]
     return roadmap
 
+async def load_roadmap_version(email: str):
+    """The stored roadmap's `version` (None if missing, unversioned or the DB is unavailable)."""
+    try:
+        roadmap = await db.roadmaps.find_one({"user_email": email}, {"_id": 0, "version": 1})
+    except Exception:
+        return None
+    return (roadmap or {}).get("version")
+
+@app.get("/roadmap", response_model=Roadmap)
+async def get_roadmap(request: Request, weeks: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """The user's roadmap (or `?weeks=a-b` of it) as cached JSON with an ETag."""
+    email = current_user["email"]
+    try:
+        week_range = parse_week_range(weeks)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="weeks must be a range like 3-6")
+
+    # A one-field read, so another worker's write is seen on the next poll
+    version = roadmap_responses.version(email)
+    cached = roadmap_responses.get(email, week_range, await load_roadmap_version(email))
+    if cached is not None:
+        etag, body = cached
+    else:
+        roadmap = await load_roadmap(email, week_range)
+        if not roadmap:
+            raise HTTPException(status_code=404, detail="Roadmap not found")
+        # Validated once per fill instead of once per poll
+        body = Roadmap(**roadmap).json().encode()
+        etag = roadmap_responses.put(email, week_range, body, version, roadmap.get("version"))
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        roadmap_responses.counters["not_modified"] += 1
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
 @app.put("/roadmap/progress")
 async def update_progress(step_update: dict, current_user: dict = Depends(get_current_user)):
+    try:
+        return await apply_progress(step_update, current_user["email"])
+    finally:
+        # After the write, so a concurrent GET can't re-cache the old body
+        roadmap_responses.invalidate(current_user["email"])
+
+async def apply_progress(step_update: dict, email: str):
     # step_update expects { "week": 1, "completed": true }
     week = step_update.get("week")
-    completed = step_update.get("completed")
-    
+    completed = bool(step_update.get("completed"))
+
     try:
+        # Only matches when the week actually flips, so the counter $inc can't drift
         result = await db.roadmaps.update_one(
-            {"user_email": current_user["email"], "steps.week": week},
-            {"$set": {"steps.$.completed": completed}}
+            {
+                "user_email": email,
+                "stats.total": {"$exists": True},
+                "steps": {"$elemMatch": {"week": week, "completed": {"$ne": completed}}}
+            },
+            {
+                "$set": {"steps.$.completed": completed},
+                "$inc": {"stats.completed": 1 if completed else -1, "version": 1}
+            }
         )
-        if result.modified_count == 0:
-             raise Exception("No DB mod")
+        if result.matched_count == 0:
+            # Already in that state, unknown week, or a legacy doc without counters
+            roadmap = await db.roadmaps.find_one({"user_email": email})
+            if not roadmap or not any(s.get("week") == week for s in roadmap.get("steps", [])):
+                raise Exception("No DB match")
+            if "stats" not in roadmap:
+                for step in roadmap["steps"]:
+                    if step.get("week") == week:
+                        step["completed"] = completed
+                await db.roadmaps.update_one(
+                    {"user_email": email},
+                    {"$set": {"steps": roadmap["steps"], "stats": progress_counters(roadmap["steps"])},
+                     "$inc": {"version": 1}}
+                )
     except Exception as e:
-        print(f"WARNING: DB Update failed ({e}). Using Mock.")
-        roadmap = MOCK_ROADMAPS.get(current_user["email"])
+        logger.warning(f"DB Update failed ({e}). Using Mock.")
+        metrics.db_fallbacks.inc(operation="progress")
+        roadmap = MOCK_ROADMAPS.get(email)
         if roadmap:
             for step in roadmap["steps"]:
                 if step["week"] == week:
                     step["completed"] = completed
+                    roadmap["stats"] = progress_counters(roadmap["steps"])
                     return {"message": "Progress updated (Mock)"}
         raise HTTPException(status_code=400, detail="Update failed")
         
     return {"message": "Progress updated"}
 
 
+def plan_progress_batch(steps: List[dict], updates: List[ProgressUpdate]):
+    """Work out per-week results and which weeks actually flip.
+
+    Later entries for the same week win. Returns (results, to_complete, to_reopen).
+    """
+    current = {s.get("week"): bool(s.get("completed", False)) for s in steps}
+    wanted = {}
+    for u in updates:
+        wanted[u.week] = u.completed
+    results, to_complete, to_reopen = [], [], []
+    for week, completed in wanted.items():
+        if week not in current:
+            result = "not_found"
+        elif current[week] == completed:
+            result = "unchanged"
+        else:
+            result = "updated"
+            (to_complete if completed else to_reopen).append(week)
+        results.append({"week": week, "completed": completed, "result": result})
+    return results, to_complete, to_reopen
+
+@app.put("/roadmap/progress/batch")
+async def update_progress_batch(batch: BatchProgressUpdate, current_user: dict = Depends(get_current_user)):
+    try:
+        return await apply_progress_batch(batch, current_user["email"])
+    finally:
+        roadmap_responses.invalidate(current_user["email"])
+
+async def apply_progress_batch(batch: BatchProgressUpdate, email: str):
+    """Apply many {week, completed} updates with one read and one update_one."""
+    try:
+        # One retry covers a concurrent single-week update between read and write
+        for _ in range(2):
+            roadmap = await db.roadmaps.find_one(
+                {"user_email": email}, {"_id": 0, "steps.week": 1, "steps.completed": 1, "stats": 1}
+            )
+            if not roadmap:
+                raise Exception("No DB roadmap")
+            results, to_complete, to_reopen = plan_progress_batch(roadmap.get("steps", []), batch.updates)
+            if not to_complete and not to_reopen:
+                return {"message": "Progress updated", "results": results}
+
+            # Guard: every flipped week must still be in the state we read
+            query = {"user_email": email, "$and": [
+                {"steps": {"$elemMatch": {"week": week, "completed": {"$ne": True}}}} for week in to_complete
+            ] + [
+                {"steps": {"$elemMatch": {"week": week, "completed": True}}} for week in to_reopen
+            ]}
+            update = {"$set": {}, "$inc": {"version": 1}}
+            array_filters = []
+            if to_complete:
+                update["$set"]["steps.$[done].completed"] = True
+                array_filters.append({"done.week": {"$in": to_complete}})
+            if to_reopen:
+                update["$set"]["steps.$[reopen].completed"] = False
+                array_filters.append({"reopen.week": {"$in": to_reopen}})
+            if "stats" in roadmap:
+                query["stats.total"] = {"$exists": True}
+                update["$inc"]["stats.completed"] = len(to_complete) - len(to_reopen)
+            else:
+                # Legacy document: write the counters for the first time
+                flipped = {w: True for w in to_complete}
+                flipped.update({w: False for w in to_reopen})
+                steps = [{"completed": flipped.get(s.get("week"), s.get("completed", False))}
+                         for s in roadmap.get("steps", [])]
+                query["stats"] = {"$exists": False}
+                update["$set"]["stats"] = progress_counters(steps)
+
+            result = await db.roadmaps.update_one(query, update, array_filters=array_filters)
+            if result.matched_count:
+                return {"message": "Progress updated", "results": results}
+        raise HTTPException(status_code=409, detail="Roadmap changed during update, retry")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.warning(f"DB Batch update failed ({e}). Using Mock.")
+        metrics.db_fallbacks.inc(operation="progress_batch")
+        roadmap = MOCK_ROADMAPS.get(email)
+        if not roadmap:
+            raise HTTPException(status_code=400, detail="Update failed")
+        results, to_complete, to_reopen = plan_progress_batch(roadmap["steps"], batch.updates)
+        for step in roadmap["steps"]:
+            if step["week"] in to_complete:
+                step["completed"] = True
+            elif step["week"] in to_reopen:
+                step["completed"] = False
+        roadmap["stats"] = progress_counters(roadmap["steps"])
+        return {"message": "Progress updated (Mock)", "results": results}
+
+
 def generate_mock_roadmap(profile: UserProfile) -> Roadmap:
     role = profile.target_role
-    print("NOTE: Generating SIMULATED roadmap (OpenRouter Key missing).")
+    logger.info("Generating SIMULATED roadmap.")
     steps = [
         RoadmapStep(
             week=1, 
@@ -476,7 +1177,10 @@ def generate_mock_roadmap(profile: UserProfile) -> Roadmap:
     return Roadmap(role=role, steps=steps)
 
 @app.get('/public/profile/{user_id}')
-async def get_public_profile(user_id: str):
+async def get_public_profile(user_id: str, fields: Optional[str] = None):
+    # fields=stats skips the step list entirely (share cards only need counters)
+    stats_only = fields == 'stats'
+    projection = {'_id': 0, 'role': 1, 'stats': 1} if stats_only else {'_id': 0}
     user = None
     roadmap = None
 
@@ -490,44 +1194,52 @@ async def get_public_profile(user_id: str):
     # Try MongoDB
     if not user and ObjectId.is_valid(user_id):
         try:
-            user = await db.users.find_one({'_id': ObjectId(user_id)})
+            user = await db.users.find_one({'_id': ObjectId(user_id)}, {'name': 1, 'email': 1})
         except Exception as e:
-            print(f'DB Error: {e}')
+            logger.warning(f'DB Error: {e}')
+            metrics.db_fallbacks.inc(operation="public_profile")
     
     if not user:
         raise HTTPException(status_code=404, detail='User not found')
 
     # Get Roadmap
     try:
-        roadmap = await db.roadmaps.find_one({'user_email': user['email']})
+        roadmap = await db.roadmaps.find_one({'user_email': user['email']}, projection)
     except:
-        pass
+        metrics.db_fallbacks.inc(operation="public_profile")
     
     if not roadmap:
         # Check Mock
         roadmap = MOCK_ROADMAPS.get(user['email'])
 
-    # Calculate Stats
-    total_steps = 0
-    completed_steps = 0
     role = 'Undecided'
+    counters = {'total': 0, 'completed': 0}
     
     if roadmap:
         role = roadmap.get('role', 'Undecided')
-        steps = roadmap.get('steps', [])
-        total_steps = len(steps)
-        completed_steps = sum(1 for s in steps if s.get('completed', False))
+        counters = roadmap.get('stats')
+        if not counters or 'total' not in counters:
+            # Legacy document saved before counters were denormalized
+            steps = roadmap.get('steps')
+            if steps is None:
+                steps = (await db.roadmaps.find_one({'user_email': user['email']}, {'steps': 1})
+                         or {}).get('steps', [])
+            counters = progress_counters(steps)
 
-    return {
+    total_steps = counters['total']
+    completed_steps = counters['completed']
+    response = {
         'name': user.get('name', 'Anonymous'),
         'role': role,
         'stats': {
             'total': total_steps,
             'completed': completed_steps,
             'percent': int((completed_steps / total_steps * 100) if total_steps > 0 else 0)
-        },
-        'roadmap': roadmap  # Return full roadmap for the timeline view
+        }
     }
+    if not stats_only:
+        response['roadmap'] = roadmap  # Return full roadmap for the timeline view
+    return response
 
 
 
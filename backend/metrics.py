@@ -0,0 +1,239 @@
+"""In-process latency histograms and counters, rendered in Prometheus text format.
+
+Covers each stage of the roadmap pipeline (LLM call, JSON parse, enrichment,
+save), every HTTP endpoint, and the fallback paths that otherwise only show
+up in the logs. Served on /metrics; /health carries a compact summary.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_str(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels.get(n, "")) for n in self.labelnames), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_label_str(self.labelnames, key)} {_fmt(value)}"
+
+    def summary(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        if not self.labelnames:
+            return items[0][1] if items else 0
+        return {"/".join(key): value for key, value in items}
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._lock = threading.Lock()
+        self._series: Dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels.get(n, "")) for n in self.labelnames))
+        return series[-1] if series else 0
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                le = f'le="{_fmt(bound)}"'
+                yield f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_label_str(self.labelnames, key)} {_fmt(series[-2])}"
+            yield f"{self.name}_count{_label_str(self.labelnames, key)} {series[-1]}"
+
+    def _quantile(self, series: list, q: float) -> float:
+        # Linear interpolation inside the bucket, like Prometheus' histogram_quantile
+        rank = q * series[-1]
+        cumulative, lower = 0, 0.0
+        for bound, n in zip(self.buckets, series):
+            if n and cumulative + n >= rank:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - cumulative) / n
+            cumulative += n
+            lower = bound if bound != float("inf") else lower
+        return lower
+
+    def summary(self) -> dict:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        out = {}
+        for key, series in items:
+            count = series[-1]
+            out["/".join(key) or "all"] = {
+                "count": count,
+                "avg_ms": round(series[-2] / count * 1000, 2) if count else 0.0,
+                "p50_ms": round(self._quantile(series, 0.5) * 1000, 2),
+                "p95_ms": round(self._quantile(series, 0.95) * 1000, 2),
+            }
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        return {metric.name: metric.summary() for metric in self._metrics}
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    "pathos_stage_duration_seconds", "Roadmap pipeline stage latency.", ["stage"])
+http_seconds = registry.histogram(
+    "pathos_http_request_duration_seconds", "HTTP request latency by route.", ["method", "route", "status"])
+mock_fallbacks = registry.counter(
+    "pathos_mock_roadmap_fallbacks_total", "Roadmaps served from generate_mock_roadmap.", ["reason"])
+parse_failures = registry.counter(
+    "pathos_llm_parse_failures_total", "LLM output that could not be parsed into a roadmap.", ["source"])
+enrichment_results = registry.counter(
+    "pathos_enrichment_results_total", "Enrichment searches by outcome.", ["result"])
+llm_repairs = registry.counter(
+    "pathos_llm_repairs_total", "Partially salvaged responses and re-asks for missing weeks.", ["kind"])
+llm_attempts = registry.counter(
+    "pathos_llm_attempts_total", "LLM requests per model by outcome (started/hedged/won/failed/cancelled).",
+    ["model", "outcome"])
+db_fallbacks = registry.counter(
+    "pathos_db_fallbacks_total", "Database operations that fell back to mock storage.", ["operation"])
+breaker_transitions = registry.counter(
+    "pathos_circuit_breaker_transitions_total", "Circuit breaker state changes.", ["breaker", "state"])
+admission_rejections = registry.counter(
+    "pathos_admission_rejections_total", "Roadmap generations rejected with 429 (rate/busy).", ["reason"])
+link_checks = registry.counter(
+    "pathos_link_checks_total", "Resource links checked by the background link checker.", ["verdict"])
+
+
+def time_stage(stage: str):
+    return stage_seconds.time(stage=stage)
+
+
+def health_summary() -> dict:
+    return {
+        "stages": stage_seconds.summary(),
+        "mock_fallbacks": mock_fallbacks.summary(),
+        "parse_failures": parse_failures.summary(),
+        "llm_attempts": llm_attempts.summary(),
+        "llm_repairs": llm_repairs.summary(),
+        "enrichment": enrichment_results.summary(),
+        "db_fallbacks": db_fallbacks.summary(),
+        "admission_rejections": admission_rejections.summary(),
+    }
+
+
+class MetricsMiddleware:
+    """Records a latency histogram per (method, route template, status)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Route templates keep the label set bounded (/public/profile/{user_id})
+            route = scope.get("route")
+            http_seconds.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status_code,
+            )
@@ -0,0 +1,118 @@
+"""Password hashing off the event loop.
+
+bcrypt at its default cost takes a few hundred milliseconds per call, so
+hashing and verification run in a dedicated, size-bounded thread pool (the
+bcrypt extension releases the GIL, so threads hash in parallel across cores).
+Work waiting for a thread is capped; beyond that callers get PasswordPoolBusy
+instead of an ever-growing queue. Queue depth and latency are tracked for
+/health.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))
+
+_pwd_context = None
+
+
+def get_pwd_context():
+    """The app's CryptContext; passlib is imported on first use, not at startup."""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING,
+                 context=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._context = context
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0      # submitted, waiting for a thread
+        self.in_flight = 0    # currently hashing
+        self.counters = {"completed": 0, "rejected": 0, "rehashed": 0, "max_pending": 0}
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+
+    @property
+    def context(self):
+        return self._context or get_pwd_context()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.counters["rejected"] += 1
+                raise PasswordPoolBusy()
+            self.pending += 1
+            self.counters["max_pending"] = max(self.counters["max_pending"], self.pending)
+        submitted = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            with self._lock:
+                self.pending -= 1
+                self.in_flight += 1
+            try:
+                return fn(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self.in_flight -= 1
+                    self.counters["completed"] += 1
+                    self._wait_total += started - submitted
+                    self._run_total += finished - started
+                    self._run_max = max(self._run_max, finished - started)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), run)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Verify `password`; the second item is a fresh hash if `hashed` is deprecated."""
+        verified, new_hash = await self._submit(self.context.verify_and_update, password, hashed)
+        if new_hash:
+            with self._lock:
+                self.counters["rehashed"] += 1
+        return verified, new_hash
+
+    def stats(self) -> dict:
+        with self._lock:
+            done = self.counters["completed"]
+            return {
+                "workers": self.workers,
+                "pending": self.pending,
+                "in_flight": self.in_flight,
+                **self.counters,
+                "avg_wait_ms": round(self._wait_total / done * 1000, 2) if done else 0.0,
+                "avg_run_ms": round(self._run_total / done * 1000, 2) if done else 0.0,
+                "max_run_ms": round(self._run_max * 1000, 2),
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hasher = PasswordHasher()
@@ -0,0 +1,117 @@
+"""Profile-keyed cache for generated roadmaps.
+
+Near-identical profiles (same role, skills, bandwidth and timeline once
+normalized and bucketed) share one generated roadmap. Concurrent requests
+for the same key are collapsed onto a single in-flight generation.
+
+Entries are stored as plain dicts with per-user state stripped (owner email,
+`completed` flags), and every read hands out a fresh deep copy, so one user's
+progress can never leak into another user's roadmap.
+"""
+import asyncio
+import copy
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+ROADMAP_CACHE_TTL = float(os.getenv("ROADMAP_CACHE_TTL", 6 * 3600))
+ROADMAP_CACHE_MAX_ENTRIES = int(os.getenv("ROADMAP_CACHE_MAX_ENTRIES", 500))
+ROADMAP_CACHE_HOURS_BUCKET = int(os.getenv("ROADMAP_CACHE_HOURS_BUCKET", 5))
+# Weeks change the number of steps, so they are matched exactly by default
+ROADMAP_CACHE_WEEKS_BUCKET = int(os.getenv("ROADMAP_CACHE_WEEKS_BUCKET", 1))
+
+
+def _bucket(value: int, size: int) -> int:
+    size = max(size, 1)
+    return (max(value, 0) + size - 1) // size * size
+
+
+def _norm(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def profile_cache_key(role: str, skills: Iterable[str], hours_per_week: int, duration_weeks: int) -> str:
+    skill_part = ",".join(sorted({_norm(s) for s in skills if _norm(s)}))
+    return "|".join([
+        _norm(role),
+        skill_part,
+        f"h{_bucket(hours_per_week, ROADMAP_CACHE_HOURS_BUCKET)}",
+        f"w{_bucket(duration_weeks, ROADMAP_CACHE_WEEKS_BUCKET)}",
+    ])
+
+
+def _sanitize(roadmap: dict) -> dict:
+    data = copy.deepcopy(roadmap)
+    data.pop("_id", None)
+    data.pop("user_email", None)
+    for step in data.get("steps", []):
+        step["completed"] = False
+    return data
+
+
+class RoadmapCache:
+    def __init__(self, ttl: float = ROADMAP_CACHE_TTL, max_entries: int = ROADMAP_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, roadmap dict)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(data)
+
+    def put(self, key: str, roadmap: dict):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.time() + self.ttl, _sanitize(roadmap))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_create(self, key: str, factory: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        """Return a cached roadmap for `key`, generating it at most once.
+
+        `factory` returns a roadmap dict, or None when generation fell back
+        to something that must not be cached.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            self.counters["hits"] += 1
+            return cached
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+        else:
+            self.counters["misses"] += 1
+            task = asyncio.create_task(self._generate(key, factory))
+            self._inflight[key] = task
+        # Shielded so one caller disconnecting doesn't cancel the others' result
+        data = await asyncio.shield(task)
+        return copy.deepcopy(data) if data is not None else None
+
+    async def _generate(self, key, factory):
+        try:
+            data = await factory()
+            if data is not None:
+                self.put(key, data)
+                return _sanitize(data)
+            return None
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {**self.counters, "entries": len(self._entries), "inflight": len(self._inflight)}
+
+
+roadmap_cache = RoadmapCache()
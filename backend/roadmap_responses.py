@@ -0,0 +1,111 @@
+"""Per-user cache of serialized GET /roadmap responses.
+
+The roadmap page polls /roadmap, and every poll used to read the whole
+document and re-validate each step through the response model. Here the
+validated JSON bytes are kept per user (and per `?weeks=` range), tagged
+with an ETag and the document's `version`. A poll then only reads that one
+field (a projected find_one) and is answered from the cache, or with 304 if
+its If-None-Match still matches, as long as the stored version is unchanged.
+
+Every write to a roadmap document `$inc`s its `version`, so a write made by
+another worker is noticed on the next poll. Writes in this process also call
+invalidate(), which drops the user's entries and bumps a local stamp. A read
+records the stamp before going to the database and only stores its result
+if no write happened meanwhile, so a slow read can never put a stale body
+back in the cache (this also covers the in-memory fallback store, which has
+no versions). The ETag is a digest of the body, so it stays valid across
+restarts and between workers.
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+ROADMAP_RESPONSE_CACHE_TTL = float(os.getenv("ROADMAP_RESPONSE_CACHE_TTL", 30))
+ROADMAP_RESPONSE_CACHE_MAX_USERS = int(os.getenv("ROADMAP_RESPONSE_CACHE_MAX_USERS", 5000))
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=10).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def parse_week_range(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """'3-6' -> (3, 6); a single week '4' -> (4, 4). Raises ValueError otherwise."""
+    if value is None:
+        return None
+    first, sep, last = value.partition("-")
+    first = int(first)
+    last = int(last) if sep else first
+    if first < 1 or last < first:
+        raise ValueError(f"invalid week range {value!r}")
+    return first, last
+
+
+class RoadmapResponseCache:
+    def __init__(self, ttl: float = ROADMAP_RESPONSE_CACHE_TTL,
+                 max_users: int = ROADMAP_RESPONSE_CACHE_MAX_USERS):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._users = OrderedDict()  # email -> {week range: (expires_at, doc_version, etag, body)}
+        # email -> write stamp from a global clock; forgotten stamps fold into _floor
+        self._versions = OrderedDict()
+        self._clock = 0
+        self._floor = 0
+        self.counters = {"hits": 0, "not_modified": 0, "misses": 0, "invalidations": 0, "stale_fills": 0}
+
+    def version(self, email: str) -> int:
+        return self._versions.get(email, self._floor)
+
+    def get(self, email: str, weeks: Optional[Tuple[int, int]] = None,
+            doc_version=None) -> Optional[Tuple[str, bytes]]:
+        """(etag, body) for a fresh entry filled from `doc_version` of the document, else None."""
+        entry = self._users.get(email, {}).get(weeks)
+        if entry is None or entry[0] < time.monotonic() or entry[1] != doc_version:
+            self.counters["misses"] += 1
+            return None
+        self._users.move_to_end(email)
+        self.counters["hits"] += 1
+        return entry[2], entry[3]
+
+    def put(self, email: str, weeks: Optional[Tuple[int, int]], body: bytes, version: int,
+            doc_version=None) -> str:
+        """Store `body` (read at `doc_version`) if `email` is still at `version`; returns its ETag either way."""
+        etag = make_etag(body)
+        if self.max_users <= 0 or self.ttl <= 0:
+            return etag
+        if self.version(email) != version:
+            # A write landed while this body was being read
+            self.counters["stale_fills"] += 1
+            return etag
+        self._users.setdefault(email, {})[weeks] = (time.monotonic() + self.ttl, doc_version, etag, body)
+        self._users.move_to_end(email)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return etag
+
+    def invalidate(self, email: str):
+        self._users.pop(email, None)
+        self._clock += 1
+        self._versions[email] = self._clock
+        self._versions.move_to_end(email)
+        self.counters["invalidations"] += 1
+        while len(self._versions) > max(self.max_users, 1):
+            # Raising the floor makes in-flight reads of forgotten users fail safe
+            _, stamp = self._versions.popitem(last=False)
+            self._floor = max(self._floor, stamp)
+
+    def stats(self) -> dict:
+        return {**self.counters, "users": len(self._users)}
+
+
+roadmap_responses = RoadmapResponseCache()
@@ -0,0 +1,145 @@
+"""Incremental, tolerant parsing of roadmap completions.
+
+The model streams a JSON object shaped like {"role": ..., "steps": [...]}.
+StepStreamParser is fed raw text deltas and hands back each element of the
+"steps" array as soon as its closing brace arrives, so weeks can be validated
+and pushed to the client long before the completion finishes.
+
+salvage_roadmap applies the same parser to a whole response: when the
+completion is truncated or malformed (missing closing brackets, trailing
+commas, markdown fences) every step that did complete is still recovered.
+"""
+import json
+import re
+from typing import List, Optional, Tuple
+
+_STEPS_START = re.compile(r'"steps"\s*:\s*\[')
+_ROLE = re.compile(r'"role"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_FENCE = re.compile(r"```[a-zA-Z]*")
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _strip_trailing_commas(text: str) -> str:
+    out = []
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == ",":
+            rest = text[i + 1:].lstrip()
+            if rest[:1] in ("}", "]"):
+                continue
+        out.append(ch)
+    return "".join(out)
+
+
+def loads_lenient(text: str):
+    """json.loads that also accepts trailing commas."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return json.loads(_strip_trailing_commas(text))
+
+
+def salvage_roadmap(text: str) -> Tuple[Optional[str], List[dict], bool]:
+    """Best-effort parse of a full completion: (role, step dicts, parsed_whole).
+
+    `parsed_whole` is False when only the complete steps could be recovered.
+    """
+    text = _FENCE.sub("", text or "")
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            data = loads_lenient(text[start:end + 1])
+        except ValueError:
+            data = None
+        if isinstance(data, dict) and isinstance(data.get("steps"), list):
+            role = data.get("role") if isinstance(data.get("role"), str) else None
+            return role, [step for step in data["steps"] if isinstance(step, dict)], True
+    parser = StepStreamParser()
+    steps = parser.feed(text)
+    return parser.role(), steps, False
+
+
+class StepStreamParser:
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._in_steps = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._obj_start = None
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Append a text delta and return any step objects completed by it."""
+        self.buffer += chunk
+        completed = []
+        if self._finished:
+            return completed
+
+        if not self._in_steps:
+            match = _STEPS_START.search(self.buffer)
+            if not match:
+                return completed
+            self._in_steps = True
+            self._pos = match.end()
+
+        buf = self.buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0 and ch == "{":
+                    self._obj_start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    # Closing bracket of the steps array itself
+                    self._finished = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._obj_start is not None:
+                    try:
+                        completed.append(loads_lenient(buf[self._obj_start:i + 1]))
+                    except ValueError:
+                        pass
+                    self._obj_start = None
+            i += 1
+        self._pos = i
+        return completed
+
+    @property
+    def finished(self) -> bool:
+        """True once the closing bracket of the steps array has been seen."""
+        return self._finished
+
+    def role(self) -> Optional[str]:
+        match = _ROLE.search(self.buffer)
+        if not match:
+            return None
+        try:
+            return json.loads(f'"{match.group(1)}"')
+        except ValueError:
+            return None
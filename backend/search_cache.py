@@ -0,0 +1,174 @@
+"""TTL cache for resource-search lookups.
+
+Keys are normalized search queries. An in-process LRU answers repeat lookups
+without leaving the process; a SQLite file behind it keeps results across
+restarts and between workers. Empty results are cached too (for a shorter
+TTL) so queries with no hit don't get searched again on every roadmap.
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+SEARCH_CACHE_PATH = os.getenv(
+    "SEARCH_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_cache.db"),
+)
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 5000))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", 7 * 24 * 3600))
+SEARCH_CACHE_NEGATIVE_TTL = float(os.getenv("SEARCH_CACHE_NEGATIVE_TTL", 6 * 3600))
+
+MISS = object()
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class SearchCache:
+    def __init__(
+        self,
+        path: Optional[str] = SEARCH_CACHE_PATH,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+        ttl: float = SEARCH_CACHE_TTL,
+        negative_ttl: float = SEARCH_CACHE_NEGATIVE_TTL,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lru = OrderedDict()  # key -> (expires_at, url or None)
+        # The LRU is read on the event loop; SQLite work runs in threads and may
+        # wait on disk, so it has its own lock and never holds up a memory lookup.
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn = None
+        self.counters = {"memory_hits": 0, "durable_hits": 0, "negative_hits": 0, "misses": 0, "stores": 0}
+
+    @property
+    def durable(self) -> bool:
+        return bool(self.path)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "query TEXT PRIMARY KEY, url TEXT, expires_at REAL NOT NULL)"
+            )
+            conn.execute("DELETE FROM search_cache WHERE expires_at < ?", (time.time(),))
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key: str, expires_at: float, url: Optional[str]):
+        self._lru[key] = (expires_at, url)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _count_hit(self, tier: str, url: Optional[str]):
+        self.counters[tier] += 1
+        if url is None:
+            self.counters["negative_hits"] += 1
+
+    def get_memory(self, query: str):
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return MISS
+            expires_at, url = entry
+            if expires_at < time.time():
+                del self._lru[key]
+                return MISS
+            self._lru.move_to_end(key)
+            self._count_hit("memory_hits", url)
+            return url
+
+    def get_durable(self, query: str):
+        if not self.durable:
+            return MISS
+        key = normalize_query(query)
+        with self._db_lock:
+            row = self._connection().execute(
+                "SELECT url, expires_at FROM search_cache WHERE query = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return MISS
+        url, expires_at = row
+        with self._lock:
+            self._remember(key, expires_at, url)
+            self._count_hit("durable_hits", url)
+        return url
+
+    def get(self, query: str):
+        """Return the cached URL (None for a cached empty result) or MISS."""
+        url = self.get_memory(query)
+        if url is MISS:
+            url = self.get_durable(query)
+        if url is MISS:
+            self.record_miss()
+        return url
+
+    def record_miss(self):
+        with self._lock:
+            self.counters["misses"] += 1
+
+    def set(self, query: str, url: Optional[str]):
+        key = normalize_query(query)
+        expires_at = time.time() + (self.ttl if url else self.negative_ttl)
+        with self._lock:
+            self._remember(key, expires_at, url or None)
+            self.counters["stores"] += 1
+        if self.durable:
+            with self._db_lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO search_cache (query, url, expires_at) VALUES (?, ?, ?)",
+                    (key, url or None, expires_at),
+                )
+                conn.commit()
+
+    def stats(self) -> dict:
+        hits = self.counters["memory_hits"] + self.counters["durable_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": len(self._lru),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class CachedSearchBackend:
+    """Search backend wrapper that consults a SearchCache before searching."""
+
+    def __init__(self, backend, cache: SearchCache):
+        self.backend = backend
+        self.cache = cache
+
+    async def search(self, query: str) -> Optional[str]:
+        url = self.cache.get_memory(query)
+        if url is MISS and self.cache.durable:
+            # SQLite reads may touch disk, keep them off the event loop
+            url = await asyncio.to_thread(self.cache.get_durable, query)
+        if url is not MISS:
+            return url
+        self.cache.record_miss()
+
+        url = await self.backend.search(query)
+        if self.cache.durable:
+            await asyncio.to_thread(self.cache.set, query, url)
+        else:
+            self.cache.set(query, url)
+        return url
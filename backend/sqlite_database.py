@@ -0,0 +1,315 @@
+"""Durable Simulation Mode storage: the mock collections backed by a SQLite file.
+
+MockDatabase keeps everything in one process's memory, so `uvicorn --workers N`
+gives every worker its own users and roadmaps and a restart loses them all.
+SQLiteDatabase exposes the same collection API (query, projection and update
+semantics come from MockCollection) but keeps documents in a SQLite file in
+WAL mode, which any number of worker processes can share.
+
+Documents are stored as extended JSON (ObjectIds and dates round-trip), one
+row per document. Index entries live in their own table, keyed by the same
+values MockCollection indexes, with a partial UNIQUE index per unique field,
+so uniqueness holds across processes. Each write runs inside BEGIN IMMEDIATE,
+which makes read-modify-write updates ($inc, positional `$`) atomic between
+workers. Nothing is cached in memory: every read sees other workers' commits.
+
+sqlite3 calls block (a write may wait up to busy_timeout for another process's
+lock), so every collection operation runs as one call on the database's own
+single worker thread, holding the connection lock only inside that thread.
+The event loop keeps serving other requests while a write waits, and database
+work never queues behind other users of the default executor (search lookups).
+"""
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+
+from bson import json_util
+
+from database import MockCollection, duplicate_key_error
+
+# Indexes every deployment relies on, matching MockDatabase
+DEFAULT_INDEXES = (("users", "email", True), ("roadmaps", "user_email", True))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    coll TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (coll, seq)
+);
+CREATE TABLE IF NOT EXISTS idx (
+    coll TEXT NOT NULL,
+    field TEXT NOT NULL,
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lookup ON idx (coll, field, key);
+CREATE INDEX IF NOT EXISTS idx_by_doc ON idx (coll, seq);
+CREATE TABLE IF NOT EXISTS indexes (
+    coll TEXT NOT NULL,
+    field TEXT NOT NULL,
+    is_unique INTEGER NOT NULL,
+    PRIMARY KEY (coll, field)
+);
+"""
+
+
+def _dumps(value) -> str:
+    return json_util.dumps(value)
+
+
+def _loads(text: str):
+    return json_util.loads(text)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class SQLiteCollection(MockCollection):
+    def __init__(self, database: "SQLiteDatabase", name: str):
+        self._db = database
+        self._name = name
+        self._indexes = {}  # field -> {"unique": bool}
+        self._load_indexes()
+        if "_id" not in self._indexes:
+            self.ensure_index("_id", unique=True)
+
+    def _conn(self) -> sqlite3.Connection:
+        return self._db.connection()
+
+    def _load_indexes(self):
+        rows = self._conn().execute("SELECT field, is_unique FROM indexes WHERE coll = ?", (self._name,))
+        for field, unique in rows:
+            self._indexes.setdefault(field, {"unique": bool(unique)})
+
+    @property
+    def data(self):
+        rows = self._conn().execute("SELECT doc FROM docs WHERE coll = ? ORDER BY seq", (self._name,))
+        return [_loads(doc) for doc, in rows]
+
+    # --- Indexes ---
+
+    def ensure_index(self, field, unique=False):
+        self._load_indexes()  # another worker may have created it already
+        if field in self._indexes:
+            return f"{field}_1"
+        with self._db.transaction() as conn:
+            if unique:
+                conn.execute(
+                    f"CREATE UNIQUE INDEX IF NOT EXISTS {_quote(f'uniq_{self._name}_{field}')} "
+                    f"ON idx (key) WHERE coll = {_quote_literal(self._name)} AND field = {_quote_literal(field)}"
+                )
+            conn.execute("INSERT OR IGNORE INTO indexes (coll, field, is_unique) VALUES (?, ?, ?)",
+                         (self._name, field, int(unique)))
+            conn.execute("DELETE FROM idx WHERE coll = ? AND field = ?", (self._name, field))
+            for seq, text in conn.execute("SELECT seq, doc FROM docs WHERE coll = ?", (self._name,)).fetchall():
+                self._write_keys(conn, field, _loads(text), seq)
+        self._indexes[field] = {"unique": unique}
+        return f"{field}_1"
+
+    def _write_keys(self, conn, field, doc, seq):
+        keys = {_dumps(value) for value in self._index_values(doc, field)}
+        try:
+            conn.executemany("INSERT INTO idx (coll, field, key, seq) VALUES (?, ?, ?, ?)",
+                             [(self._name, field, key, seq) for key in keys])
+        except sqlite3.IntegrityError:
+            raise duplicate_key_error(f"E11000 duplicate key error dup key: {{ {field}: {sorted(keys)} }}")
+
+    # --- Storage ---
+
+    def _candidates(self, query):
+        best = None
+        for key, cond in query.items():
+            if key not in self._indexes:
+                continue
+            if isinstance(cond, dict) and set(cond) == {"$eq"}:
+                cond = cond["$eq"]
+            if isinstance(cond, dict) and set(cond) == {"$in"}:
+                wanted = cond["$in"]
+            elif isinstance(cond, (dict, list)):
+                continue
+            else:
+                wanted = [cond]
+            keys = [_dumps(v) for v in wanted]
+            marks = ",".join("?" * len(keys))
+            seqs = {seq for seq, in self._conn().execute(
+                f"SELECT seq FROM idx WHERE coll = ? AND field = ? AND key IN ({marks})",
+                (self._name, key, *keys))} if keys else set()
+            if best is None or len(seqs) < len(best):
+                best = seqs
+        if best is None:
+            return [seq for seq, in self._conn().execute(
+                "SELECT seq FROM docs WHERE coll = ? ORDER BY seq", (self._name,))]
+        return sorted(best)
+
+    def _get(self, seq):
+        row = self._conn().execute("SELECT doc FROM docs WHERE coll = ? AND seq = ?", (self._name, seq)).fetchone()
+        return _loads(row[0])
+
+    def _next_seq(self):
+        row = self._conn().execute("SELECT MAX(seq) FROM docs WHERE coll = ?", (self._name,)).fetchone()
+        return (row[0] or 0) + 1
+
+    def _remove(self, seq):
+        conn = self._conn()
+        conn.execute("DELETE FROM idx WHERE coll = ? AND seq = ?", (self._name, seq))
+        conn.execute("DELETE FROM docs WHERE coll = ? AND seq = ?", (self._name, seq))
+
+    def _store(self, seq, doc):
+        conn = self._conn()
+        conn.execute("DELETE FROM idx WHERE coll = ? AND seq = ?", (self._name, seq))
+        conn.execute("INSERT OR REPLACE INTO docs (coll, seq, doc) VALUES (?, ?, ?)",
+                     (self._name, seq, _dumps(doc)))
+        for field in self._indexes:
+            self._write_keys(conn, field, doc, seq)
+
+    # --- Operations: each runs off the event loop; writes are one transaction ---
+
+    async def find_one(self, query=None, projection=None):
+        return await self._db.run(self._find_one, query, projection)
+
+    def find(self, query=None, projection=None):
+        return SQLiteCursor(self, query, projection)
+
+    async def count_documents(self, query):
+        return await self._db.run(self._count, query)
+
+    async def create_index(self, keys, unique=False, **kwargs):
+        field = keys if isinstance(keys, str) else keys[0][0]
+        return await self._db.run(self.ensure_index, field, unique)
+
+    async def insert_one(self, document):
+        return await self._db.run(self._insert_one, document, write=True)
+
+    async def replace_one(self, query, document, upsert=False):
+        return await self._db.run(self._replace_one, query, document, upsert, write=True)
+
+    async def update_one(self, query, update, upsert=False, array_filters=None):
+        return await self._db.run(self._update_one, query, update, upsert, array_filters, write=True)
+
+    async def delete_one(self, query):
+        return await self._db.run(self._delete_one, query, write=True)
+
+
+class SQLiteCursor:
+    """Runs the query in a worker thread when the results are first awaited."""
+
+    def __init__(self, collection: SQLiteCollection, query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._limit = 0
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    async def _load(self):
+        items = await self._collection._db.run(self._collection._find, self._query, self._projection)
+        return items[:self._limit] if self._limit else items
+
+    async def to_list(self, length=None):
+        items = await self._load()
+        return items if length is None else items[:length]
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for item in await self._load():
+            yield item
+
+
+class SQLiteDatabase:
+    """A Motor-like database over one SQLite file; the connection opens on first use."""
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._conn = None
+        self._collections = {}
+        # One connection per process; a write holds the lock for its whole transaction
+        self._lock = threading.RLock()
+        # Operations are serialized by the lock anyway; one thread is enough
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                           check_same_thread=False)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                    conn.executescript(SCHEMA)
+                    self._conn = conn
+                    for name, field, unique in DEFAULT_INDEXES:
+                        self[name].ensure_index(field, unique=unique)
+        return self._conn
+
+    async def run(self, fn, *args, write=False):
+        """Call fn(*args) on the database thread under the connection lock (in a transaction if `write`)."""
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), self._call, fn, args, write)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        return self._executor
+
+    def _call(self, fn, args, write):
+        if write:
+            with self.transaction():
+                return fn(*args)
+        with self._lock:
+            return fn(*args)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            conn = self.connection()
+            if conn.in_transaction:
+                # Nested (e.g. an upsert storing inside update_one): the outer one commits
+                yield conn
+                return
+            # IMMEDIATE takes the write lock up front, so read-modify-write can't interleave
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self.connection()
+            if name not in self._collections:
+                self._collections[name] = SQLiteCollection(self, name)
+        return self._collections[name]
+
+    async def command(self, name, *args, **kwargs):
+        await self.run(lambda: self.connection().execute("SELECT 1"))
+        return {"ok": 1.0}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                self._collections.clear()
@@ -0,0 +1,77 @@
+"""Cold-start benchmark: time from `import main` to the app being ready.
+
+Each run is a fresh interpreter (mock database, no log files) that imports
+main and enters the lifespan hook; "ready" is the moment startup finishes.
+It also checks that the heavy, first-use-only dependencies stayed out of the
+import. Exits non-zero when the median ready time exceeds the budget or one of
+those modules was imported eagerly, so a regression fails CI.
+
+    python startup_benchmark.py --runs 5 --budget 1.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import List
+
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", 1.5))
+# Loaded on first use (or warmed in the background), never by `import main`
+LAZY_MODULES = ("openai", "motor", "pymongo", "passlib", "duckduckgo_search", "jose")
+
+PROBE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+eager = [m for m in %r if m in sys.modules]
+
+async def ready():
+    async with main.lifespan(main.app):
+        return time.perf_counter()
+
+ready_at = asyncio.run(ready())
+print(json.dumps({"import_s": imported - started, "ready_s": ready_at - started, "eager": eager}))
+""" % (LAZY_MODULES,)
+
+
+def probe_once() -> dict:
+    env = {**os.environ, "USE_MOCK_DB": "true", "LOG_FILE": "", "LOG_STDOUT": "false"}
+    env.pop("MONGODB_URL", None)
+    out = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, env=env, timeout=60,
+                         cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure_startup(runs: int = 5) -> dict:
+    samples: List[dict] = [probe_once() for _ in range(runs)]
+    return {
+        "runs": runs,
+        "import_s": round(statistics.median(s["import_s"] for s in samples), 4),
+        "ready_s": round(statistics.median(s["ready_s"] for s in samples), 4),
+        "max_ready_s": round(max(s["ready_s"] for s in samples), 4),
+        "eager_modules": sorted({m for s in samples for m in s["eager"]}),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_SECONDS,
+                        help="max median import-to-ready seconds")
+    args = parser.parse_args(argv)
+    result = measure_startup(args.runs)
+    print(json.dumps(result, indent=2))
+    failed = False
+    if result["eager_modules"]:
+        print(f"FAIL: imported at startup: {', '.join(result['eager_modules'])}")
+        failed = True
+    if result["ready_s"] > args.budget:
+        print(f"FAIL: median ready time {result['ready_s']:.3f}s exceeds the {args.budget:.3f}s budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Non-blocking structured logging.
+
+Handlers never run on the event loop: every record goes through a bounded
+in-memory queue to a background listener thread, which writes JSON lines to
+stdout (for Render logs) and to a rotating log file. The request id of the
+request being handled is attached to each record before it is queued. If the
+writer falls behind and the queue fills up, records are dropped and counted
+instead of blocking the caller.
+"""
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "pathos.log")  # empty disables the file
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size").lower()  # "size" or "time"
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+LOG_STDOUT = os.getenv("LOG_STDOUT", "true").lower() == "true"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+_listener = None
+_queue_handler = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records when the queue is full."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Runs in the calling thread: capture what can't cross to the writer
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.request_id = request_id_var.get()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.stack_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _file_handler(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if LOG_ROTATION == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+        )
+    return logging.handlers.RotatingFileHandler(
+        path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+    )
+
+
+def configure_logging(log_file=LOG_FILE, stdout=LOG_STDOUT, level=LOG_LEVEL, force=False):
+    """Install the queue handler on the root logger and start the writer thread.
+
+    A no-op if logging is already running, unless `force` is set.
+    """
+    global _listener, _queue_handler
+    with _lock:
+        if _listener is not None and not force:
+            return
+        _stop()
+        formatter = JsonFormatter()
+        handlers = []
+        if stdout:
+            handlers.append(logging.StreamHandler(sys.stdout))
+        if log_file:
+            handlers.append(_file_handler(log_file))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        _queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.handlers = [h for h in root.handlers if not isinstance(h, DroppingQueueHandler)]
+        root.addHandler(_queue_handler)
+
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers)
+        _listener.start()
+
+
+def _stop():
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()  # drains the queue before returning
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+def shutdown_logging():
+    with _lock:
+        _stop()
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+class RequestIdMiddleware:
+    """Assigns each HTTP request an id (honouring X-Request-ID) and echoes it back."""
+
+    def __init__(self, app, header: str = "x-request-id"):
+        self.app = app
+        self.header = header.encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == self.header:
+                request_id = value.decode("latin-1")[:64]
+                break
+        if not request_id:
+            request_id = os.urandom(8).hex()
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(self.header, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
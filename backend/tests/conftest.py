@@ -0,0 +1,105 @@
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+# Tests import the backend modules (main, database, ...) as top-level modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Don't leave log files behind in the working directory
+os.environ.setdefault("LOG_FILE", "")
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    # Process-wide caches and limits; keep tests from serving each other's roadmaps and users
+    import main
+    from admission import AdmissionController
+    from roadmap_cache import RoadmapCache
+    from roadmap_responses import RoadmapResponseCache
+    from ttl_cache import TTLCache
+
+    monkeypatch.setattr(main, "roadmap_cache", RoadmapCache())
+    monkeypatch.setattr(main, "roadmap_responses", RoadmapResponseCache())
+    monkeypatch.setattr(main, "token_cache", TTLCache(main.AUTH_CACHE_MAX_ENTRIES, main.AUTH_CACHE_TTL))
+    monkeypatch.setattr(main, "user_cache", TTLCache(main.AUTH_CACHE_MAX_ENTRIES, main.AUTH_CACHE_TTL))
+    monkeypatch.setattr(main, "admission", AdmissionController())
+
+
+# --- Shared helpers for API tests ---
+
+PROFILE = {"target_role": "QA Engineer", "salary_range": "$90k", "timeline": "1 month",
+           "current_skills": ["Selenium"], "hours_per_week": 5}
+
+ROADMAP_JSON = json.dumps({
+    "role": "Python Backend Developer",
+    "steps": [
+        {"week": 1, "title": "APIs", "description": "FastAPI basics",
+         "resources": [{"title": "Docs", "url": "https://fastapi.tiangolo.com/"}]},
+        {"week": 2, "title": "DBs", "description": "SQL",
+         "resources": [{"title": "SQL", "url": "https://sqlbolt.com/"}]},
+    ],
+})
+
+
+@pytest.fixture
+def fresh_db(monkeypatch):
+    import database
+    import main
+
+    db = database.MockDatabase()
+    monkeypatch.setattr(main, "db", db)
+    monkeypatch.setattr(database, "db", db)
+    monkeypatch.setattr(main.llm, "get_client", lambda: None)
+    return db
+
+
+@pytest.fixture
+def call():
+    """call(*requests) runs (method, url, kwargs) requests in order against the app and returns the responses."""
+    import main
+
+    def call(*requests):
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                return [await ac.request(method, url, **kwargs) for method, url, kwargs in requests]
+        return asyncio.run(run())
+    return call
+
+
+@pytest.fixture
+def auth():
+    """auth(email) -> Authorization header for that user."""
+    import main
+
+    return lambda email: {"Authorization": f"Bearer {main.create_access_token({'sub': email})}"}
+
+
+@pytest.fixture
+def profile():
+    return dict(PROFILE)
+
+
+@pytest.fixture
+def roadmap_json():
+    """A valid two-week roadmap as an LLM would return it."""
+    return ROADMAP_JSON
+
+
+@pytest.fixture
+def seed_roadmap():
+    """seed_roadmap(db, email, weeks, stats) stores a user with an unstarted roadmap; returns the user id."""
+    def seed(db, email="p@pathos.dev", weeks=4, stats=True):
+        user = {"name": "Pat", "email": email, "hashed_password": "x"}
+        asyncio.run(db.users.insert_one(user))
+        doc = {"user_email": email, "role": "Dev",
+               "steps": [{"week": w, "title": f"W{w}", "description": "", "resources": [], "completed": False}
+                         for w in range(1, weeks + 1)]}
+        if stats:
+            doc["stats"] = {"total": weeks, "completed": 0}
+        asyncio.run(db.roadmaps.insert_one(doc))
+        return str(user["_id"])
+    return seed
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+import main
+from admission import AdmissionController, ConcurrencyLimiter, Rejected, TokenBucketLimiter
+
+
+def test_token_bucket_allows_a_burst_then_reports_the_wait():
+    bucket = TokenBucketLimiter(rate_per_minute=6, burst=2)
+    assert bucket.try_acquire("a") == 0
+    assert bucket.try_acquire("a") == 0
+    wait = bucket.try_acquire("a")
+    assert 9 < wait <= 10  # one token every 10s
+    assert bucket.try_acquire("b") == 0  # buckets are per key
+    bucket.refund("a")
+    assert bucket.try_acquire("a") == 0
+
+
+def test_token_bucket_forgets_the_least_recently_seen_users():
+    bucket = TokenBucketLimiter(rate_per_minute=1, burst=1, max_keys=2)
+    for user in ("a", "b", "c"):
+        bucket.try_acquire(user)
+    assert bucket.stats()["tracked_users"] == 2
+
+
+def test_zero_rate_disables_the_per_user_limit():
+    controller = AdmissionController(rate_per_minute=0, burst=1)
+    for _ in range(5):
+        controller.check_user("a")
+
+
+def test_slots_pass_to_waiters_in_order_and_overflow_is_rejected():
+    async def run():
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_waiting=1, max_wait=5)
+        first = await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as rejected:
+            await limiter.acquire()
+        assert rejected.value.reason == "busy"
+        first.release()
+        second = await waiting
+        assert limiter.in_flight == 1
+        second.release()
+        second.release()  # idempotent
+        return limiter.stats()
+
+    stats = asyncio.run(run())
+    assert stats["in_flight"] == 0
+    assert stats["admitted"] == 2
+    assert stats["rejected_full"] == 1
+
+
+def test_waiting_too_long_is_rejected():
+    async def run():
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_waiting=4, max_wait=0.05)
+        held = await limiter.acquire()
+        with pytest.raises(Rejected):
+            await limiter.acquire()
+        held.release()
+        return limiter.stats()
+
+    stats = asyncio.run(run())
+    assert stats["rejected_timeout"] == 1
+    assert stats["waiting"] == 0 and stats["in_flight"] == 0
+
+
+def test_busy_rejection_does_not_spend_the_users_token():
+    async def run():
+        controller = AdmissionController(rate_per_minute=1, burst=1, max_concurrent=1, max_waiting=0)
+        held = await controller.admit("a")
+        with pytest.raises(Rejected):
+            await controller.admit("b")
+        held.release()
+        (await controller.admit("b")).release()
+
+    asyncio.run(run())
+
+
+def test_generate_returns_429_with_retry_after(fresh_db, monkeypatch, call, auth, profile):
+    monkeypatch.setattr(main, "admission", AdmissionController(rate_per_minute=1, burst=1))
+    main.MOCK_USERS.append({"name": "Q", "email": "q@pathos.dev", "hashed_password": "x"})
+    try:
+        request = ("POST", "/generate-roadmap", {"json": profile, "headers": auth("q@pathos.dev")})
+        first, second, queued = call(request, request,
+                                     ("POST", "/generate-roadmap?background=true", request[2]))
+    finally:
+        main.MOCK_USERS.pop()
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert 50 <= int(second.headers["Retry-After"]) <= 60
+    assert queued.status_code == 429
+    assert main.admission.slots.in_flight == 0
+
+
+def test_stream_releases_its_slot(fresh_db, monkeypatch, call, auth, profile):
+    monkeypatch.setattr(main, "admission", AdmissionController(max_concurrent=1, max_waiting=0))
+    main.MOCK_USERS.append({"name": "Q", "email": "q@pathos.dev", "hashed_password": "x"})
+    try:
+        request = ("POST", "/generate-roadmap/stream", {"json": profile, "headers": auth("q@pathos.dev")})
+        responses = call(request, request)
+    finally:
+        main.MOCK_USERS.pop()
+    assert [r.status_code for r in responses] == [200, 200]
+    assert main.admission.slots.in_flight == 0
+    assert main.admission.stats()["global"]["admitted"] == 2
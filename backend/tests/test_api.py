@@ -0,0 +1,103 @@
+import asyncio
+
+import database
+import main
+
+
+def test_startup_creates_unique_indexes(fresh_db):
+    fresh_db.users._indexes.pop("email")
+    asyncio.run(database.ensure_indexes())
+    assert fresh_db.users._indexes["email"]["unique"]
+    assert fresh_db.roadmaps._indexes["user_email"]["unique"]
+    assert fresh_db.roadmap_jobs._indexes["job_id"]["unique"]
+
+
+def test_duplicate_registration_is_rejected_by_the_index(fresh_db, call):
+    user = {"name": "Q", "email": "q@pathos.dev", "password": "pw"}
+    first, second = call(("POST", "/register", {"json": user}), ("POST", "/register", {"json": user}))
+    assert first.status_code == 200
+    assert second.status_code == 400
+    assert asyncio.run(fresh_db.users.count_documents({})) == 1
+
+
+def test_regenerating_upserts_a_single_roadmap(fresh_db, call, auth, profile):
+    main.MOCK_USERS.append({"name": "Q", "email": "q@pathos.dev", "hashed_password": "x"})
+    try:
+        responses = call(*[("POST", "/generate-roadmap", {"json": profile, "headers": auth("q@pathos.dev")})] * 2)
+    finally:
+        main.MOCK_USERS.pop()
+    assert all(r.status_code == 200 for r in responses)
+    assert asyncio.run(fresh_db.roadmaps.count_documents({"user_email": "q@pathos.dev"})) == 1
+
+
+def test_progress_updates_keep_denormalized_counters(fresh_db, call, auth, seed_roadmap):
+    user_id = seed_roadmap(fresh_db)
+    headers = auth("p@pathos.dev")
+    tick = lambda week, done: ("PUT", "/roadmap/progress", {"json": {"week": week, "completed": done},
+                                                          "headers": headers})
+    responses = call(tick(1, True), tick(2, True), tick(2, True), tick(1, False), tick(3, True),
+                     ("GET", f"/public/profile/{user_id}?fields=stats", {}))
+    assert all(r.status_code == 200 for r in responses[:-1])
+    assert responses[-1].json() == {"name": "Pat", "role": "Dev",
+                                    "stats": {"total": 4, "completed": 2, "percent": 50}}
+    assert asyncio.run(fresh_db.roadmaps.find_one({}))["stats"] == {"total": 4, "completed": 2}
+
+
+def test_full_public_profile_and_legacy_documents(fresh_db, call, auth, seed_roadmap):
+    user_id = seed_roadmap(fresh_db, stats=False)
+    tick = ("PUT", "/roadmap/progress", {"json": {"week": 4, "completed": True},
+                                         "headers": auth("p@pathos.dev")})
+    before, _, after = call(("GET", f"/public/profile/{user_id}", {}), tick,
+                            ("GET", f"/public/profile/{user_id}", {}))
+    assert before.json()["stats"]["completed"] == 0
+    assert after.json()["stats"] == {"total": 4, "completed": 1, "percent": 25}
+    assert len(after.json()["roadmap"]["steps"]) == 4
+    assert asyncio.run(fresh_db.roadmaps.find_one({}))["stats"] == {"total": 4, "completed": 1}
+
+
+def test_batch_progress_applies_all_weeks_in_one_write(fresh_db, monkeypatch, call, auth, seed_roadmap):
+    user_id = seed_roadmap(fresh_db, weeks=5)
+    writes = []
+    original = fresh_db.roadmaps.update_one
+
+    async def counting_update_one(*args, **kwargs):
+        writes.append(args)
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(fresh_db.roadmaps, "update_one", counting_update_one)
+    body = {"updates": [{"week": 1, "completed": True}, {"week": 2, "completed": True},
+                        {"week": 3, "completed": False}, {"week": 9, "completed": True},
+                        {"week": 4, "completed": True}, {"week": 4, "completed": False}]}
+    res, profile = call(("PUT", "/roadmap/progress/batch", {"json": body, "headers": auth("p@pathos.dev")}),
+                        ("GET", f"/public/profile/{user_id}", {}))
+
+    assert res.status_code == 200
+    assert {r["week"]: r["result"] for r in res.json()["results"]} == {
+        1: "updated", 2: "updated", 3: "unchanged", 9: "not_found", 4: "unchanged"}
+    assert len(writes) == 1
+    assert [s["completed"] for s in profile.json()["roadmap"]["steps"]] == [True, True, False, False, False]
+    assert profile.json()["stats"]["completed"] == 2
+
+    reset = {"updates": [{"week": w, "completed": False} for w in range(1, 6)]}
+    res, profile = call(("PUT", "/roadmap/progress/batch", {"json": reset, "headers": auth("p@pathos.dev")}),
+                        ("GET", f"/public/profile/{user_id}?fields=stats", {}))
+    assert profile.json()["stats"] == {"total": 5, "completed": 0, "percent": 0}
+    assert len(writes) == 2
+
+
+def test_batch_progress_in_mock_storage(fresh_db, monkeypatch, call, auth):
+    async def broken(*args, **kwargs):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(fresh_db.roadmaps, "find_one", broken)
+    main.MOCK_ROADMAPS["m@pathos.dev"] = {"role": "Dev", "steps": [
+        {"week": 1, "completed": False}, {"week": 2, "completed": False}]}
+    main.MOCK_USERS.append({"name": "M", "email": "m@pathos.dev", "hashed_password": "x"})
+    try:
+        body = {"updates": [{"week": 2, "completed": True}]}
+        res, = call(("PUT", "/roadmap/progress/batch", {"json": body, "headers": auth("m@pathos.dev")}))
+        assert res.json()["results"] == [{"week": 2, "completed": True, "result": "updated"}]
+        assert main.MOCK_ROADMAPS["m@pathos.dev"]["stats"] == {"total": 2, "completed": 1}
+    finally:
+        main.MOCK_USERS.pop()
+        main.MOCK_ROADMAPS.pop("m@pathos.dev")
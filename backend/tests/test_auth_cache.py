@@ -0,0 +1,49 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+class CountingUsers:
+    def __init__(self, users):
+        self.users = users
+        self.finds = 0
+
+    async def find_one(self, query):
+        self.finds += 1
+        return next((u for u in self.users if u["email"] == query["email"]), None)
+
+
+@pytest.fixture
+def users(monkeypatch):
+    collection = CountingUsers([{"name": "Ada", "email": "ada@pathos.dev", "hashed_password": "x"}])
+    monkeypatch.setattr(main.db, "users", collection)
+    return collection
+
+
+def test_repeat_requests_skip_decode_and_db(users):
+    token = main.create_access_token({"sub": "ada@pathos.dev"}, timedelta(minutes=5))
+    for _ in range(5):
+        assert asyncio.run(main.get_current_user(token))["name"] == "Ada"
+    assert users.finds == 1
+    assert main.user_cache.stats()["hits"] == 4
+    assert main.token_cache.stats()["hits"] == 4
+
+
+def test_user_changes_invalidate_the_cached_document(users):
+    token = main.create_access_token({"sub": "ada@pathos.dev"}, timedelta(minutes=5))
+    asyncio.run(main.get_current_user(token))
+    users.users[0] = {**users.users[0], "name": "Ada L."}
+    main.invalidate_user("ada@pathos.dev")
+    assert asyncio.run(main.get_current_user(token))["name"] == "Ada L."
+    assert users.finds == 2
+
+
+def test_expired_tokens_are_not_served_from_cache(users):
+    token = main.create_access_token({"sub": "ada@pathos.dev"}, timedelta(seconds=-1))
+    with pytest.raises(HTTPException):
+        asyncio.run(main.get_current_user(token))
+    assert len(main.token_cache) == 0
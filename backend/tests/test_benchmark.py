@@ -0,0 +1,41 @@
+import json
+
+import benchmark
+from bench_fakes import FakeSearchBackend
+
+
+def test_percentile_interpolates():
+    values = [0.1, 0.2, 0.3, 0.4, 0.5]
+    assert benchmark.percentile(values, 0.5) == 0.3
+    assert round(benchmark.percentile(values, 0.95), 3) == 0.48
+    assert benchmark.percentile([], 0.99) == 0.0
+
+
+def test_fake_search_is_deterministic():
+    import asyncio
+    backend = FakeSearchBackend(latency=0, miss_rate=0.5)
+    first = [asyncio.run(backend.search(f"q{i}")) for i in range(20)]
+    second = [asyncio.run(backend.search(f"q{i}")) for i in range(20)]
+    assert first == second
+    assert None in first and any(first)
+
+
+def test_short_run_reports_every_endpoint(tmp_path):
+    output = tmp_path / "result.json"
+    exit_code = benchmark.main([
+        "--concurrency", "2", "--duration", "1.5", "--weeks", "3",
+        "--llm-latency", "0.05", "--token-delay", "0", "--search-latency", "0",
+        "--mix", "roadmap=2,progress=2,profile=1,generate_stream=1",
+        "--output", str(output),
+    ])
+
+    result = json.loads(output.read_text())
+    assert exit_code == 0 and result["total_errors"] == 0
+    for name in ("register", "generate", "generate_stream", "generate_stream_first_step", "roadmap",
+                 "progress", "profile"):
+        endpoint = result["endpoints"][name]
+        assert endpoint["count"] > 0
+        assert endpoint["p50_ms"] <= endpoint["p95_ms"] <= endpoint["p99_ms"] <= endpoint["max_ms"]
+    assert result["fake_llm"]["requests"] >= 2
+    assert result["config"]["concurrency"] == 2
+    assert "stages" in result["server_metrics"]
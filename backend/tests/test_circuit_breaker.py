@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
+
+import database
+import main
+from circuit_breaker import CircuitBreaker, CircuitOpen
+
+
+class Down:
+    """A database whose every call fails like an unreachable MongoDB."""
+
+    def __init__(self):
+        self.calls = 0
+        self.up = False
+
+    def __getitem__(self, name):
+        return self
+
+    async def _fail(self, *args, **kwargs):
+        self.calls += 1
+        if not self.up:
+            raise ServerSelectionTimeoutError("no servers")
+        return None
+
+    find_one = insert_one = replace_one = update_one = command = _fail
+
+
+def test_trips_after_consecutive_failures_and_probe_closes_it():
+    async def scenario():
+        backend = Down()
+        breaker = CircuitBreaker("test", probe=backend.command, failure_types=database.mongo_transient_errors(),
+                                 failure_threshold=2, probe_interval=0.01)
+        for _ in range(2):
+            with pytest.raises(ServerSelectionTimeoutError):
+                await breaker.call(backend.find_one)
+        assert breaker.state == "open"
+
+        calls = backend.calls
+        with pytest.raises(CircuitOpen):
+            await breaker.call(backend.find_one)
+        assert backend.calls == calls  # rejected without touching the database
+
+        await asyncio.sleep(0.05)
+        assert breaker.state in ("open", "half_open") and breaker.counters["probe_failures"] >= 1
+        backend.up = True
+        await asyncio.sleep(0.05)
+        assert breaker.state == "closed"
+        await breaker.shutdown()
+        return breaker.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["trips"] == 1 and stats["rejected"] == 1
+
+
+def test_answers_from_the_database_reset_the_failure_count():
+    async def scenario():
+        breaker = CircuitBreaker("test", probe=None, failure_types=database.mongo_transient_errors(),
+                                 failure_threshold=2)
+
+        async def down():
+            raise ServerSelectionTimeoutError("no servers")
+
+        async def duplicate():
+            raise DuplicateKeyError("E11000")
+
+        for fn in (down, duplicate, down):
+            with pytest.raises(Exception):
+                await breaker.call(fn)
+        return breaker.state
+
+    assert asyncio.run(scenario()) == "closed"
+
+
+def test_an_open_circuit_serves_the_fallback_without_waiting(monkeypatch, call, auth):
+    backend = Down()
+    breaker = CircuitBreaker("database", probe=backend.command, failure_types=database.mongo_transient_errors(),
+                             failure_threshold=2, probe_interval=60)
+    monkeypatch.setattr(database, "breaker", breaker)
+    monkeypatch.setattr(main, "db", database.GuardedDatabase(backend, breaker))
+    monkeypatch.setattr(main.llm, "get_client", lambda: None)
+
+    responses = call(("GET", "/auth/me", {"headers": auth("demo@pathos.dev")}),
+                     ("GET", "/public/profile/demo", {}),
+                     ("POST", "/generate-roadmap", {"json": {
+                         "target_role": "QA", "salary_range": "$1", "timeline": "1 month",
+                         "current_skills": [], "hours_per_week": 5}, "headers": auth("demo@pathos.dev")}),
+                     ("GET", "/roadmap", {"headers": auth("demo@pathos.dev")}),
+                     ("GET", "/health", {}))
+    assert [r.status_code for r in responses] == [200, 200, 200, 200, 200]
+    assert backend.calls == 2  # only the calls that tripped it reached the database
+    health = responses[-1].json()
+    assert health["database_breaker"]["state"] == "open"
+    assert health["database_status"] == "Unavailable (circuit open)"
+    assert breaker.counters["rejected"] >= 2
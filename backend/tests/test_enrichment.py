@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import enrichment
+from main import Resource, Roadmap, RoadmapStep
+
+
+class FakeSearch:
+    def __init__(self, delay=0.05, slow=(), empty=(), fail=()):
+        self.delay = delay
+        self.slow = slow
+        self.empty = empty
+        self.fail = fail
+        self.queries = []
+        self.active = 0
+        self.max_active = 0
+
+    async def search(self, query):
+        self.queries.append(query)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            slow = any(s in query for s in self.slow)
+            await asyncio.sleep(10 if slow else self.delay)
+            if any(f in query for f in self.fail):
+                raise RuntimeError("search backend error")
+            if any(e in query for e in self.empty):
+                return None
+            return "https://example.com/" + query.split()[0].lower()
+        finally:
+            self.active -= 1
+
+
+def make_roadmap(titles_per_week):
+    steps = [
+        RoadmapStep(week=i + 1, title=f"Week {i + 1}", description="...",
+                    resources=[Resource(title=t) for t in titles])
+        for i, titles in enumerate(titles_per_week)
+    ]
+    return Roadmap(role="Backend Developer", steps=steps)
+
+
+def test_lookups_are_concurrent_but_bounded():
+    roadmap = make_roadmap([[f"Topic{w}{r}" for r in range(3)] for w in range(8)])
+    backend = FakeSearch(delay=0.05)
+
+    started = time.perf_counter()
+    stats = asyncio.run(enrichment.enrich_roadmap(roadmap, "Backend Developer", backend=backend,
+                                                  concurrency=6, query_timeout=1, deadline=5))
+    elapsed = time.perf_counter() - started
+
+    assert stats["queries"] == 24 and stats["linked"] == 24
+    assert backend.max_active == 6
+    assert elapsed < 24 * 0.05
+    assert all(r.url for s in roadmap.steps for r in s.resources)
+
+
+def test_duplicate_titles_share_one_lookup_and_existing_urls_are_kept():
+    roadmap = make_roadmap([["Official Docs", "Blog"], ["official  docs"]])
+    roadmap.steps[0].resources[1].url = "https://keep.me/"
+    backend = FakeSearch()
+
+    asyncio.run(enrichment.enrich_roadmap(roadmap, "Backend Developer", backend=backend))
+
+    assert backend.queries == ["Official Docs Backend Developer tutorial"]
+    assert roadmap.steps[1].resources[0].url == roadmap.steps[0].resources[0].url
+    assert roadmap.steps[0].resources[1].url == "https://keep.me/"
+
+
+def test_timeouts_failures_and_deadline_leave_resources_unenriched():
+    roadmap = make_roadmap([["Fast", "Slow", "Empty", "Broken"]])
+    backend = FakeSearch(slow=("Slow",), empty=("Empty",), fail=("Broken",))
+
+    started = time.perf_counter()
+    stats = asyncio.run(enrichment.enrich_roadmap(roadmap, "Dev", backend=backend,
+                                                  query_timeout=5, deadline=0.3))
+    assert time.perf_counter() - started < 1
+
+    urls = {r.title: r.url for r in roadmap.steps[0].resources}
+    assert urls["Fast"] and not urls["Slow"] and not urls["Empty"] and not urls["Broken"]
+    assert stats == {"queries": 4, "linked": 1, "missed": 1, "failed": 1, "timed_out": 1}
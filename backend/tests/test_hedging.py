@@ -0,0 +1,126 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import llm
+import main
+import metrics
+
+
+def run_hedged(behaviour, **kwargs):
+    """behaviour: model -> (delay, result or exception). Returns (winner, result, elapsed, log)."""
+    log = []
+
+    async def attempt(model):
+        delay, outcome = behaviour[model]
+        log.append(("start", model, round(time.perf_counter() - started, 2)))
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            log.append(("cancelled", model))
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    started = time.perf_counter()
+    model, result = asyncio.run(llm.hedged(attempt, **kwargs))
+    return model, result, time.perf_counter() - started, log
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    model, result, elapsed, log = run_hedged(
+        {"primary": (5, "slow"), "backup": (0.05, "fast")},
+        models=["primary", "backup"], hedge_after=0.1, deadline=5)
+    assert (model, result) == ("backup", "fast")
+    assert elapsed < 0.5
+    assert ("cancelled", "primary") in log
+
+
+def test_fast_primary_never_hedges():
+    model, _, _, log = run_hedged({"primary": (0.01, "ok"), "backup": (0, "unused")},
+                                  models=["primary", "backup"], hedge_after=0.5, deadline=5)
+    assert model == "primary"
+    assert [entry[1] for entry in log] == ["primary"]
+
+
+def test_failure_moves_on_without_waiting_for_the_hedge_delay():
+    model, _, elapsed, _ = run_hedged(
+        {"a": (0.01, ValueError("unparseable")), "b": (0.01, ValueError("down")), "c": (0.01, "ok")},
+        models=["a", "b", "c"], hedge_after=10, deadline=5)
+    assert model == "c"
+    assert elapsed < 1
+
+
+def test_all_failed_and_deadline():
+    with pytest.raises(llm.AllModelsFailed) as info:
+        run_hedged({"a": (0, ValueError("x")), "b": (0, ValueError("y"))},
+                   models=["a", "b"], hedge_after=1, deadline=5)
+    assert [m for m, _ in info.value.errors] == ["a", "b"]
+
+    started = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        run_hedged({"a": (5, "late"), "b": (5, "late")}, models=["a", "b"], hedge_after=0.05, deadline=0.2)
+    assert time.perf_counter() - started < 1
+
+
+def test_single_model_is_only_duplicated_when_opted_in(monkeypatch):
+    monkeypatch.delenv("OPENROUTER_MODELS", raising=False)
+    monkeypatch.setenv("OPENROUTER_MODEL", "only/model")
+    assert llm.get_models() == ["only/model"]
+    monkeypatch.setenv("OPENROUTER_MODELS", "a/one, b/two ,a/one")
+    assert llm.get_models() == ["a/one", "b/two"]
+
+    calls = []
+
+    async def attempt(model):
+        calls.append(model)
+        await asyncio.sleep(0.2 if len(calls) == 1 else 0.01)
+        return len(calls)
+
+    _, result = asyncio.run(llm.hedged(attempt, models=["only/model"], hedge_after=0.05, deadline=5))
+    assert calls == ["only/model"] and result == 1
+
+    calls.clear()
+    _, result = asyncio.run(llm.hedged(attempt, models=["only/model"], hedge_after=0.05, deadline=5,
+                                       same_model=True))
+    assert calls == ["only/model", "only/model"] and result == 2
+
+
+class PerModelCompletions:
+    """Primary answers with junk after a delay; the backup answers with a roadmap."""
+
+    def __init__(self, roadmap_json):
+        self.roadmap_json = roadmap_json
+        self.models = []
+
+    async def create(self, model, **kwargs):
+        self.models.append(model)
+        if model == "primary/model":
+            await asyncio.sleep(0.3)
+            content = "Sorry, no JSON today."
+        else:
+            content = self.roadmap_json
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_generation_uses_the_first_valid_model_instead_of_mock_data(fresh_db, monkeypatch, call, auth, profile,
+                                                                    roadmap_json):
+    completions = PerModelCompletions(roadmap_json)
+    monkeypatch.setattr(llm, "get_client", lambda: SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    monkeypatch.setenv("OPENROUTER_MODELS", "primary/model,backup/model")
+    monkeypatch.setattr(llm, "LLM_HEDGE_AFTER_SECONDS", 5)
+    main.MOCK_USERS.append({"name": "H", "email": "h@pathos.dev", "hashed_password": "x"})
+    fallbacks = metrics.mock_fallbacks.value(reason="generation_failed")
+    try:
+        (res,) = call(("POST", "/generate-roadmap", {"json": profile, "headers": auth("h@pathos.dev")}))
+    finally:
+        main.MOCK_USERS.pop()
+
+    assert res.status_code == 200
+    assert res.json()["role"] == "Python Backend Developer"
+    # The junk answer failed fast, so the backup ran without waiting out the hedge delay
+    assert completions.models[:2] == ["primary/model", "backup/model"]
+    assert metrics.mock_fallbacks.value(reason="generation_failed") == fallbacks
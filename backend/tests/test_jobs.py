@@ -0,0 +1,142 @@
+import asyncio
+import time
+
+import httpx
+
+import database
+import jobs
+import main
+from jobs import JobQueue
+
+PROFILE = {"target_role": "SRE", "salary_range": "$150k", "timeline": "1 month",
+           "current_skills": ["Linux"], "hours_per_week": 8}
+
+
+def test_background_generation_returns_job_and_completes(monkeypatch):
+    monkeypatch.setattr(main.llm, "get_client", lambda: None)  # mock roadmap path
+    monkeypatch.setattr(main, "job_queue", JobQueue(workers=2))
+    token = main.create_access_token({"sub": "demo@pathos.dev"})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def run():
+        await main.job_queue.start(main.run_roadmap_job)
+        transport = httpx.ASGITransport(app=main.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                res = await ac.post("/generate-roadmap?background=true", json=PROFILE, headers=headers)
+                assert res.status_code == 202
+                job_id = res.json()["job_id"]
+                for _ in range(50):
+                    status = (await ac.get(f"/roadmap/jobs/{job_id}", headers=headers)).json()
+                    if status["status"] == "succeeded":
+                        break
+                    await asyncio.sleep(0.02)
+                other = main.create_access_token({"sub": "someone@else.dev"})
+                main.MOCK_USERS.append({"email": "someone@else.dev", "hashed_password": "x"})
+                forbidden = await ac.get(f"/roadmap/jobs/{job_id}",
+                                         headers={"Authorization": f"Bearer {other}"})
+                return status, forbidden
+        finally:
+            main.MOCK_USERS[:] = [u for u in main.MOCK_USERS if u["email"] != "someone@else.dev"]
+            await main.job_queue.stop()
+
+    status, forbidden = asyncio.run(run())
+    assert status["status"] == "succeeded" and status["progress"] == 100
+    assert status["result"]["role"] == "SRE"
+    assert forbidden.status_code == 404
+
+
+def test_failed_attempts_are_retried_with_backoff(monkeypatch):
+    monkeypatch.setattr(database, "db", database.MockDatabase())
+    calls = []
+
+    async def flaky(job, report):
+        calls.append(job["attempts"])
+        if len(calls) < 3:
+            raise RuntimeError("upstream 502")
+        return {"ok": True}
+
+    async def run():
+        queue = JobQueue(workers=1, max_attempts=3, retry_base=0.01)
+        await queue.start(flaky)
+        job = await queue.submit("a@b.dev", {})
+        for _ in range(100):
+            if job["status"] == jobs.SUCCEEDED:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert calls == [0, 1, 2]
+    assert job["status"] == jobs.SUCCEEDED and job["attempts"] == 3
+
+
+def test_interrupted_jobs_are_recovered_on_restart(monkeypatch):
+    monkeypatch.setattr(database, "db", database.MockDatabase())
+    done = []
+
+    async def hang(job, report):
+        await asyncio.sleep(10)
+
+    async def finish(job, report):
+        done.append(job["job_id"])
+        return {}
+
+    async def run():
+        first = JobQueue(workers=1)
+        await first.start(hang)
+        job = await first.submit("a@b.dev", {})
+        await asyncio.sleep(0.02)
+        assert job["status"] == jobs.RUNNING
+        await first.stop()  # simulated worker restart
+
+        second = JobQueue(workers=1)
+        await second.start(finish)
+        for _ in range(50):
+            if done:
+                break
+            await asyncio.sleep(0.01)
+        await second.stop()
+        return job["job_id"], await second.get(job["job_id"])
+
+    job_id, recovered = asyncio.run(run())
+    assert done == [job_id]
+    assert recovered["status"] == jobs.SUCCEEDED
+
+
+def job_doc(job_id, status=jobs.QUEUED, **fields):
+    now = time.time()
+    return {"job_id": job_id, "user_email": "a@b.dev", "payload": {}, "status": status, "stage": status,
+            "progress": 0, "attempts": 0, "error": None, "result": None, "created_at": now,
+            "updated_at": now, "next_attempt_at": now, **fields}
+
+
+def test_workers_sharing_the_collection_run_each_job_once(monkeypatch):
+    db = database.MockDatabase()
+    monkeypatch.setattr(database, "db", db)
+    runs = []
+
+    async def record(job, report):
+        runs.append(job["job_id"])
+        await asyncio.sleep(0.01)
+        return {}
+
+    async def run():
+        for i in range(6):
+            await db.roadmap_jobs.insert_one(job_doc(f"q{i}"))
+        # Owner is alive (lease in the future) / owner died (lease expired)
+        await db.roadmap_jobs.insert_one(job_doc("live", jobs.RUNNING, owner="other", lease_until=time.time() + 60))
+        await db.roadmap_jobs.insert_one(job_doc("orphan", jobs.RUNNING, owner="gone", lease_until=time.time() - 1))
+        workers = [JobQueue(workers=2) for _ in range(3)]
+        await asyncio.gather(*(w.start(record) for w in workers))
+        for _ in range(100):
+            if await db.roadmap_jobs.count_documents({"status": jobs.SUCCEEDED}) == 7:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*(w.stop() for w in workers))
+        return await db.roadmap_jobs.find_one({"job_id": "live"})
+
+    live = asyncio.run(run())
+    assert sorted(runs) == sorted([f"q{i}" for i in range(6)] + ["orphan"])
+    assert live["status"] == jobs.RUNNING and live["owner"] == "other"
@@ -0,0 +1,189 @@
+import asyncio
+import socket
+from collections import Counter
+
+import pytest
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import RedirectResponse
+
+from bench_fakes import BackgroundServer
+from database import MockDatabase
+from link_checker import ALIVE, DEAD, UNKNOWN, LinkChecker
+
+
+def stub_app(hits: Counter, in_flight: dict):
+    app = FastAPI()
+
+    @app.api_route("/ok", methods=["GET", "HEAD"])
+    async def ok(request: Request):
+        hits[("ok", request.method)] += 1
+        return Response("fine")
+
+    @app.api_route("/gone", methods=["GET", "HEAD"])
+    async def gone(request: Request):
+        hits[("gone", request.method)] += 1
+        return Response(status_code=404)
+
+    @app.get("/no-head")
+    async def no_head(request: Request):
+        hits[("no-head", request.method)] += 1
+        return Response("GET only")  # HEAD gets FastAPI's 405
+
+    @app.api_route("/flaky", methods=["GET", "HEAD"])
+    async def flaky():
+        return Response(status_code=503)
+
+    @app.api_route("/redirect", methods=["GET", "HEAD"])
+    async def redirect(to: str):
+        hits[("redirect", "any")] += 1
+        return RedirectResponse(to, status_code=302)
+
+    @app.api_route("/slow/{n}", methods=["GET", "HEAD"])
+    async def slow(n: int):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.05)
+        in_flight["now"] -= 1
+        return Response("slow")
+
+    return app
+
+
+@pytest.fixture(scope="module")
+def stub():
+    hits, in_flight = Counter(), {"now": 0, "max": 0}
+    server = BackgroundServer(stub_app(hits, in_flight), lifespan="off").start()
+    yield server, hits, in_flight
+    server.stop()
+
+
+def loopback_only(ip) -> bool:
+    """The stub server lives on 127.0.0.1, which the default policy refuses."""
+    return ip.is_loopback
+
+
+def closed_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_verdicts_use_head_then_get_and_are_cached(stub):
+    server, hits, _ = stub
+    refused = f"http://127.0.0.1:{closed_port()}/x"
+
+    async def scenario():
+        checker = LinkChecker(address_allowed=loopback_only, timeout=2)
+        urls = [f"{server.url}/ok", f"{server.url}/gone", f"{server.url}/no-head", f"{server.url}/flaky", refused]
+        first = await checker.check_many(urls + ["", "mailto:a@b.c"])
+        again = await checker.check_many(urls)
+        await checker.close()
+        return first, again, checker
+
+    first, again, checker = asyncio.run(scenario())
+    assert first == {f"{server.url}/ok": ALIVE, f"{server.url}/gone": DEAD, f"{server.url}/no-head": ALIVE,
+                     f"{server.url}/flaky": UNKNOWN, refused: DEAD}
+    assert again == first
+    assert hits[("ok", "HEAD")] == 1 and hits[("ok", "GET")] == 0
+    assert hits[("no-head", "GET")] == 1  # HEAD refused, fell back to GET
+    assert checker.counters["checked"] == 5  # the second pass came from the cache
+
+
+def test_requests_are_bounded_per_host(stub):
+    server, _, in_flight = stub
+    in_flight["max"] = 0
+
+    async def scenario():
+        checker = LinkChecker(address_allowed=loopback_only, per_host=2, concurrency=16)
+        verdicts = await checker.check_many(f"{server.url}/slow/{n}" for n in range(8))
+        await checker.close()
+        return verdicts
+
+    assert set(asyncio.run(scenario()).values()) == {ALIVE}
+    assert in_flight["max"] == 2
+
+
+def roadmap(email, urls):
+    return {"user_email": email, "role": "Dev", "stats": {"total": 1, "completed": 0},
+            "steps": [{"week": 1, "title": "W1", "description": "", "completed": True,
+                       "resources": [{"title": f"R{i}", "url": u} for i, u in enumerate(urls)]}]}
+
+
+def test_scan_rewrites_dead_links_and_invalidates(stub):
+    server, _, _ = stub
+    db = MockDatabase()
+    changed = []
+
+    async def search(title, role):
+        return f"{server.url}/ok?q={title}" if title == "R1" else f"{server.url}/gone"
+
+    async def scenario():
+        await db.roadmaps.insert_one(roadmap("a@pathos.dev", [f"{server.url}/ok", f"{server.url}/gone",
+                                                              f"{server.url}/gone", ""]))
+        await db.roadmaps.insert_one(roadmap("b@pathos.dev", [f"{server.url}/no-head"]))
+        checker = LinkChecker(address_allowed=loopback_only, search=search)
+        stats = await checker.scan(db.roadmaps, on_change=changed.append)
+        await checker.close()
+        return stats, await db.roadmaps.find_one({"user_email": "a@pathos.dev"})
+
+    stats, doc = asyncio.run(scenario())
+    resources = doc["steps"][0]["resources"]
+    assert resources[0] == {"title": "R0", "url": f"{server.url}/ok"}
+    assert resources[1] == {"title": "R1", "url": f"{server.url}/ok?q=R1", "link_status": "replaced"}
+    assert resources[2] == {"title": "R2", "url": "", "link_status": "dead"}  # search found nothing alive
+    assert resources[3] == {"title": "R3", "url": ""}
+    assert doc["steps"][0]["completed"] is True  # progress untouched
+    assert changed == ["a@pathos.dev"]
+    assert stats["rewritten"] == 1 and stats["flagged"] == 1 and stats["roadmaps_updated"] == 1
+
+
+def test_flag_mode_keeps_urls_and_offline_scans_change_nothing(stub):
+    server, _, _ = stub
+    db, offline_db = MockDatabase(), MockDatabase()
+    unreachable = f"http://127.0.0.1:{closed_port()}"
+
+    async def scenario():
+        await db.roadmaps.insert_one(roadmap("f@pathos.dev", [f"{server.url}/gone", f"{server.url}/ok"]))
+        flagger = LinkChecker(address_allowed=loopback_only, action="flag")
+        await flagger.scan(db.roadmaps)
+        await flagger.close()
+
+        # No link reachable at all looks like no network: nothing changes, nothing is remembered
+        await offline_db.roadmaps.insert_one(roadmap("o@pathos.dev", [f"{unreachable}/a", f"{unreachable}/b"]))
+        offline = LinkChecker(address_allowed=loopback_only)
+        stats = await offline.scan(offline_db.roadmaps)
+        await offline.close()
+        return (await db.roadmaps.find_one({"user_email": "f@pathos.dev"}),
+                await offline_db.roadmaps.find_one({"user_email": "o@pathos.dev"}), stats, len(offline.verdicts))
+
+    flagged, offline_doc, stats, cached = asyncio.run(scenario())
+    assert flagged["steps"][0]["resources"][0] == {"title": "R0", "url": f"{server.url}/gone", "link_status": "dead"}
+    assert flagged["steps"][0]["resources"][1] == {"title": "R1", "url": f"{server.url}/ok"}
+    assert offline_doc["steps"][0]["resources"][0] == {"title": "R0", "url": f"{unreachable}/a"}
+    assert stats["roadmaps_updated"] == 0 and cached == 0
+
+
+def test_private_addresses_and_redirects_into_them_are_never_requested(stub):
+    server, hits, _ = stub
+    before = hits[("ok", "HEAD")] + hits[("ok", "GET")]
+
+    async def scenario():
+        public_only = LinkChecker()
+        direct = await public_only.check_many([f"{server.url}/ok", "http://localhost:9/", "http://10.0.0.1/",
+                                               "http://169.254.169.254/latest/meta-data/", "http://[::1]/"])
+        await public_only.close()
+
+        checker = LinkChecker(address_allowed=loopback_only)
+        redirects = await checker.check_many([
+            f"{server.url}/redirect?to=/ok",
+            f"{server.url}/redirect?to=http://169.254.169.254/latest/meta-data/",
+        ])
+        await checker.close()
+        return direct, public_only.counters["blocked"], redirects, checker.counters["blocked"]
+
+    direct, blocked, redirects, redirect_blocked = asyncio.run(scenario())
+    assert set(direct.values()) == {UNKNOWN} and blocked == 5
+    assert hits[("ok", "HEAD")] + hits[("ok", "GET")] == before + 1  # only via the allowed redirect
+    assert list(redirects.values()) == [ALIVE, UNKNOWN] and redirect_blocked == 1
@@ -0,0 +1,67 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+
+import llm
+import main
+
+PROFILE = {
+    "target_role": "Python Backend Developer",
+    "salary_range": "$120,000",
+    "timeline": "2 weeks",
+    "current_skills": ["Python"],
+    "hours_per_week": 10,
+}
+
+class FakeCompletions:
+    def __init__(self, delay, roadmap_json):
+        self.delay = delay
+        self.roadmap_json = roadmap_json
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        message = SimpleNamespace(content=self.roadmap_json)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def test_get_client_is_reused_until_config_changes(monkeypatch):
+    monkeypatch.setattr(llm, "_DOTENV_PATH", "")
+    monkeypatch.setenv("OPENROUTER_API_KEY", "key-one")
+    first = llm.get_client()
+    assert first is not None
+    assert llm.get_client() is first
+
+    monkeypatch.setenv("OPENROUTER_API_KEY", "key-two")
+    second = llm.get_client()
+    assert second is not first
+    assert first in llm._retired_clients
+
+    monkeypatch.delenv("OPENROUTER_API_KEY")
+    assert llm.get_client() is None
+    asyncio.run(llm.shutdown())
+
+
+def test_concurrent_generations_overlap(monkeypatch, roadmap_json):
+    fake = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(0.5, roadmap_json)))
+    monkeypatch.setattr(llm, "get_client", lambda: fake)
+    token = main.create_access_token({"sub": "demo@pathos.dev"})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            started = time.perf_counter()
+            # Distinct roles so the profile cache can't collapse them into one call
+            responses = await asyncio.gather(*[
+                ac.post("/generate-roadmap", json={**PROFILE, "target_role": f"Role {i}"}, headers=headers)
+                for i in range(4)
+            ])
+            return responses, time.perf_counter() - started
+
+    responses, elapsed = asyncio.run(run())
+    assert all(r.status_code == 200 for r in responses)
+    assert all(len(r.json()["steps"]) == 2 for r in responses)
+    # Four 0.5s completions would take 2s+ if they ran one after another.
+    assert elapsed < 1.5
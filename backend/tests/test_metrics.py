@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+import llm
+import main
+import metrics
+
+
+def test_histogram_renders_cumulative_buckets_and_quantiles():
+    registry = metrics.Registry()
+    hist = registry.histogram("demo_seconds", "Demo.", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 2.0):
+        hist.observe(value, stage="llm")
+
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{stage="llm",le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{stage="llm",le="1"} 3' in text
+    assert 'demo_seconds_bucket{stage="llm",le="+Inf"} 4' in text
+    assert 'demo_seconds_count{stage="llm"} 4' in text
+    summary = hist.summary()["llm"]
+    assert summary["count"] == 4 and summary["p50_ms"] == 100.0
+
+
+class BadCompletions:
+    async def create(self, **kwargs):
+        message = SimpleNamespace(content="Sorry, I can't help with that.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def test_pipeline_stages_and_fallbacks_are_counted(fresh_db, monkeypatch, call, auth, profile):
+    fake = SimpleNamespace(chat=SimpleNamespace(completions=BadCompletions()))
+    monkeypatch.setattr(llm, "get_client", lambda: fake)
+    main.MOCK_USERS.append({"name": "M", "email": "m@pathos.dev", "hashed_password": "x"})
+    before = {
+        "llm": metrics.stage_seconds.count(stage="llm"),
+        "save": metrics.stage_seconds.count(stage="save"),
+        "parse": metrics.parse_failures.value(source="completion"),
+        "fallback": metrics.mock_fallbacks.value(reason="generation_failed"),
+    }
+    try:
+        generated, scraped, health = call(
+            ("POST", "/generate-roadmap", {"json": profile, "headers": auth("m@pathos.dev")}),
+            ("GET", "/metrics", {}),
+            ("GET", "/health", {}),
+        )
+    finally:
+        main.MOCK_USERS.pop()
+
+    assert generated.status_code == 200
+    assert metrics.stage_seconds.count(stage="llm") == before["llm"] + 1
+    assert metrics.stage_seconds.count(stage="save") == before["save"] + 1
+    # One model configured, so no hedge: the single request fails to parse
+    assert metrics.parse_failures.value(source="completion") == before["parse"] + 1
+    assert metrics.mock_fallbacks.value(reason="generation_failed") == before["fallback"] + 1
+
+    assert scraped.headers["content-type"].startswith("text/plain")
+    assert ('pathos_http_request_duration_seconds_count{method="POST",route="/generate-roadmap",status="200"}'
+            in scraped.text)
+    assert "llm" in health.json()["metrics"]["stages"]
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from database import MockCollection, MockDatabase
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def roadmap(email, weeks=4):
+    return {"user_email": email, "role": "Dev",
+            "steps": [{"week": w, "title": f"W{w}", "completed": False} for w in range(1, weeks + 1)]}
+
+
+def test_unique_indexes_reject_duplicates_and_assign_ids():
+    db = MockDatabase()
+    doc = {"email": "a@b.dev"}
+    result = run(db.users.insert_one(doc))
+    assert doc["_id"] == result.inserted_id
+    with pytest.raises(DuplicateKeyError):
+        run(db.users.insert_one({"email": "a@b.dev"}))
+    assert run(db.users.find_one({"_id": result.inserted_id}))["email"] == "a@b.dev"
+
+
+def test_indexed_lookups_stay_fast_with_many_documents():
+    db = MockDatabase()
+
+    async def scenario():
+        for i in range(20000):
+            await db.users.insert_one({"email": f"user{i}@pathos.dev", "name": f"User {i}"})
+        started = time.perf_counter()
+        for i in range(0, 20000, 20):
+            assert (await db.users.find_one({"email": f"user{i}@pathos.dev"}))["name"] == f"User {i}"
+        return time.perf_counter() - started
+
+    assert run(scenario()) < 0.5
+    assert db.users._candidates({"email": "user5@pathos.dev"}) == [6]
+
+
+def test_positional_set_targets_the_matched_week():
+    db = MockDatabase()
+    run(db.roadmaps.insert_one(roadmap("a@b.dev")))
+    result = run(db.roadmaps.update_one({"user_email": "a@b.dev", "steps.week": 3},
+                                        {"$set": {"steps.$.completed": True}}))
+    assert (result.matched_count, result.modified_count) == (1, 1)
+    again = run(db.roadmaps.update_one({"user_email": "a@b.dev", "steps.week": 3},
+                                       {"$set": {"steps.$.completed": True}}))
+    assert (again.matched_count, again.modified_count) == (1, 0)
+
+    doc = run(db.roadmaps.find_one({"user_email": "a@b.dev"}))
+    assert [s["completed"] for s in doc["steps"]] == [False, False, True, False]
+
+
+def test_array_filters_inc_and_nested_set():
+    coll = MockCollection()
+    run(coll.insert_one(roadmap("a@b.dev")))
+    run(coll.update_one({"user_email": "a@b.dev"},
+                        {"$set": {"steps.$[s].completed": True, "meta.source": "bulk"},
+                         "$inc": {"completed_count": 2}},
+                        array_filters=[{"s.week": {"$in": [1, 4]}}]))
+    doc = run(coll.find_one({"user_email": "a@b.dev"}))
+    assert [s["completed"] for s in doc["steps"]] == [True, False, False, True]
+    assert doc["completed_count"] == 2 and doc["meta"] == {"source": "bulk"}
+
+
+def test_upserts_and_replace():
+    coll = MockCollection()
+    coll.ensure_index("user_email", unique=True)
+    missing = run(coll.replace_one({"user_email": "x@y.dev"}, roadmap("x@y.dev")))
+    assert missing.matched_count == 0 and run(coll.count_documents({})) == 0
+
+    created = run(coll.replace_one({"user_email": "x@y.dev"}, {"role": "Dev", "steps": []}, upsert=True))
+    assert created.upserted_id is not None
+    assert run(coll.find_one({"user_email": "x@y.dev"}))["role"] == "Dev"
+
+    replaced = run(coll.replace_one({"user_email": "x@y.dev"}, roadmap("x@y.dev"), upsert=True))
+    assert replaced.matched_count == 1 and replaced.upserted_id is None
+    assert run(coll.find_one({"user_email": "x@y.dev"}))["_id"] == created.upserted_id
+
+    inserted = run(coll.update_one({"email": "n@e.dev"}, {"$set": {"name": "New"}}, upsert=True))
+    assert run(coll.find_one({"_id": inserted.upserted_id})) == {
+        "_id": inserted.upserted_id, "email": "n@e.dev", "name": "New"}
+
+
+def test_returned_documents_are_copies_and_projection_works():
+    coll = MockCollection()
+    run(coll.insert_one(roadmap("a@b.dev", weeks=6)))
+    doc = run(coll.find_one({"user_email": "a@b.dev"}))
+    doc["steps"].clear()
+    assert len(run(coll.find_one({"user_email": "a@b.dev"}))["steps"]) == 6
+
+    only_role = run(coll.find_one({"user_email": "a@b.dev"}, {"role": 1, "_id": 0}))
+    assert only_role == {"role": "Dev"}
+    sliced = run(coll.find_one({"user_email": "a@b.dev"}, {"steps": {"$slice": [2, 2]}}))
+    assert [s["week"] for s in sliced["steps"]] == [3, 4] and sliced["role"] == "Dev"
+
+
+def test_dotted_projection_reaches_into_arrays():
+    coll = MockCollection()
+    run(coll.insert_one(roadmap("a@b.dev", weeks=2)))
+    doc = run(coll.find_one({}, {"_id": 0, "steps.week": 1, "steps.completed": 1}))
+    assert doc == {"steps": [{"week": 1, "completed": False}, {"week": 2, "completed": False}]}
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+from passlib.context import CryptContext
+
+from passwords import PasswordHasher, PasswordPoolBusy
+
+
+def test_hashing_does_not_stall_the_event_loop():
+    hasher = PasswordHasher(workers=2)
+
+    async def run():
+        lags = []
+
+        async def ticker():
+            while True:
+                before = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lags.append(time.perf_counter() - before - 0.01)
+
+        tick = asyncio.create_task(ticker())
+        hashes = await asyncio.gather(*[hasher.hash(f"pw{i}") for i in range(4)])
+        verified = await hasher.verify_and_update("pw0", hashes[0])
+        tick.cancel()
+        return lags, verified
+
+    lags, (ok, new_hash) = asyncio.run(run())
+    hasher.shutdown()
+    assert ok and new_hash is None
+    # A single bcrypt call is ~100ms+; the loop kept ticking throughout
+    assert max(lags) < 0.05
+    stats = hasher.stats()
+    assert stats["completed"] == 5 and stats["pending"] == 0 and stats["avg_run_ms"] > 0
+
+
+def test_deprecated_hashes_are_upgraded():
+    context = CryptContext(schemes=["bcrypt", "md5_crypt"], deprecated="auto")
+    hasher = PasswordHasher(workers=1, context=context)
+    legacy = context.handler("md5_crypt").hash("password")
+
+    ok, new_hash = asyncio.run(hasher.verify_and_update("password", legacy))
+    hasher.shutdown()
+    assert ok and new_hash.startswith("$2b$")
+    assert hasher.stats()["rehashed"] == 1
+
+
+def test_backlog_beyond_the_bound_is_rejected():
+    hasher = PasswordHasher(workers=1, max_pending=2)
+
+    async def run():
+        return await asyncio.gather(*[hasher.hash("pw") for _ in range(4)], return_exceptions=True)
+
+    results = asyncio.run(run())
+    hasher.shutdown()
+    assert sum(isinstance(r, PasswordPoolBusy) for r in results) >= 1
+    assert hasher.stats()["rejected"] >= 1
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import re
+import time
+from types import SimpleNamespace
+
+import llm
+import main
+from bench_fakes import fake_outline, fake_roadmap
+
+PROFILE = main.UserProfile(target_role="Data Engineer", salary_range="$130k", timeline="6 months",
+                           current_skills=["SQL"], hours_per_week=10)
+
+
+class PromptCompletions:
+    """Answers outline and phase prompts; `junk` maps a first week to how many bad answers it gets first."""
+
+    def __init__(self, delay=0.2, junk=None, outline_ok=True):
+        self.delay = delay
+        self.junk = dict(junk or {})
+        self.outline_ok = outline_ok
+        self.calls = []
+
+    async def create(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        await asyncio.sleep(self.delay)
+        phases = re.search(r"EXACTLY (\d+) phases", prompt)
+        if phases:
+            self.calls.append("outline")
+            content = json.dumps(fake_outline("Data Platform Engineer", int(phases.group(1)))) \
+                if self.outline_ok else "no outline"
+        else:
+            first, last = map(int, re.search(r"weeks (\d+) to (\d+)", prompt).groups())
+            self.calls.append(first)
+            if self.junk.get(first):
+                self.junk[first] -= 1
+                content = "```not json"
+            else:
+                # Numbered 1..n like many models do; the merge renumbers
+                content = json.dumps(fake_roadmap("Data Engineer", last - first + 1))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def generate(completions, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_HEDGE_AFTER_SECONDS", 30)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    started = time.perf_counter()
+    roadmap = asyncio.run(main.generate_phased_roadmap(client, PROFILE, 24))
+    return roadmap, time.perf_counter() - started
+
+
+def test_phase_ranges_cover_the_timeline():
+    assert main.phase_ranges(24) == [(1, 6), (7, 12), (13, 18), (19, 24)]
+    ranges = main.phase_ranges(26)
+    assert ranges[0][0] == 1 and ranges[-1][1] == 26 and len(ranges) == 5
+    assert all(b[0] == a[1] + 1 for a, b in zip(ranges, ranges[1:]))
+
+
+def test_oversized_timelines_are_clamped(monkeypatch):
+    profile = lambda timeline: main.UserProfile(target_role="Dev", salary_range="$1", timeline=timeline,
+                                                current_skills=[], hours_per_week=1)
+    assert main.compute_duration_weeks(profile("100 months")) == main.MAX_ROADMAP_WEEKS
+    assert main.compute_duration_weeks(profile("0 weeks")) == 1
+    assert main.compute_duration_weeks(profile("3 months")) == 12
+
+    monkeypatch.setattr(main, "PHASE_WEEKS", 1)
+    ranges = main.phase_ranges(main.MAX_ROADMAP_WEEKS)
+    assert len(ranges) == main.MAX_PHASES
+    assert ranges[0][0] == 1 and ranges[-1][1] == main.MAX_ROADMAP_WEEKS
+
+
+def test_phases_run_concurrently_and_merge_in_order(monkeypatch):
+    completions = PromptCompletions(delay=0.2)
+    roadmap, elapsed = generate(completions, monkeypatch)
+
+    assert roadmap.role == "Data Platform Engineer"
+    assert [s.week for s in roadmap.steps] == list(range(1, 25))
+    assert roadmap.steps[6].title == "Data Engineer topic 1"  # first step of phase 2
+    assert completions.calls[0] == "outline" and sorted(completions.calls[1:]) == [1, 7, 13, 19]
+    # Outline + one round of phases, not outline + four phases back to back
+    assert elapsed < 0.7
+
+
+def test_failed_phase_is_retried_alone_and_outline_failure_is_tolerated(monkeypatch):
+    # The first try fails; the phase retry succeeds
+    completions = PromptCompletions(delay=0.01, junk={13: 1}, outline_ok=False)
+    roadmap, _ = generate(completions, monkeypatch)
+
+    assert len(roadmap.steps) == 24 and roadmap.role == "Data Engineer"
+    assert completions.calls.count(13) == 2
+    assert all(completions.calls.count(week) == 1 for week in (1, 7, 19))
+
+    completions = PromptCompletions(delay=0.01, junk={7: 10})
+    roadmap, _ = generate(completions, monkeypatch)
+    assert roadmap is None
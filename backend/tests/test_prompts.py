@@ -0,0 +1,81 @@
+import asyncio
+from types import SimpleNamespace
+
+from openai import BadRequestError
+
+import llm
+import main
+
+
+def test_token_budget_scales_with_weeks_and_is_capped(monkeypatch):
+    assert main.steps_max_tokens(8) > main.steps_max_tokens(4) > main.steps_max_tokens(1)
+    monkeypatch.setattr(main, "LLM_RESOURCES_PER_WEEK", 4)
+    assert main.steps_max_tokens(4) > main.LLM_TOKEN_OVERHEAD + 4 * main.LLM_TOKENS_PER_WEEK
+    assert main.steps_max_tokens(10_000) == main.LLM_MAX_TOKENS_CAP
+
+
+def test_response_schema_comes_from_the_models_without_server_fields():
+    schema = main.response_schema("roadmap")
+    step = schema["properties"]["steps"]["items"]
+    assert set(schema["properties"]) == {"role", "steps"}
+    assert set(step["required"]) == {"week", "title", "description", "resources"}
+    assert step["properties"]["week"] == {"type": "integer"}
+    assert step["properties"]["resources"]["items"]["required"] == ["title", "url"]
+    assert schema["additionalProperties"] is False
+    assert set(main.response_schema("steps")["properties"]) == {"steps"}
+
+
+class Rejected(BadRequestError):
+    def __init__(self):
+        Exception.__init__(self, "response_format is not supported by this model")
+
+
+class RecordingCompletions:
+    def __init__(self, roadmap_json, rejects=()):
+        self.roadmap_json = roadmap_json
+        self.rejects = set(rejects)
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if "response_format" in kwargs and kwargs["model"] in self.rejects:
+            raise Rejected()
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.roadmap_json))])
+
+
+def test_generation_requests_budget_and_json_schema(monkeypatch, roadmap_json):
+    completions = RecordingCompletions(roadmap_json)
+    monkeypatch.setattr(llm, "get_client", lambda: SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    monkeypatch.setenv("OPENROUTER_MODELS", "schema/model")
+    profile = main.UserProfile(target_role="Dev", salary_range="$1", timeline="2 weeks",
+                               current_skills=[], hours_per_week=1)
+
+    async def no_enrichment(roadmap, profile):
+        pass
+    monkeypatch.setattr(main, "enrich_roadmap", no_enrichment)
+    roadmap = asyncio.run(main.generate_ai_roadmap(profile, 2))
+
+    assert len(roadmap.steps) == 2
+    call = completions.calls[0]
+    assert call["max_tokens"] == main.steps_max_tokens(2)
+    assert call["response_format"]["type"] == "json_schema"
+    assert call["response_format"]["json_schema"]["schema"] == main.response_schema("roadmap")
+    # Compact prompt: no pretty-printed example schema any more
+    assert "JSON SCHEMA" not in call["messages"][1]["content"]
+
+
+def test_models_without_structured_output_fall_back_to_prompt_only(monkeypatch, roadmap_json):
+    monkeypatch.setattr(llm, "_no_structured_output", set())
+    completions = RecordingCompletions(roadmap_json, rejects={"old/model"})
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    schema = main.response_schema("roadmap")
+
+    async def run():
+        await llm.complete(client, "old/model", [], max_tokens=100, schema=schema)
+        await llm.complete(client, "old/model", [], max_tokens=100, schema=schema)
+        await llm.complete(client, "new/model", [], max_tokens=100, schema=schema)
+    asyncio.run(run())
+
+    formats = [("response_format" in c, c["model"]) for c in completions.calls]
+    # Rejected once, remembered, and other models still get structured output
+    assert formats == [(True, "old/model"), (False, "old/model"), (False, "old/model"), (True, "new/model")]
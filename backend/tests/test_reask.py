@@ -0,0 +1,51 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+import llm
+import main
+import metrics
+from bench_fakes import fake_roadmap
+
+PROFILE = main.UserProfile(target_role="SRE", salary_range="$150k", timeline="6 weeks",
+                           current_skills=["Linux"], hours_per_week=8)
+
+
+class TruncatingCompletions:
+    """First answer is cut off mid-week-4; re-asks get exactly the weeks they name."""
+
+    def __init__(self):
+        self.prompts = []
+
+    async def create(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        missing = re.search(r"Write ONLY the missing weeks: ([\d, ]+)\.", prompt)
+        if missing:
+            weeks = [int(w) for w in missing.group(1).split(",")]
+            steps = [{**step, "week": week} for step, week in zip(fake_roadmap("SRE", len(weeks))["steps"], weeks)]
+            content = json.dumps({"steps": steps})
+        else:
+            full = json.dumps(fake_roadmap("SRE", 6))
+            content = "```json\n" + full[:full.index('"week": 4') + 30]
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_truncated_answer_keeps_complete_weeks_and_reasks_only_the_rest(monkeypatch):
+    completions = TruncatingCompletions()
+    monkeypatch.setattr(llm, "get_client", lambda: SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+
+    async def no_enrichment(roadmap, profile):
+        pass
+    monkeypatch.setattr(main, "enrich_roadmap", no_enrichment)
+    reasks = metrics.llm_repairs.value(kind="reask")
+
+    roadmap = asyncio.run(main.generate_ai_roadmap(PROFILE, 6))
+
+    assert [s.week for s in roadmap.steps] == [1, 2, 3, 4, 5, 6]
+    assert roadmap.steps[2].title == "SRE topic 3"  # salvaged from the first answer
+    assert len(completions.prompts) == 2
+    assert "Write ONLY the missing weeks: 4, 5, 6." in completions.prompts[1]
+    assert "Week 3: SRE topic 3" in completions.prompts[1]
+    assert metrics.llm_repairs.value(kind="reask") == reasks + 1
@@ -0,0 +1,71 @@
+import asyncio
+
+from roadmap_cache import RoadmapCache, profile_cache_key
+
+ROADMAP = {
+    "user_email": "first@example.com",
+    "role": "Backend Developer",
+    "steps": [{"week": 1, "title": "APIs", "description": "...", "resources": [], "completed": True}],
+}
+
+
+def test_key_normalizes_role_skills_and_buckets_hours():
+    a = profile_cache_key("Backend  Developer", ["SQL", "python"], 9, 12)
+    b = profile_cache_key("backend developer", ["Python", "sql", "SQL"], 10, 12)
+    assert a == b
+    assert a != profile_cache_key("backend developer", ["python", "sql"], 11, 12)
+    assert a != profile_cache_key("backend developer", ["python", "sql"], 10, 16)
+
+
+def test_concurrent_identical_requests_share_one_generation():
+    cache = RoadmapCache()
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return ROADMAP
+
+    async def run():
+        return await asyncio.gather(*[cache.get_or_create("k", factory) for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 4
+    # Every caller gets its own copy
+    results[0]["steps"][0]["title"] = "mutated"
+    assert results[1]["steps"][0]["title"] == "APIs"
+
+    assert asyncio.run(cache.get_or_create("k", factory))["role"] == "Backend Developer"
+    assert len(calls) == 1 and cache.stats()["hits"] == 1
+
+
+def test_user_state_is_never_shared():
+    cache = RoadmapCache()
+    cache.put("k", ROADMAP)
+    served = cache.get("k")
+    assert "user_email" not in served
+    assert served["steps"][0]["completed"] is False
+
+    served["steps"][0]["completed"] = True
+    assert cache.get("k")["steps"][0]["completed"] is False
+
+
+def test_failed_generations_are_not_cached_and_size_is_bounded():
+    cache = RoadmapCache(max_entries=2)
+
+    async def failing():
+        return None
+
+    assert asyncio.run(cache.get_or_create("k", failing)) is None
+    assert cache.get("k") is None
+
+    for key in ("a", "b", "c"):
+        cache.put(key, ROADMAP)
+    assert cache.get("a") is None and cache.get("c") is not None
+
+
+def test_entries_expire():
+    cache = RoadmapCache(ttl=-1)
+    cache.put("k", ROADMAP)
+    assert cache.get("k") is None
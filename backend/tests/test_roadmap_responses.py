@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from roadmap_responses import RoadmapResponseCache, etag_matches, parse_week_range
+
+
+class CountingRoadmaps:
+    """Wraps the mock roadmaps collection and records find_one projections."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.reads = []
+
+    async def find_one(self, query=None, projection=None):
+        self.reads.append(projection)
+        return await self.inner.find_one(query, projection)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+@pytest.fixture
+def counted(fresh_db, seed_roadmap, monkeypatch):
+    seed_roadmap(fresh_db, weeks=6)
+    roadmaps = CountingRoadmaps(fresh_db.roadmaps)
+    monkeypatch.setattr(fresh_db, "roadmaps", roadmaps)
+    return roadmaps
+
+
+def test_week_range_parsing():
+    assert parse_week_range(None) is None
+    assert parse_week_range("3-6") == (3, 6)
+    assert parse_week_range("4") == (4, 4)
+    for bad in ("0-2", "5-3", "a-b", "-"):
+        with pytest.raises(ValueError):
+            parse_week_range(bad)
+
+
+def test_etag_matching():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_repeat_polls_are_served_from_cache_with_304(counted, call, auth):
+    headers = auth("p@pathos.dev")
+    first, = call(("GET", "/roadmap", {"headers": headers}))
+    assert first.status_code == 200
+    assert [s["week"] for s in first.json()["steps"]] == [1, 2, 3, 4, 5, 6]
+    etag = first.headers["ETag"]
+
+    again, unchanged = call(("GET", "/roadmap", {"headers": headers}),
+                            ("GET", "/roadmap", {"headers": {**headers, "If-None-Match": etag}}))
+    assert again.content == first.content and again.headers["ETag"] == etag
+    assert unchanged.status_code == 304 and unchanged.content == b""
+    # One full read; the later polls only check the version
+    assert [read for read in counted.reads if read != {"_id": 0, "version": 1}] == [None]
+
+
+def test_a_write_on_another_worker_is_seen_on_the_next_poll(counted, call, auth, monkeypatch):
+    import main
+
+    headers = auth("p@pathos.dev")
+    worker_a, worker_b = main.roadmap_responses, RoadmapResponseCache()
+    first, = call(("GET", "/roadmap", {"headers": headers}))
+
+    # Worker B shares the database but not worker A's cache
+    monkeypatch.setattr(main, "roadmap_responses", worker_b)
+    call(("PUT", "/roadmap/progress", {"json": {"week": 2, "completed": True}, "headers": headers}))
+    monkeypatch.setattr(main, "roadmap_responses", worker_a)
+
+    after, = call(("GET", "/roadmap", {"headers": {**headers, "If-None-Match": first.headers["ETag"]}}))
+    assert after.status_code == 200
+    assert after.json()["steps"][1]["completed"] is True
+    assert worker_a.stats()["invalidations"] == 0
+
+
+def test_progress_update_changes_the_etag(counted, call, auth):
+    headers = auth("p@pathos.dev")
+    first, _, after = call(
+        ("GET", "/roadmap", {"headers": headers}),
+        ("PUT", "/roadmap/progress", {"json": {"week": 2, "completed": True}, "headers": headers}),
+        ("GET", "/roadmap", {"headers": {**headers, "If-None-Match": "placeholder"}}),
+    )
+    assert after.status_code == 200
+    assert after.headers["ETag"] != first.headers["ETag"]
+    assert after.json()["steps"][1]["completed"] is True
+
+    _, batched = call(
+        ("PUT", "/roadmap/progress/batch", {"json": {"updates": [{"week": 3, "completed": True}]},
+                                            "headers": headers}),
+        ("GET", "/roadmap", {"headers": {**headers, "If-None-Match": after.headers["ETag"]}}),
+    )
+    assert batched.status_code == 200
+    assert batched.json()["steps"][2]["completed"] is True
+
+
+def test_week_range_uses_a_slice_projection(counted, call, auth):
+    headers = auth("p@pathos.dev")
+    part, bad = call(("GET", "/roadmap?weeks=2-3", {"headers": headers}),
+                     ("GET", "/roadmap?weeks=3-1", {"headers": headers}))
+    assert part.status_code == 200
+    assert [s["week"] for s in part.json()["steps"]] == [2, 3]
+    assert counted.reads[-1]["steps"] == {"$slice": [1, 2]}
+    assert bad.status_code == 400
+
+
+def test_a_fill_that_raced_a_write_is_not_cached():
+    cache = RoadmapResponseCache()
+    version = cache.version("a")
+    cache.invalidate("a")  # write lands while the read is in flight
+    cache.put("a", None, b"{}", version)
+    assert cache.get("a") is None
+    assert cache.stats()["stale_fills"] == 1
+
+    cache.put("a", None, b"{}", cache.version("a"))
+    assert cache.get("a") is not None
+
+
+def test_forgotten_versions_still_reject_stale_fills():
+    cache = RoadmapResponseCache(max_users=1)
+    version = cache.version("a")
+    cache.invalidate("a")
+    cache.invalidate("b")  # pushes "a" out of the version map
+    cache.put("a", None, b"{}", version)
+    assert cache.get("a") is None
+
+
+def test_missing_roadmap_is_404(fresh_db, call, auth):
+    asyncio.run(fresh_db.users.insert_one({"name": "N", "email": "n@pathos.dev", "hashed_password": "x"}))
+    res, = call(("GET", "/roadmap", {"headers": auth("n@pathos.dev")}))
+    assert res.status_code == 404
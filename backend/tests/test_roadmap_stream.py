@@ -0,0 +1,99 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+
+import llm
+import main
+from roadmap_stream import StepStreamParser
+
+STREAMED = json.dumps({
+    "role": "Data \"Platform\" Engineer",
+    "steps": [
+        {"week": 1, "title": "SQL {joins}", "description": "Use ] and } freely",
+         "resources": [{"title": "SQLBolt", "url": "https://sqlbolt.com/"}]},
+        {"week": 2, "title": "Spark", "description": "Batch jobs",
+         "resources": [{"title": "Spark docs", "url": "https://spark.apache.org/docs/latest/"}]},
+    ],
+})
+
+
+def test_parser_emits_each_step_when_complete():
+    parser = StepStreamParser()
+    emitted = []
+    first_step_at = None
+    for i, ch in enumerate(STREAMED):
+        steps = parser.feed(ch)
+        if steps and first_step_at is None:
+            first_step_at = i
+        emitted.extend(steps)
+
+    assert [s["week"] for s in emitted] == [1, 2]
+    assert emitted[0]["title"] == "SQL {joins}"
+    assert first_step_at < STREAMED.index('"week": 2')
+    assert parser.role() == 'Data "Platform" Engineer'
+
+
+def test_parser_ignores_text_after_steps_array():
+    parser = StepStreamParser()
+    steps = parser.feed('```json\n{"steps": [{"week": 1}], "extra": [{"week": 9}]}\n```')
+    assert steps == [{"week": 1}]
+
+
+class FakeStream:
+    def __init__(self, text, size=7):
+        self.chunks = [text[i:i + size] for i in range(0, len(text), size)]
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for piece in self.chunks:
+            delta = SimpleNamespace(content=piece)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class FakeCompletions:
+    async def create(self, **kwargs):
+        assert kwargs["stream"] is True
+        return FakeStream(STREAMED)
+
+
+def test_stream_endpoint_sends_steps_then_persists(monkeypatch):
+    fake = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions()))
+    monkeypatch.setattr(llm, "get_client", lambda: fake)
+    token = main.create_access_token({"sub": "demo@pathos.dev"})
+    profile = {"target_role": "Data Engineer", "salary_range": "$100k", "timeline": "2 weeks",
+               "current_skills": ["SQL"], "hours_per_week": 10}
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            res = await ac.post("/generate-roadmap/stream", json=profile,
+                                headers={"Authorization": f"Bearer {token}"})
+            saved = await main.db.roadmaps.find_one({"user_email": "demo@pathos.dev"})
+            return res, saved
+
+    res, saved = asyncio.run(run())
+    assert res.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in res.text.strip().split("\n\n")]
+    names = [lines[0][len("event: "):] for lines in events]
+    assert names == ["start", "step", "step", "done"]
+    done = json.loads(events[-1][1][len("data: "):])
+    assert done["role"] == 'Data "Platform" Engineer'
+    assert len(saved["steps"]) == 2
+
+
+def test_salvage_recovers_complete_steps_from_broken_output():
+    from roadmap_stream import salvage_roadmap
+
+    truncated = "```json\n" + STREAMED[:STREAMED.index('{"week": 2') + 20]
+    role, steps, whole = salvage_roadmap(truncated)
+    assert role == 'Data "Platform" Engineer' and not whole
+    assert [s["week"] for s in steps] == [1]
+
+    sloppy = '{"role": "X", "steps": [{"week": 1, "title": "a, b",}, {"week": 2, "title": "c"},],}'
+    role, steps, whole = salvage_roadmap(f"Here you go:\n```json\n{sloppy}\n```")
+    assert whole and [s["title"] for s in steps] == ["a, b", "c"]
+    assert salvage_roadmap("no json at all") == (None, [], False)
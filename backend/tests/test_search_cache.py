@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+from search_cache import MISS, CachedSearchBackend, SearchCache
+
+
+class CountingSearch:
+    def __init__(self, results):
+        self.results = results
+        self.calls = 0
+
+    async def search(self, query):
+        self.calls += 1
+        return self.results.get(query)
+
+
+def test_repeat_queries_never_leave_the_process(tmp_path):
+    cache = SearchCache(path=str(tmp_path / "cache.db"))
+    backend = CountingSearch({"Official Docs Python tutorial": "https://docs.python.org/3/"})
+    cached = CachedSearchBackend(backend, cache)
+
+    async def run():
+        first = await cached.search("Official Docs Python tutorial")
+        second = await cached.search("  official docs   PYTHON tutorial ")
+        return first, second
+
+    assert asyncio.run(run()) == ("https://docs.python.org/3/",) * 2
+    assert backend.calls == 1
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+
+
+def test_durable_tier_survives_a_new_process(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SearchCache(path=path).set("rust book", "https://doc.rust-lang.org/book/")
+
+    fresh = SearchCache(path=path)
+    assert fresh.get_memory("rust book") is MISS
+    assert fresh.get("Rust Book") == "https://doc.rust-lang.org/book/"
+    assert fresh.counters["durable_hits"] == 1
+    # Promoted into the LRU tier
+    assert fresh.get_memory("rust book") == "https://doc.rust-lang.org/book/"
+
+
+def test_negative_results_are_cached_with_their_own_ttl():
+    cache = SearchCache(path=None, ttl=60, negative_ttl=0.05)
+    backend = CountingSearch({})
+    cached = CachedSearchBackend(backend, cache)
+
+    assert asyncio.run(cached.search("obscure thing")) is None
+    assert asyncio.run(cached.search("obscure thing")) is None
+    assert backend.calls == 1 and cache.counters["negative_hits"] == 1
+
+    time.sleep(0.06)
+    assert cache.get("obscure thing") is MISS
+
+
+def test_lru_tier_is_bounded():
+    cache = SearchCache(path=None, max_entries=2)
+    for q in ("a", "b", "c"):
+        cache.set(q, f"https://{q}/")
+    assert cache.get_memory("a") is MISS
+    assert cache.get_memory("c") == "https://c/"
+
+
+def test_memory_lookups_do_not_wait_for_a_disk_write(tmp_path):
+    cache = SearchCache(path=str(tmp_path / "cache.db"))
+    cache.set("go tour", "https://go.dev/tour/")
+    with cache._db_lock:  # a commit in progress on a worker thread
+        started = time.perf_counter()
+        assert cache.get_memory("go tour") == "https://go.dev/tour/"
+        assert time.perf_counter() - started < 0.1
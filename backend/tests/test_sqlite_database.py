@@ -0,0 +1,159 @@
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+import main
+from sqlite_database import SQLiteDatabase
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "pathos.db")
+
+
+def roadmap(email, weeks=4):
+    return {"user_email": email, "role": "Dev", "stats": {"total": weeks, "completed": 0},
+            "steps": [{"week": w, "title": f"W{w}", "completed": False} for w in range(1, weeks + 1)]}
+
+
+def test_documents_survive_a_restart_and_are_shared(path):
+    first = SQLiteDatabase(path)
+    doc = {"email": "a@pathos.dev", "name": "A"}
+    run(first.users.insert_one(doc))
+    other_worker = SQLiteDatabase(path)
+    assert run(other_worker.users.find_one({"_id": doc["_id"]}))["name"] == "A"
+    first.close()
+
+    restarted = SQLiteDatabase(path)
+    found = run(restarted.users.find_one({"email": "a@pathos.dev"}))
+    assert isinstance(found["_id"], ObjectId) and found["_id"] == doc["_id"]
+    other_worker.close()
+    restarted.close()
+
+
+def test_unique_indexes_hold_across_connections(path):
+    a, b = SQLiteDatabase(path), SQLiteDatabase(path)
+    run(a.users.insert_one({"email": "dup@pathos.dev"}))
+    with pytest.raises(DuplicateKeyError):
+        run(b.users.insert_one({"email": "dup@pathos.dev"}))
+    assert run(b.users.count_documents({})) == 1
+
+    # A failed write leaves nothing half-written behind
+    run(b.users.insert_one({"email": "other@pathos.dev"}))
+    with pytest.raises(DuplicateKeyError):
+        run(b.users.update_one({"email": "other@pathos.dev"}, {"$set": {"email": "dup@pathos.dev"}}))
+    assert run(a.users.find_one({"email": "other@pathos.dev"})) is not None
+
+
+def test_updates_and_projections_match_the_mock(path):
+    db = SQLiteDatabase(path)
+    run(db.roadmaps.insert_one(roadmap("p@pathos.dev", weeks=6)))
+    result = run(db.roadmaps.update_one(
+        {"user_email": "p@pathos.dev", "steps": {"$elemMatch": {"week": 2, "completed": {"$ne": True}}}},
+        {"$set": {"steps.$.completed": True}, "$inc": {"stats.completed": 1}},
+    ))
+    assert result.matched_count == 1
+    run(db.roadmaps.update_one({"user_email": "p@pathos.dev"}, {"$set": {"steps.$[w].completed": True}},
+                               array_filters=[{"w.week": {"$in": [4, 5]}}]))
+    doc = run(db.roadmaps.find_one({"user_email": "p@pathos.dev"}, {"_id": 0, "steps": {"$slice": [1, 4]}}))
+    assert [(s["week"], s["completed"]) for s in doc["steps"]] == [(2, True), (3, False), (4, True), (5, True)]
+    assert doc["stats"] == {"total": 6, "completed": 1}
+
+    run(db.roadmap_jobs.create_index("status"))
+    run(db.roadmap_jobs.update_one({"job_id": "j1"}, {"$set": {"status": "queued"}}, upsert=True))
+    assert [j["job_id"] for j in run(db.roadmap_jobs.find({"status": "queued"}).to_list(None))] == ["j1"]
+    assert run(db.roadmap_jobs.delete_one({"job_id": "j1"})).deleted_count == 1
+    assert run(db.roadmap_jobs.count_documents({"status": "queued"})) == 0
+
+
+INCREMENTS = """
+import asyncio, sys
+sys.path.insert(0, {backend!r})
+from sqlite_database import SQLiteDatabase
+db = SQLiteDatabase({path!r})
+async def main():
+    for _ in range(50):
+        await db.counters.update_one({{"name": "hits"}}, {{"$inc": {{"n": 1}}}}, upsert=True)
+asyncio.run(main())
+"""
+
+
+def test_read_modify_write_is_atomic_across_processes(path):
+    SQLiteDatabase(path).connection()
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = INCREMENTS.format(backend=backend, path=path)
+    workers = [subprocess.Popen([sys.executable, "-c", script]) for _ in range(3)]
+    assert all(w.wait(timeout=60) == 0 for w in workers)
+    db = SQLiteDatabase(path)
+    run(db.counters.create_index("name", unique=True))
+    assert run(db.counters.find_one({"name": "hits"}))["n"] == 150
+
+
+def test_users_registered_on_one_worker_can_log_in_on_another(path, monkeypatch, call):
+    monkeypatch.setattr(main, "db", SQLiteDatabase(path))
+    user = {"name": "S", "email": "s@pathos.dev", "password": "pw"}
+    registered, = call(("POST", "/register", {"json": user}))
+    assert registered.status_code == 200
+
+    monkeypatch.setattr(main, "db", SQLiteDatabase(path))
+    monkeypatch.setattr(main, "user_cache", main.TTLCache(10, 60))
+    logged_in, duplicate = call(("POST", "/login", {"json": {"email": user["email"], "password": "pw"}}),
+                                ("POST", "/register", {"json": user}))
+    assert logged_in.status_code == 200
+    assert duplicate.status_code == 400
+
+
+def test_a_write_waiting_on_another_process_does_not_block_the_event_loop(path):
+    db = SQLiteDatabase(path, busy_timeout=5)
+    run(db.roadmaps.insert_one(roadmap("w@pathos.dev")))
+    other = sqlite3.connect(path, isolation_level=None)  # stands in for another worker
+
+    async def scenario():
+        other.execute("BEGIN IMMEDIATE")
+        asyncio.get_running_loop().call_later(0.3, other.execute, "COMMIT")
+        write = asyncio.create_task(db.roadmaps.update_one({"user_email": "w@pathos.dev"},
+                                                           {"$inc": {"stats.completed": 1}}))
+        started, ticks = time.perf_counter(), []
+        while not write.done():
+            before = time.perf_counter()
+            await asyncio.sleep(0.01)
+            ticks.append(time.perf_counter() - before)
+        await write
+        return time.perf_counter() - started, max(ticks)
+
+    waited, longest_tick = run(scenario())
+    assert waited >= 0.25  # the write really waited for the lock
+    assert longest_tick < 0.1  # ...while the loop kept running
+    assert run(db.roadmaps.find_one({"user_email": "w@pathos.dev"}))["stats"]["completed"] == 1
+    other.close()
+
+
+def test_database_work_does_not_queue_behind_the_default_executor(path):
+    db = SQLiteDatabase(path)
+    run(db.roadmaps.insert_one(roadmap("x@pathos.dev")))
+
+    async def scenario():
+        # Slow searches occupying every default-executor thread
+        blockers = [asyncio.to_thread(time.sleep, 0.5) for _ in range(64)]
+        busy = asyncio.gather(*blockers)
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        doc = await db.roadmaps.find_one({"user_email": "x@pathos.dev"})
+        elapsed = time.perf_counter() - started
+        await busy
+        return doc, elapsed
+
+    doc, elapsed = run(scenario())
+    assert doc["role"] == "Dev" and elapsed < 0.25
+    db.close()
@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+import database
+import main
+import startup_benchmark
+
+
+def test_cold_start_stays_lazy_and_within_budget():
+    result = startup_benchmark.measure_startup(runs=1)
+    assert result["eager_modules"] == []
+    assert result["ready_s"] <= startup_benchmark.STARTUP_BUDGET_SECONDS
+
+
+def test_motor_client_is_only_built_on_first_use(monkeypatch):
+    built = []
+    lazy = database.LazyDatabase(lambda: built.append(1) or database.MockDatabase())
+    assert built == []
+    asyncio.run(lazy.users.insert_one({"email": "a@pathos.dev"}))
+    assert lazy["users"] is lazy.users
+    assert built == [1]
+    with pytest.raises(AttributeError):
+        lazy._missing
+
+
+def test_demo_password_is_hashed_on_first_login(monkeypatch, call):
+    monkeypatch.setattr(main, "db", database.MockDatabase())
+    monkeypatch.setitem(main.DEMO_USER, "hashed_password", None)
+    ok, wrong = call(("POST", "/login", {"json": {"email": "demo@pathos.dev", "password": "password"}}),
+                     ("POST", "/login", {"json": {"email": "demo@pathos.dev", "password": "nope"}}))
+    assert ok.status_code == 200 and wrong.status_code == 401
+    assert main.DEMO_USER["hashed_password"].startswith("$2")
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import logging
+
+import httpx
+import pytest
+
+import main
+import structured_logging
+
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(structured_logging, "LOG_MAX_BYTES", 2000)
+    monkeypatch.setattr(structured_logging, "LOG_BACKUP_COUNT", 2)
+    path = tmp_path / "pathos.log"
+    structured_logging.configure_logging(log_file=str(path), stdout=False, level="INFO", force=True)
+    yield path
+    structured_logging.configure_logging(log_file="", stdout=False, force=True)
+
+
+def read_lines(path):
+    structured_logging.shutdown_logging()  # flushes the writer thread
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_records_are_json_lines_tagged_with_the_request_id(log_file):
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            return await ac.post("/login", json={"email": "nobody@pathos.dev", "password": "x"},
+                                 headers={"X-Request-ID": "req-123"})
+
+    res = asyncio.run(run())
+    assert res.status_code == 401
+    assert res.headers["x-request-id"] == "req-123"
+
+    lines = read_lines(log_file)
+    login = [l for l in lines if l["msg"].startswith("LOGIN ATTEMPT")]
+    assert login and login[0]["request_id"] == "req-123"
+    assert login[0]["level"] == "INFO" and login[0]["logger"] == "pathos"
+
+
+def test_levels_exceptions_and_rotation(log_file):
+    logger = logging.getLogger("pathos.test")
+    logger.debug("hidden")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed")
+    for i in range(100):
+        logger.info("filler %d", i)
+
+    lines = read_lines(log_file)
+    assert not any(l["msg"] == "hidden" for l in lines)
+    rotated = sorted(p.name for p in log_file.parent.iterdir())
+    assert rotated == ["pathos.log", "pathos.log.1", "pathos.log.2"]
+    assert lines[-1]["msg"] == "filler 99"
+
+
+def test_logging_call_does_not_wait_for_the_writer(log_file, monkeypatch):
+    handler = structured_logging._queue_handler
+    monkeypatch.setattr(handler, "queue", __import__("queue").Queue(1))
+    logger = logging.getLogger("pathos.test")
+    for _ in range(50):
+        logger.info("burst")
+    assert structured_logging.dropped_records() > 0